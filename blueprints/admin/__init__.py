@@ -1,10 +1,6 @@
-import os
-import sqlite3
+from db import get_zrl_db
 
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, "..", "..", "zrl.db")  # ← risale alla root
-
-conn = sqlite3.connect(DB_PATH)
+conn = get_zrl_db()
 cur = conn.cursor()
 
 cur.executescript("""
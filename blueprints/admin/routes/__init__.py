@@ -9,6 +9,7 @@ from .admin_teams import admin_teams_bp
 from .admin_imports import admin_imports_bp
 from .admin_import_riders import admin_import_riders_bp
 from .import_wtrl import import_wtrl_bp
+from .admin_jobs import admin_jobs_bp
 
 # Lista di tutti i blueprint da registrare
 all_blueprints = [
@@ -18,5 +19,6 @@ all_blueprints = [
     admin_teams_bp,
     admin_imports_bp,
     admin_import_riders_bp,
-    import_wtrl_bp
+    import_wtrl_bp,
+    admin_jobs_bp
 ]
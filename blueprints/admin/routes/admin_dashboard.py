@@ -2,6 +2,42 @@ from flask import Blueprint, render_template, session, redirect, url_for, flash
 from db import get_zrl_db
 import sqlite3
 from datetime import date
+from utils.cache import VersionedCache
+from utils.lineup_snapshot import ensure_lineup_snapshot
+
+_team_cards = VersionedCache(("teams", "rider_teams", "riders", "race_lineup"))
+
+
+def build_team_cards(conn, race_date):
+    """Card delle squadre con capitano, numero rider e stato lineup in una sola query."""
+    ensure_lineup_snapshot(conn)
+    rows = conn.execute("""
+        SELECT t.id, t.name, t.category, t.division,
+               cap.name AS captain_name,
+               (SELECT COUNT(*) FROM rider_teams rt WHERE rt.team_id = t.id) AS rider_count,
+               EXISTS (
+                   SELECT 1 FROM lineup_snapshot ls
+                   WHERE ls.race_date = ? AND ls.team_id = t.id
+               ) AS has_lineup
+        FROM teams t
+        LEFT JOIN riders cap ON cap.zwift_power_id = t.captain_zwift_id
+        ORDER BY t.name ASC
+    """, (race_date,)).fetchall()
+
+    teams = [{
+        "id": row["id"],
+        "name": row["name"],
+        "category": row["category"],
+        "division": row["division"],
+        "captain_name": row["captain_name"],
+        "rider_count": row["rider_count"],
+        "has_lineup": bool(row["has_lineup"]),
+    } for row in rows]
+
+    # 🔹 Riempie fino a 16 card per layout
+    while len(teams) < 16:
+        teams.append({"empty": True})
+    return teams
 
 # 🔹 Blueprint dashboard amministratore
 admin_panel_bp = Blueprint("admin_panel", __name__, url_prefix="/admin")
@@ -26,18 +62,14 @@ def admin_dashboard():
     cur = conn.cursor()
     today = date.today()
 
-    # 🔹 Aggiorna round scaduti
-    cur.execute("UPDATE rounds SET is_active = 0 WHERE end_date < ?", (today,))
-    conn.commit()
-
-    # 🔹 Round attuale
+    # 🔹 Round attuale (i round scaduti sono disattivati all'avvio e al cambio di giorno)
     current_round = cur.execute("""
         SELECT id, name
         FROM rounds
         WHERE end_date >= ?
         ORDER BY end_date ASC
         LIMIT 1
-    """, (today,)).fetchone()
+    """, (today.isoformat(),)).fetchone()
 
     # 🔹 Gare del round attuale
     races = []
@@ -49,16 +81,6 @@ def admin_dashboard():
         """, (current_round["id"],)).fetchall()
         races = [dict(row) for row in races_raw]
 
-    # 🔹 Dati squadre
-    teams_raw = cur.execute("""
-        SELECT t.id, t.name, t.category, t.division, t.captain_zwift_id,
-               COUNT(rt.zwift_power_id) AS rider_count
-        FROM teams t
-        LEFT JOIN rider_teams rt ON t.id = rt.team_id
-        GROUP BY t.id
-        ORDER BY t.name ASC
-    """).fetchall()
-
     # 🔹 Prossima data gara
     race_date_row = cur.execute("""
         SELECT MIN(race_date)
@@ -67,37 +89,8 @@ def admin_dashboard():
     """).fetchone()
     race_date = race_date_row[0] if race_date_row and race_date_row[0] else None
 
-    # 🔹 Costruzione lista squadre
-    teams = []
-    for team in teams_raw:
-        captain_name = None
-        if team["captain_zwift_id"]:
-            rider = cur.execute("SELECT name FROM riders WHERE zwift_power_id = ?", (team["captain_zwift_id"],)).fetchone()
-            if rider:
-                captain_name = rider["name"]
-
-        has_lineup = False
-        if race_date:
-            result = cur.execute("""
-                SELECT 1 FROM race_lineup
-                WHERE team_id = ? AND race_date = ?
-                LIMIT 1
-            """, (team["id"], race_date)).fetchone()
-            has_lineup = result is not None
-
-        teams.append({
-            "id": team["id"],
-            "name": team["name"],
-            "category": team["category"],
-            "division": team["division"],
-            "captain_name": captain_name,
-            "rider_count": team["rider_count"],
-            "has_lineup": has_lineup
-        })
-
-    # 🔹 Riempie fino a 16 card per layout
-    while len(teams) < 16:
-        teams.append({"empty": True})
+    # 🔹 Card squadre (in cache finché teams, rider_teams, riders e race_lineup non cambiano)
+    teams = _team_cards.get_or_build(conn, race_date, lambda: build_team_cards(conn, race_date))
 
     conn.close()
 
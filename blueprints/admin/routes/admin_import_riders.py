@@ -1,52 +1,28 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-import sqlite3
-import datetime
-import os
-import shutil
-import pandas as pd
+from db import get_zrl_db
+from utils.rider_sync import sincronizza_riders
+from utils.backups import crea_backup
+from utils.riders_file import leggi_riders, snapshot_riders, SORT_FIELDS
 
 admin_import_riders_bp = Blueprint("admin_import_riders", __name__, url_prefix="/admin/import")
 
-# 🔹 Percorsi principali
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
-DATA_DIR = os.path.join(PROJECT_ROOT, "data")
-CSV_FILE = os.path.join(DATA_DIR, "riders.csv")
-JSON_FILE = os.path.join(DATA_DIR, "riders.json")
-ZRL_DB_FILE = os.path.join(PROJECT_ROOT, "zrl.db")
-BACKUP_DIR = os.path.join(PROJECT_ROOT, "backups")
-
-# 🔹 Verifica file
-if os.path.exists(CSV_FILE):
-    print(f"✅ Trovato CSV: {CSV_FILE}")
-elif os.path.exists(JSON_FILE):
-    print(f"✅ Trovato JSON: {JSON_FILE}")
-else:
-    print("❌ Nessun file riders.csv o riders.json trovato.")
+# Rider per pagina nell'anteprima di import
+PER_PAGE = 100
 
 # --- Helper ---
 def backup_db():
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(BACKUP_DIR, f"zrl_backup_{timestamp}.db")
-    shutil.copy2(ZRL_DB_FILE, backup_file)
-    return backup_file
+    """Snapshot online del database (utils.backups); id dello snapshot o None."""
+    meta = crea_backup(reason="update_all")
+    if meta is None:
+        return None
+    return f"{meta['id']}{' (invariato)' if meta['deduplicated'] else ''}"
 
 def get_zrl_conn():
-    conn = sqlite3.connect(ZRL_DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_zrl_db()
 
 def read_riders_file():
-    if os.path.exists(CSV_FILE):
-        df = pd.read_csv(CSV_FILE)
-    elif os.path.exists(JSON_FILE):
-        df = pd.read_json(JSON_FILE)
-    else:
-        return None
-    # Forza zwift_power_id come stringa per compatibilità
-    df["zwift_power_id"] = df["zwift_power_id"].astype(str)
-    return df
+    # Letto a blocchi e tenuto in cache finché il file non cambia
+    return leggi_riders()
 
 # --- ROUTE: aggiorna tutti i rider ---
 @admin_import_riders_bp.route("/update_all", methods=["GET"])
@@ -58,117 +34,59 @@ def update_all_riders():
 
     backup_file = backup_db()
     conn = get_zrl_conn()
-    cur = conn.cursor()
-
-    # Dizionario per accesso veloce
-    df_dict = {row["zwift_power_id"]: row for _, row in df.iterrows()}
-
-    cur.execute("SELECT zwift_power_id FROM riders")
-    db_riders = [str(row["zwift_power_id"]) for row in cur.fetchall()]
-
-    updated = 0
-    not_found = 0
-
-    for zwid in db_riders:
-        if zwid not in df_dict:
-            not_found += 1
-            continue
-
-        r = df_dict[zwid]
-        cur.execute("""
-            UPDATE riders SET
-                name=?, category=?, ranking=?,
-                wkg_20min=?, watt_20min=?, wkg_15sec=?, watt_15sec=?,
-                status=?, races=?, weight=?, ftp=?, age=?, country=?, profile_url=?
-            WHERE zwift_power_id=?
-        """, (
-            r.get("name"), r.get("category"), r.get("ranking"),
-            r.get("wkg_20min"), r.get("watt_20min"), r.get("wkg_15sec"), r.get("watt_15sec"),
-            r.get("status"), r.get("races"), r.get("weight"), r.get("ftp"), r.get("age"),
-            r.get("country"), r.get("profile_url"), zwid
-        ))
-        updated += 1
 
-    conn.commit()
+    # Un confronto vettoriale file/database, scrittura solo dei rider cambiati
+    counts = sincronizza_riders(conn, df)
     conn.close()
 
-    flash(f"✅ Aggiornamento completato. Rider aggiornati: {updated}, non trovati nei file: {not_found}. Backup: {backup_file}", "success")
+    flash(
+        f"✅ Aggiornamento completato. Rider aggiornati: {counts['updated']}, invariati: {counts['unchanged']}, "
+        f"non trovati nei file: {counts['not_found']}. Backup: {backup_file or 'non eseguito (PostgreSQL)'}",
+        "success",
+    )
     return redirect(url_for("admin_import_riders.import_zrl_riders"))
 
 # --- ROUTE: import selettivo nuovi rider ---
 @admin_import_riders_bp.route("/zrl_riders", methods=["GET", "POST"])
 def import_zrl_riders():
     conn = get_zrl_conn()
-    cur = conn.cursor()
 
-    df = read_riders_file()
-    if df is None:
+    snapshot = snapshot_riders()
+    if snapshot is None:
         flash("❌ Nessun file riders.csv o riders.json trovato.", "danger")
-        return render_template("admin/import_zrl_riders.html", zwift_riders=[], selected_category="")
+        return render_template("admin/import_zrl_riders.html", zwift_riders=[], selected_category="",
+                               paging=None, search="", sort="name", desc=False)
 
     if request.method == "POST":
         selected_ids = request.form.getlist("rider_ids")
-        new_riders = 0
-        updated_riders = 0
-
-        # Filtra DataFrame solo ai selezionati (compatibilità stringa)
-        df["zwift_power_id"] = df["zwift_power_id"].astype(str)
-
-        for zwid in selected_ids:
-            rider_row = df[df["zwift_power_id"] == zwid]
-            if rider_row.empty:
-                continue
-            rider = rider_row.iloc[0]
 
-            existing = cur.execute("SELECT 1 FROM riders WHERE zwift_power_id=?", (zwid,)).fetchone()
-            if existing:
-                cur.execute("""
-                    UPDATE riders SET
-                        name=?, category=?, ranking=?,
-                        wkg_20min=?, watt_20min=?, wkg_15sec=?, watt_15sec=?,
-                        status=?, races=?, weight=?, ftp=?, age=?, country=?, profile_url=?, available_zrl=1
-                    WHERE zwift_power_id=?
-                """, (
-                    rider["name"], rider["category"], rider["ranking"],
-                    rider["wkg_20min"], rider["watt_20min"], rider["wkg_15sec"], rider["watt_15sec"],
-                    rider["status"], rider["races"], rider["weight"], rider["ftp"], rider["age"],
-                    rider.get("country",""), rider.get("profile_url",""), zwid
-                ))
-                updated_riders += 1
-            else:
-                cur.execute("""
-                INSERT INTO riders (
-                    zwift_power_id, name, category, ranking,
-                    wkg_20min, watt_20min, wkg_15sec, watt_15sec,
-                    status, races, weight, ftp, age, country, profile_url,
-                    available_zrl, is_captain, email, password,
-                    active, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                rider["zwift_power_id"], rider["name"], rider["category"], rider["ranking"],
-                rider["wkg_20min"], rider["watt_20min"], rider["wkg_15sec"], rider["watt_15sec"],
-                rider["status"], rider["races"], rider["weight"], rider["ftp"], rider["age"],
-                rider.get("country",""), rider.get("profile_url",""),
-                1, 0, "", "", 1, datetime.datetime.now().strftime("%Y-%m-%d")
-            ))
-            new_riders += 1
-
-        conn.commit()
+        # Solo le righe selezionate (indice per id dello snapshot), non tutto il file
+        rows = snapshot.righe(selected_ids)
+        # Nuovi rider inseriti, esistenti aggiornati solo se cambiati (e resi disponibili)
+        counts = sincronizza_riders(conn, rows, ids=selected_ids, insert_new=True, set_values={"available_zrl": 1})
         conn.close()
-        flash(f"✅ Rider importati: {new_riders}, Rider aggiornati: {updated_riders}", "success")
-        return redirect(url_for("admin_import_riders.import_zrl_riders"))
-
-    # --- GET: filtri categoria ---
+        flash(
+            f"✅ Rider importati: {counts['inserted']}, aggiornati: {counts['updated']}, "
+            f"invariati: {counts['unchanged']}",
+            "success",
+        )
+        # Torna alla stessa pagina, con gli stessi filtri
+        return redirect(url_for("admin_import_riders.import_zrl_riders", **request.args.to_dict()))
+
+    # --- GET: filtri, ordinamento e paginazione lato server ---
     selected_category = request.args.get("category", "").upper()
-    if selected_category:
-        if selected_category == "A":
-            df = df[df["category"].isin(["A","A+"])]
-        elif selected_category == "NESSUNA":
-            df = df[df["category"].isna() | (df["category"]=="")]
-        else:
-            df = df[df["category"] == selected_category]
-
-    zwift_riders = df.to_dict(orient="records")
+    search = request.args.get("q", "").strip()
+    sort = request.args.get("sort", "name")
+    if sort not in SORT_FIELDS:
+        sort = "name"
+    desc = request.args.get("desc") == "1"
+    per_page = min(max(request.args.get("per_page", PER_PAGE, type=int), 10), 500)
+
+    paging = snapshot.pagina(
+        category=selected_category, search=search, sort=sort, desc=desc,
+        page=request.args.get("page", 1, type=int), per_page=per_page,
+    )
     return render_template("admin/import_zrl_riders.html",
-                           zwift_riders=zwift_riders,
-                           selected_category=selected_category)
+                           zwift_riders=paging["rows"],
+                           selected_category=selected_category,
+                           paging=paging, search=search, sort=sort, desc=desc)
@@ -1,14 +1,11 @@
-import os
-import sqlite3
 import re
 from datetime import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash
+from db import get_zrl_db
+from utils.seasons import refresh_round_activation
 
 admin_imports_bp = Blueprint("admin_imports", __name__)
 
-DB_PATH = os.path.abspath(r"C:\Progetti\gestioneZRL\istances\zrl.db")
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
 MONTHS = {
     "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
     "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12
@@ -47,9 +44,7 @@ def extract_rounds(text):
     return rounds
 
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_zrl_db()
 
 @admin_imports_bp.route("/import_rounds", methods=["GET", "POST"], endpoint="import_rounds")
 def import_rounds_view():
@@ -93,6 +88,7 @@ def import_rounds_view():
             inserted += 1
 
         conn.commit()
+        refresh_round_activation(conn)
         flash(f"✅ Importati {inserted} nuovi round. ⏩ {skipped} già presenti.", "success")
         conn.close()
         return redirect(url_for("admin_imports.import_rounds"))
@@ -115,6 +111,7 @@ def update_round(round_id):
         WHERE id = ?
     """, (name, start_date, end_date, is_active, round_id))
     conn.commit()
+    refresh_round_activation(conn)
     conn.close()
 
     flash("✅ Round aggiornato con successo.", "success")
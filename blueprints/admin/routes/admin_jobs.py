@@ -0,0 +1,43 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from db import get_zrl_db
+from utils.auth_decorators import require_admin
+from utils import import_jobs
+
+admin_jobs_bp = Blueprint("admin_jobs", __name__, url_prefix="/admin/import-jobs")
+
+# Job avviabili a mano dalla pagina (senza parametri)
+MANUAL_KINDS = ("wtrl_season", "zwiftpower_riders", "backup")
+
+
+@admin_jobs_bp.route("/", methods=["GET", "POST"], endpoint="import_jobs")
+@require_admin
+def import_jobs_view():
+    conn = get_zrl_db()
+
+    if request.method == "POST":
+        kind = request.form.get("kind")
+        if kind not in MANUAL_KINDS:
+            flash("⚠️ Tipo di import non valido", "warning")
+        else:
+            job_id = import_jobs.enqueue(conn, kind)
+            flash(f"📥 {import_jobs.JOB_LABELS[kind]} accodato (job #{job_id})", "info")
+        return redirect(url_for("admin_jobs.import_jobs"))
+
+    jobs = import_jobs.recent_jobs(conn)
+    return render_template(
+        "admin/import_jobs.html",
+        jobs=jobs,
+        workers=import_jobs.stato_worker(conn),
+        schedules=import_jobs.stato_pianificazioni(conn),
+        manual_kinds={kind: import_jobs.JOB_LABELS[kind] for kind in MANUAL_KINDS},
+        active=any(job["status"] in ("queued", "running") for job in jobs),
+    )
+
+
+@admin_jobs_bp.route("/<int:job_id>.json")
+@require_admin
+def job_json(job_id):
+    job = import_jobs.get_job(get_zrl_db(), job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
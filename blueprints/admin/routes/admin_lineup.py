@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from db import get_zrl_db
 from utils.race_utils import get_next_race_date
 from utils.auth import require_roles
+from utils.lineup_snapshot import ensure_lineup_snapshot
+from utils.lineup import save_lineup, remove_rider, lineup_error_message
 import sqlite3
 
 admin_lineup_bp = Blueprint("admin_lineup", __name__, url_prefix="/admin")
@@ -35,45 +37,17 @@ def manage_riders():
         selected_riders = request.form.getlist("riders")
 
         if action == "save_lineup":
-            # Controllo massimo 6 rider
-            if len(selected_riders) > 6:
-                flash("⚠️ Puoi selezionare al massimo 6 rider", "warning")
+            # Limite di 6 rider e conflitti con altri team controllati in una sola query
+            result = save_lineup(conn, team_id, race_date, selected_riders)
+            if not result["saved"]:
+                flash(lineup_error_message(result), "warning" if result["error"] == "too_many" else "danger")
                 return redirect(url_for("admin_lineup.manage_riders", team_id=team_id, race_date=race_date))
-
-            # Controllo conflitti
-            conflicting_riders = []
-            for zwift_power_id in selected_riders:
-                conflict = cur.execute("""
-                    SELECT rl.team_id
-                    FROM race_lineup rl
-                    WHERE rl.zwift_power_id = ?
-                      AND rl.race_date = ?
-                      AND rl.team_id != ?
-                """, (zwift_power_id, race_date, team_id)).fetchone()
-                if conflict:
-                    rider_name = cur.execute("SELECT name FROM riders WHERE zwift_power_id = ?", (zwift_power_id,)).fetchone()["name"]
-                    conflicting_riders.append(rider_name)
-
-            if conflicting_riders:
-                flash(f"❌ I seguenti rider sono già assegnati a un'altra gara in questa data: {', '.join(conflicting_riders)}", "danger")
-                return redirect(url_for("admin_lineup.manage_riders", team_id=team_id, race_date=race_date))
-
-            # Salvataggio lineup
-            cur.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
-            for zwift_power_id in selected_riders:
-                cur.execute(
-                    "INSERT INTO race_lineup (team_id, race_date, zwift_power_id) VALUES (?, ?, ?)",
-                    (team_id, race_date, zwift_power_id)
-                )
-            conn.commit()
             flash("✅ Formazione salvata", "success")
 
         elif action == "remove_rider":
             remove_id = request.form.get("remove_id")
             if remove_id:
-                cur.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ? AND zwift_power_id = ?",
-                            (team_id, race_date, remove_id))
-                conn.commit()
+                remove_rider(conn, team_id, race_date, remove_id)
                 rider_name = cur.execute("SELECT name FROM riders WHERE zwift_power_id = ?", (remove_id,)).fetchone()["name"]
                 flash(f"🗑️ Rider {rider_name} rimosso dalla formazione", "success")
 
@@ -137,42 +111,38 @@ def lineup_report_all():
     category = request.args.get("category")
 
     all_teams = cur.execute("SELECT id, name FROM teams ORDER BY name ASC").fetchall()
+
+    ensure_lineup_snapshot(conn)
     all_categories = [row["category"] for row in cur.execute("""
-        SELECT DISTINCT r.category
-        FROM riders r
-        JOIN race_lineup rl ON r.zwift_power_id = rl.zwift_power_id
-        WHERE rl.race_date = ?
-        ORDER BY r.category ASC
+        SELECT DISTINCT category
+        FROM lineup_snapshot
+        WHERE race_date = ?
+        ORDER BY category ASC
     """, (race_date,)).fetchall()]
 
     # Filtra team se richiesto
-    teams_query = "SELECT id, name FROM teams"
-    params = []
-    if team_id:
-        teams_query += " WHERE id = ?"
-        params.append(team_id)
-    teams_query += " ORDER BY name ASC"
-    teams = cur.execute(teams_query, params).fetchall()
-
-    report = []
-    for team in teams:
-        query = """
-            SELECT r.name, r.category, r.is_captain
-            FROM riders r
-            JOIN race_lineup rl ON r.zwift_power_id = rl.zwift_power_id
-            WHERE rl.team_id = ? AND rl.race_date = ?
-        """
-        query_params = [team["id"], race_date]
-        if category:
-            query += " AND r.category = ?"
-            query_params.append(category)
-        query += " ORDER BY r.name ASC"
-
-        selected_riders = cur.execute(query, query_params).fetchall()
-        report.append({
-            "team_name": team["name"],
-            "selected_riders": selected_riders
-        })
+    teams = [team for team in all_teams if not team_id or str(team["id"]) == str(team_id)]
+
+    # Tutte le formazioni della data in una sola lettura dello snapshot
+    query = """
+        SELECT team_id, rider_name AS name, category, is_captain
+        FROM lineup_snapshot
+        WHERE race_date = ?
+    """
+    query_params = [race_date]
+    if category:
+        query += " AND category = ?"
+        query_params.append(category)
+    query += " ORDER BY team_name, rider_name"
+
+    riders_by_team = {}
+    for row in cur.execute(query, query_params).fetchall():
+        riders_by_team.setdefault(row["team_id"], []).append(row)
+
+    report = [{
+        "team_name": team["name"],
+        "selected_riders": riders_by_team.get(team["id"], [])
+    } for team in teams]
 
     category_colors = {
         "A": "bg-danger text-white",
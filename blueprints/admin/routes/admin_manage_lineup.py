@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, session, flash
 from db import get_zrl_db
 from utils.auth import require_roles
+from utils.lineup_snapshot import ensure_lineup_snapshot
+import sqlite3
 
 admin_lineup_bp = Blueprint("admin_lineup", __name__, url_prefix="/admin")
 
@@ -28,13 +30,13 @@ def view_lineup():
         team_row = cur.execute("SELECT name FROM teams WHERE id = ?", (team_id,)).fetchone()
         team_name = team_row["name"] if team_row else "—"
 
+        ensure_lineup_snapshot(conn)
         lineup = cur.execute("""
-            SELECT r.name, r.category, r.is_captain, r.available_zrl
-            FROM race_lineup rl
-            JOIN riders r ON rl.zwift_power_id = r.zwift_power_id
-            WHERE rl.team_id = ? AND rl.race_date = ?
-            ORDER BY r.name ASC
-        """, (team_id, race_date)).fetchall()
+            SELECT rider_name AS name, category, is_captain, available_zrl
+            FROM lineup_snapshot
+            WHERE race_date = ? AND team_id = ?
+            ORDER BY rider_name ASC
+        """, (race_date, team_id)).fetchall()
 
     conn.close()
     return render_template(
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash
 from db import get_zrl_db
 from utils.auth import require_roles
+from utils.lineup import save_lineup, lineup_error_message
 import sqlite3
 
 # Blueprint
@@ -31,20 +32,11 @@ def manage_riders():
 
     # 🔹 Salvataggio lineup
     if request.method == "POST":
-        selected_riders = request.form.getlist("riders")
-        if len(selected_riders) > 6:
-            flash("⚠️ Puoi selezionare al massimo 6 rider", "warning")
-            return redirect(url_for("admin_lineup.manage_riders", team_id=team_id, race_date=race_date))
-
-        cur.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
-        for zwift_power_id in selected_riders:
-            cur.execute("""
-                INSERT INTO race_lineup (team_id, race_date, zwift_power_id)
-                VALUES (?, ?, ?)
-            """, (team_id, race_date, zwift_power_id))
-
-        conn.commit()
-        flash("✅ Formazione salvata", "success")
+        result = save_lineup(conn, team_id, race_date, request.form.getlist("riders"))
+        if result["saved"]:
+            flash("✅ Formazione salvata", "success")
+        else:
+            flash(lineup_error_message(result), "warning" if result["error"] == "too_many" else "danger")
         return redirect(url_for("admin_lineup.manage_riders", team_id=team_id, race_date=race_date))
 
     # 🔹 Rider attivi del team tramite rider_teams
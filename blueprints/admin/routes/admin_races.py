@@ -2,6 +2,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from db import get_db, get_zrl_db
 from utils.auth import require_roles, require_admin
+from utils.seasons import refresh_round_activation
+from utils.lineup import save_lineup, lineup_error_message
 from datetime import datetime
 import json
 import sqlite3
@@ -102,6 +104,7 @@ def bulk_insert_rounds():
         """, (season_id, next_round_number, name, start_date, end_date))
 
     conn.commit()
+    refresh_round_activation(conn)
     conn.close()
     flash(f"✅ {len(rounds)} round registrati correttamente", "success")
     return redirect(url_for("admin_races.import_races"))
@@ -128,6 +131,7 @@ def insert_round():
     """, (round_number, name, season_id, start_date, end_date, is_active))
 
     conn.commit()
+    refresh_round_activation(conn)
     conn.close()
     flash("✅ Round inserito correttamente", "success")
     return redirect(url_for("admin_races.import_races"))
@@ -152,6 +156,7 @@ def edit_round(round_id):
     """, (name, round_number, start_date, end_date, is_active, round_id))
 
     conn.commit()
+    refresh_round_activation(conn)
     conn.close()
     flash("✅ Round aggiornato correttamente", "success")
     return redirect(url_for("admin_races.import_races"))
@@ -287,17 +292,10 @@ def manage_riders():
         action = request.form.get("action")
 
         if action == "save_lineup":
-            selected_riders = request.form.getlist("riders")
-            if len(selected_riders) > 6:
-                flash("⚠️ Puoi selezionare al massimo 6 rider", "warning")
+            result = save_lineup(conn, team_id, race_date, request.form.getlist("riders"))
+            if not result["saved"]:
+                flash(lineup_error_message(result), "warning" if result["error"] == "too_many" else "danger")
                 return redirect(url_for("admin_races.manage_riders", team_id=team_id, race_date=race_date))
-
-            cur.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
-            for zwift_power_id in selected_riders:
-                cur.execute("""
-                    INSERT INTO race_lineup (team_id, race_date, zwift_power_id)
-                    VALUES (?, ?, ?)
-                """, (team_id, race_date, zwift_power_id))
             flash("✅ Formazione salvata", "success")
 
     conn.commit()
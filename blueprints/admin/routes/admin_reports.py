@@ -1,11 +1,17 @@
-from flask import Blueprint, render_template, request, send_file, flash, redirect
+from flask import Blueprint, render_template, request, send_file, flash, redirect, Response, stream_with_context, url_for, jsonify, abort
 from db import get_db
 import pandas as pd
 import io
+import csv
 import datetime
 import locale
 import sqlite3
 
+from utils.cache import ReportCache
+from utils.report_pdf import render_report_pdf
+from utils.lineup_snapshot import ensure_lineup_snapshot
+from utils import export_jobs
+
 
 # Imposta la localizzazione italiana per la data, con fallback sicuro
 try:
@@ -18,6 +24,21 @@ except locale.Error:
 
 admin_reports_bp = Blueprint("admin_reports", __name__, url_prefix="/admin/reports")
 
+# Report supportati e formati di export
+VALID_REPORTS = ["riders_compact", "riders", "teams", "lineup", "team_composition"]
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+    "html": "text/html",
+}
+
+# Righe lette dal cursore per ogni blocco del CSV in streaming
+CSV_CHUNK_ROWS = 500
+
+# 🧠 Cache dei report: invalidata quando cambiano rider, team, lineup o capitani
+_report_cache = ReportCache(("riders", "teams", "rider_teams", "race_lineup", "captains"))
+
 @admin_reports_bp.route("/")
 def index():
     report_type = (request.args.get("report_type") or "riders_compact").strip()
@@ -25,12 +46,23 @@ def index():
     team_filter = (request.args.get("team") or "").strip()
 
     # Valid report types
-    valid_reports = ["riders_compact", "riders", "teams", "lineup", "team_composition"]
-    if report_type not in valid_reports:
+    if report_type not in VALID_REPORTS:
         flash("Tipo di report non valido", "danger")
         report_type = "riders_compact"
 
     conn = get_db()
+    context = _report_cache.get_or_build(
+        conn,
+        ("index", report_type, category_filter, team_filter),
+        lambda: build_report_context(conn, report_type, category_filter, team_filter),
+    )
+    conn.close()
+
+    return render_template("admin/reports/index.html", **context)
+
+
+def build_report_context(conn, report_type, category_filter, team_filter):
+    """Dati della pagina report (usati dal template admin/reports/index.html)."""
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
@@ -108,58 +140,37 @@ def index():
     # Report Lineup
     # ---------------------
     elif report_type == "lineup":
+        # Snapshot già normalizzato e ordinato per categoria del team
+        ensure_lineup_snapshot(conn)
         query = """
-            SELECT 
-                t.name AS team,
-                r.name AS rider_name,
-                TRIM(UPPER(r.category)) AS category,
-                rl.race_date,
-                COALESCE(rc.name, '') AS captain
-            FROM race_lineup rl
-            JOIN riders r ON r.zwift_power_id = rl.zwift_power_id
-            JOIN teams t ON t.id = rl.team_id
-            LEFT JOIN riders rc ON rc.zwift_power_id = t.captain_zwift_id
+            SELECT team_name AS team, team_category, rider_name, category,
+                   race_date, captain_name AS captain
+            FROM lineup_snapshot
             WHERE 1=1
         """
         params = []
         if category_filter:
-            query += " AND TRIM(UPPER(r.category)) = ?"
+            query += " AND rider_category = ?"
             params.append(category_filter.upper())
 
-        query += " ORDER BY t.name, r.name"
+        query += " ORDER BY team_order, team_name, rider_name"
         rows_raw = cursor.execute(query, params).fetchall()
 
         # Raggruppa riders per team e salva il capitano
         lineup_per_team = {}
         team_categories = {}
-        category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
-        team_order = []
-
         for r in rows_raw:
             team = r["team"] or "Senza Team"
-            team_cat = r["category"] or "OTHER"
-            if team_cat.upper() == "A+":
-                team_cat = "A"
             if team not in lineup_per_team:
                 lineup_per_team[team] = []
-                team_categories[team] = team_cat.upper()
-                team_order.append((category_order.get(team_cat.upper(), 99), team))
-
-            rider_cat = r["category"] or "OTHER"
-            if rider_cat.upper() == "A+":
-                rider_cat = "A"
-
+                team_categories[team] = r["team_category"]
             lineup_per_team[team].append({
                 "rider_name": r["rider_name"],
-                "category": rider_cat.upper(),
+                "category": r["category"],
                 "race_date": r["race_date"],
                 "captain": r["captain"]
             })
 
-        # Ordina i team
-        team_order.sort()
-        lineup_per_team = {team: lineup_per_team[team] for _, team in team_order}
-
         # Formatta data
         race_date = ""
         if rows_raw:
@@ -237,10 +248,8 @@ def index():
 
         columns = ["team_name", "rider_name", "category", "captain"]
 
-    conn.close()
 
-    return render_template(
-        "admin/reports/index.html",
+    return dict(
         report_type=report_type,
         rows=rows,
         columns=columns,
@@ -256,22 +265,81 @@ def index():
 
 @admin_reports_bp.route("/export")
 def export_report():
-    import datetime
-    import io
-    import pandas as pd
-    from flask import request, send_file, redirect, flash
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet
-
     report_type = request.args.get("report_type", "riders_compact")
     fmt = request.args.get("fmt", "csv")
     category_filter = (request.args.get("category") or "").strip().upper()
     team_filter = (request.args.get("team") or "").strip()
 
+    if report_type not in VALID_REPORTS:
+        flash("Tipo di report non valido", "danger")
+        return redirect("/admin/reports")
+    if fmt not in EXPORT_FORMATS:
+        flash("Formato non supportato", "danger")
+        return redirect("/admin/reports")
+
+    # 🌊 CSV in streaming: niente DataFrame né buffer completo in memoria
+    if fmt == "csv":
+        return Response(
+            stream_with_context(stream_export_csv(report_type, category_filter, team_filter)),
+            mimetype=EXPORT_FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename={report_type}.csv"},
+        )
+
     conn = get_db()
-    df = pd.DataFrame()
+
+    # 🖨️ PDF: rendering in background, il client attende sulla pagina di stato
+    if fmt == "pdf":
+        df = load_export_data(conn, report_type, category_filter, team_filter)
+        conn.close()
+        job_id = export_jobs.submit_pdf(report_type, df)
+        if export_jobs.job_file(job_id):
+            return redirect(url_for("admin_reports.export_download", job_id=job_id))
+        return redirect(url_for("admin_reports.export_status", job_id=job_id))
+
+    payload = _report_cache.get_or_build(
+        conn,
+        ("export", report_type, category_filter, team_filter, fmt),
+        lambda: render_export(load_export_data(conn, report_type, category_filter, team_filter), report_type, fmt),
+    )
+    conn.close()
+
+    return send_file(
+        io.BytesIO(payload),
+        as_attachment=True,
+        download_name=f"{report_type}.{fmt}",
+        mimetype=EXPORT_FORMATS[fmt]
+    )
+
+
+@admin_reports_bp.route("/export/status/<job_id>")
+def export_status(job_id):
+    status = export_jobs.job_status(job_id)
+    if request.args.get("format") == "json":
+        return jsonify(status)
+    if status["status"] == "done":
+        return redirect(url_for("admin_reports.export_download", job_id=job_id))
+    if status["status"] == "unknown":
+        flash("❌ Export non trovato o scaduto", "danger")
+        return redirect("/admin/reports")
+    return render_template("admin/reports/export_status.html", job=status)
+
+
+@admin_reports_bp.route("/export/download/<job_id>")
+def export_download(job_id):
+    path = export_jobs.job_file(job_id)
+    if not path:
+        abort(404)
+    report_type = export_jobs.job_status(job_id).get("report_type") or "report"
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=f"{report_type}.pdf",
+        mimetype=EXPORT_FORMATS["pdf"]
+    )
+
+
+def export_query(report_type, category_filter, team_filter):
+    """Query e parametri dei dati da esportare per ogni tipo di report."""
     params = []
 
     # ------------------------
@@ -293,14 +361,6 @@ def export_report():
             query += " AND TRIM(UPPER(r.category)) = ?"
             params.append(category_filter)
         query += " GROUP BY r.zwift_power_id, r.name, r.category ORDER BY r.name"
-        df = pd.read_sql_query(query, conn, params=params)
-
-        # pulizia valori nulli
-        df["teams"] = df["teams"].fillna("").astype(str)
-        split_teams = df["teams"].str.split(",", n=1, expand=True)
-        df["team1"] = split_teams[0].fillna("").str.strip()
-        df["team2"] = split_teams[1].fillna("").str.strip() if 1 in split_teams.columns else ""
-        df = df[["zwift_power_id", "name", "category", "team1", "team2"]]
 
     elif report_type == "teams":
         query = """
@@ -308,28 +368,24 @@ def export_report():
                 t.name AS team, 
                 t.category, 
                 COUNT(rt.zwift_power_id) AS n_riders,
-                COALESCE(c.name, '') AS captain
+                COALESCE(MAX(c.name), '') AS captain
             FROM teams t
             LEFT JOIN rider_teams rt ON rt.team_id = t.id
             LEFT JOIN captains c ON c.team_id = t.id
             GROUP BY t.id
             ORDER BY t.category, t.name
         """
-        df = pd.read_sql_query(query, conn)
 
     elif report_type == "lineup":
         query = """
-            SELECT t.name AS team, r.name AS rider, TRIM(UPPER(r.category)) AS category, rl.race_date
-            FROM race_lineup rl
-            JOIN riders r ON r.zwift_power_id = rl.zwift_power_id
-            JOIN teams t ON t.id = rl.team_id
+            SELECT team_name AS team, rider_name AS rider, rider_category AS category, race_date
+            FROM lineup_snapshot
             WHERE 1=1
         """
         if category_filter:
-            query += " AND TRIM(UPPER(r.category)) = ?"
+            query += " AND rider_category = ?"
             params.append(category_filter)
-        query += " ORDER BY t.name, r.name"
-        df = pd.read_sql_query(query, conn, params=params)
+        query += " ORDER BY team_name, rider_name"
 
     elif report_type == "team_composition":
         query = """
@@ -354,16 +410,69 @@ def export_report():
             query += " AND t.name = ?"
             params.append(team_filter)
         query += " ORDER BY t.name, r.name"
-        df = pd.read_sql_query(query, conn, params=params)
 
-    else:
-        flash("Tipo di report non valido", "danger")
-        conn.close()
-        return redirect("/admin/reports")
+    return query, params
 
-    # ✅ chiudi connessione dopo aver caricato df
-    conn.close()
 
+def load_export_data(conn, report_type, category_filter, team_filter):
+    """DataFrame del report da esportare."""
+    if report_type == "lineup":
+        ensure_lineup_snapshot(conn)
+    query, params = export_query(report_type, category_filter, team_filter)
+    df = pd.read_sql_query(query, conn, params=params)
+
+    if report_type in ["riders", "riders_compact"]:
+        # pulizia valori nulli
+        df["teams"] = df["teams"].fillna("").astype(str)
+        split_teams = df["teams"].str.split(",", n=1, expand=True)
+        df["team1"] = split_teams[0].fillna("").str.strip()
+        df["team2"] = split_teams[1].fillna("").str.strip() if 1 in split_teams.columns else ""
+        df = df[["zwift_power_id", "name", "category", "team1", "team2"]]
+
+    return df
+
+
+def stream_export_csv(report_type, category_filter, team_filter):
+    """
+    CSV generato a blocchi dal cursore: memoria costante e primo byte
+    subito. Stesse colonne, separatore e formato di DataFrame.to_csv.
+    La connessione si prende qui, nel contesto della risposta in streaming.
+    """
+    query, params = export_query(report_type, category_filter, team_filter)
+    conn = get_db()
+    if report_type == "lineup":
+        ensure_lineup_snapshot(conn)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+
+    columns = [d[0] for d in cursor.description]
+    riders_report = report_type in ["riders", "riders_compact"]
+    if riders_report:
+        columns = ["zwift_power_id", "name", "category", "team1", "team2"]
+
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=";", lineterminator="\n")
+    writer.writerow(columns)
+
+    while True:
+        rows = cursor.fetchmany(CSV_CHUNK_ROWS)
+        if not rows:
+            break
+        for row in rows:
+            values = ["" if v is None else v for v in row]
+            if riders_report:
+                teams = str(values[3]).split(",", 1)
+                values = values[:3] + [teams[0].strip(), teams[1].strip() if len(teams) > 1 else ""]
+            writer.writerow(values)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate(0)
+
+    yield out.getvalue()
+
+
+def render_export(df, report_type, fmt):
+    """Contenuto del file esportato (bytes) nel formato richiesto."""
     buffer = io.BytesIO()
 
     # ------------------------
@@ -371,8 +480,7 @@ def export_report():
     # ------------------------
     if fmt == "csv":
         df.to_csv(buffer, index=False, sep=";", encoding="utf-8")
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name=f"{report_type}.csv", mimetype="text/csv")
+        return buffer.getvalue()
 
     # ------------------------
     # Esportazione XLSX
@@ -380,317 +488,15 @@ def export_report():
     elif fmt == "xlsx":
         with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
             df.to_excel(writer, index=False, sheet_name="Report")
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name=f"{report_type}.xlsx",
-                         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        return buffer.getvalue()
 
     # ------------------------
     # Esportazione PDF
     # ------------------------
 
     elif fmt == "pdf":
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.pagesizes import landscape, A4
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.lib import colors
-
-    # Footer con data/ora
-        def footer(canvas, doc):
-            canvas.saveState()
-            canvas.setFont("Helvetica", 6)
-            canvas.drawString(doc.leftMargin, 15, f"Generato il {datetime.datetime.now():%d %B %Y %H:%M}")
-            canvas.restoreState()
-
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=landscape(A4),
-            leftMargin=30,
-            rightMargin=30,
-            topMargin=30,
-            bottomMargin=30
-        )
-        styles = getSampleStyleSheet()
-        elements = []
-
-    # Colori ed emoji per le categorie
-        color_map = {
-            "A": colors.HexColor("#dc3545"),
-            "B": colors.HexColor("#28a745"),
-            "C": colors.HexColor("#17a2b8"),
-            "D": colors.HexColor("#ffc107"),
-            "OTHER": colors.HexColor("#6c757d")
-        }
-        emoji_map = {
-            "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
-        }
-
-    # --- Report: teams ---
-        if report_type == "teams":
-            if df.empty or "team" not in df.columns:
-                elements.append(Paragraph("Nessun dato disponibile per i teams.", styles["Normal"]))
-            else:
-                df["category"] = df["category"].fillna("OTHER").str.upper().str.strip()
-                df = df.sort_values(by=["category", "team"])
-                grouped = df.groupby("category")
-
-                for cat, group in grouped:
-                    emoji = emoji_map.get(cat, "⚫")
-                    elements.append(Paragraph(f"{emoji} Categoria {cat}", styles["Heading4"]))
-
-                    data = [["Team", "N. Riders", "Capitano"]]
-                    for _, row in group.iterrows():
-                        team_name = str(row.get("team") or "—")
-                        n_riders = str(int(row.get("n_riders") or 0))
-                        captain = str(row.get("captain") or "—")
-                        data.append([team_name, n_riders, captain])
-
-                    table = Table(data, colWidths=[250, 60, 180], hAlign="LEFT")
-                    table.setStyle(TableStyle([
-                        ("BACKGROUND", (0, 0), (-1, 0), color_map.get(cat, colors.HexColor("#f0f0f0"))),
-                        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                        ("FONTSIZE", (0, 0), (-1, -1), 7),
-                        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-                        ("LEFTPADDING", (0, 0), (-1, -1), 3),
-                        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-                        ("TOPPADDING", (0, 0), (-1, -1), 1),
-                        ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
-                    ]))
-                    elements.append(table)
-
-                    total = int(group["n_riders"].fillna(0).sum())
-                    elements.append(Paragraph(f"<i>Totale rider: {total}</i>", styles["Normal"]))
-                    elements.append(Spacer(1, 6))
-
-
-
-        # --- Report: Team Composition (ordinato per categoria) ---
-
-        elif report_type == "team_composition":
-            if df.empty or "team_name" not in df.columns:
-                elements.append(Paragraph("Nessun dato disponibile.", styles["Normal"]))
-            else:
-                from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-                from reportlab.lib.pagesizes import A4
-
-                # Funzione per il piè di pagina
-                def footer(canvas, doc):
-                    canvas.saveState()
-                    canvas.setFont("Helvetica", 8)
-                    canvas.drawString(doc.leftMargin, 15, f"Pagina {doc.page}")
-                    canvas.restoreState()
-
-                # Mappa colori e emoji per categoria
-                color_map = {
-                    "A": colors.HexColor("#dc3545"),
-                    "B": colors.HexColor("#28a745"),
-                    "C": colors.HexColor("#17a2b8"),
-                    "D": colors.HexColor("#ffc107"),
-                    "OTHER": colors.HexColor("#6c757d")
-                }
-                emoji_map = {
-                    "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
-                }
-
-                # Normalizza e ordina
-                category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
-                df["category_clean"] = df["category"].fillna("OTHER").str.upper()
-                df["category_order"] = df["category_clean"].map(lambda x: category_order.get(x, 99))
-                df = df.sort_values(by=["category_order", "team_name", "rider_name"])
-
-                # Costruzione blocchi team
-                team_blocks = []
-                ordered_teams = df["team_name"].drop_duplicates()
-
-                for team in ordered_teams:
-                    group = df[df["team_name"] == team]
-                    riders = group.to_dict(orient="records")
-                    cat = riders[0].get("category_clean", "OTHER") if riders else "OTHER"
-                    header_color = color_map.get(cat, colors.HexColor("#6c757d"))
-                    emoji = emoji_map.get(cat, "⚫")
-                    captain = riders[0].get("captain", "")
-
-                    # Titolo del team
-                    title_text = f"<b>{emoji} {team}</b>"
-                    if captain:
-                        title_text += f" — Capitano: {captain}"
-                    title = Paragraph(title_text, styles["Heading4"])
-                    spacer = Spacer(1, 4)
-
-                    # Tabella con intestazione + 12 righe
-                    data = [["Rider", "Categoria"]]
-                    for i in range(12):
-                        if i < len(riders):
-                            r = riders[i]
-                            categoria = f"{emoji} {r.get('category','')}" if r.get("category") else ""
-                            data.append([r.get("rider_name",""), categoria])
-                        else:
-                            data.append(["", ""])
-
-                    table = Table(data, colWidths=[140, 60])
-                    table.setStyle(TableStyle([
-                        ("BACKGROUND", (0, 0), (-1, 0), header_color),
-                        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                        ("FONTSIZE", (0, 0), (-1, -1), 8),
-                        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-                        ("TOPPADDING", (0, 0), (-1, -1), 2),
-                    ]))
-
-                    team_blocks.append([title, spacer, table, Spacer(1, 6)])
-
-                # Impaginazione in griglia 2x2 per pagina
-                elements = []
-
-                # Titolo del report
-                report_title = Paragraph("<b>Composizione Squadre</b>", styles["Title"])
-                elements.append(report_title)
-                elements.append(Spacer(1, 12))
-                
-                for i in range(0, len(team_blocks), 4):
-                    page_blocks = team_blocks[i:i+4]
-                    while len(page_blocks) < 4:
-                        page_blocks.append([Spacer(1, 0)])  # riempi con vuoti
-
-                    grid = [
-                        [page_blocks[0], page_blocks[1]],
-                        [page_blocks[2], page_blocks[3]]
-                    ]
-                    table = Table(grid, colWidths=[260, 260])
-                    table.setStyle(TableStyle([
-                        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-                        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-                    ]))
-                    elements.append(table)
-                    elements.append(Spacer(1, 12))
-
-        # --- Report: Lineup ---
-        elif report_type == "lineup":
-            if df.empty:
-                elements.append(Paragraph("Nessuna lineup disponibile.", styles["Normal"]))
-            else:
-                # Normalizza e ordina per categoria
-                df["category"] = df["category"].fillna("OTHER").str.upper().str.strip()
-
-                category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
-                df["category_order"] = df["category"].map(lambda x: category_order.get(x, 99))
-                df = df.sort_values(by=["category_order", "team", "rider"])
-
-                # Mappa colori e emoji
-                color_map = {
-                    "A": colors.HexColor("#dc3545"),
-                    "B": colors.HexColor("#28a745"),
-                    "C": colors.HexColor("#17a2b8"),
-                    "D": colors.HexColor("#ffc107"),
-                    "OTHER": colors.HexColor("#6c757d")
-                }
-                emoji_map = {
-                    "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
-                }
-
-                # Costruisci blocchi per ogni team (ordinati per categoria)
-                team_blocks = []
-
-                # Normalizza e prepara colonna categoria
-                df["category"] = df.get("category", "OTHER").fillna("OTHER").astype(str).str.upper().str.strip()
-
-                # Mappa ordine categorie
-                category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
-                df["category_order"] = df["category"].map(lambda x: category_order.get(x, 99))
-
-                # Ordina prima per categoria, poi per nome team e rider
-                df = df.sort_values(by=["category_order", "team", "rider"], na_position="last")
-
-                # Elenco team univoci ordinati per categoria
-                ordered_teams = (
-                    df[["team", "category", "category_order"]]
-                    .drop_duplicates(subset=["team"])
-                    .sort_values(by=["category_order", "team"])
-                )
-
-                for _, row in ordered_teams.iterrows():
-                    team = row.get("team", "Senza Team")
-                    cat = row.get("category", "OTHER")
-                    header_color = color_map.get(cat, colors.HexColor("#6c757d"))
-                    emoji = emoji_map.get(cat, "⚫")
-
-                    # Titolo del team
-                    title_text = f"<b>{emoji} {team}</b> <font size=8>(Cat. {cat})</font>"
-                    title = Paragraph(title_text, styles["Heading4"])
-                    spacer = Spacer(1, 3)
-
-                    # Filtra i rider del team corrente
-                    group = df[df["team"] == team]
-
-                    # Tabella con intestazione + 6 righe
-                    data = [["Rider", "Categoria", "Data Gara", "Capitano"]]
-                    for _, r in group.head(6).iterrows():
-                        data.append([
-                            r.get("rider", "—"),
-                            r.get("category", "—"),
-                            r.get("race_date", "—"),
-                            r.get("captain", "—")
-                        ])
-
-
-                    # Riempi con righe vuote fino a 6
-                    while len(data) < 7:
-                        data.append(["", "", ""])
-
-                    # Tabella compatta per stare nel layout 2×2
-                    table = Table(data, colWidths=[100, 40, 50, 60])
-                    table.setStyle(TableStyle([
-                        ("BACKGROUND", (0, 0), (-1, 0), header_color),
-                        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                        ("FONTSIZE", (0, 0), (-1, -1), 7),
-                        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                        ("TOPPADDING", (0, 0), (-1, -1), 2),
-                        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-                    ]))
-
-                    team_blocks.append([title, spacer, table, Spacer(1, 6)])
-
-
-
-                # Impaginazione 2×2 per pagina
-                elements.append(Paragraph("<b>Lineup Team</b>", styles["Title"]))
-                elements.append(Spacer(1, 12))
-
-                for i in range(0, len(team_blocks), 4):
-                    page_blocks = team_blocks[i:i+4]
-                    while len(page_blocks) < 4:
-                        page_blocks.append([Spacer(1, 0)])  # riempi spazi vuoti
-
-                    grid = [
-                        [page_blocks[0], page_blocks[1]],
-                        [page_blocks[2], page_blocks[3]]
-                    ]
-
-                    grid_table = Table(grid, colWidths=[260, 260])
-                    grid_table.setStyle(TableStyle([
-                        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-                        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-                    ]))
-                    elements.append(grid_table)
-                    elements.append(Spacer(1, 12))
-
-
-
-# Costruzione PDF
-
-        doc.build(elements, onFirstPage=footer, onLaterPages=footer)
-        buffer.seek(0)
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f"{report_type}.pdf",
-            mimetype="application/pdf"
-        )
-    
+        return render_report_pdf(df, report_type)
+
 # ------------------------
 # EXPORT HTML
 # ------------------------
@@ -821,20 +627,6 @@ def export_report():
             </html>
             """
 
-        # --------------------------
-        # Invio come file scaricabile
-        # --------------------------
-        buffer = io.BytesIO(html_full.encode("utf-8"))
-        buffer.seek(0)
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=f"{report_type}.html",
-            mimetype="text/html"
-        )
-
-
+        return html_full.encode("utf-8")
 
-    # ✅ Fuori dal blocco 'elif fmt == "pdf":'
-    flash("Formato non supportato", "danger")
-    return redirect("/admin/reports")
+    raise ValueError(f"Formato non supportato: {fmt}")
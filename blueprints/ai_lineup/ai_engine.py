@@ -1,29 +1,378 @@
 # blueprints/ai_lineup/ai_engine.py
-import random
+"""
+Motore delle formazioni AI.
+
+Punteggio deterministico dei rider (dati reali della tabella riders) e
+assegnazione esatta e simultanea dei rider a tutte le formazioni di una
+data gara, con gli stessi vincoli delle rotte admin:
+- al massimo 6 rider per formazione;
+- scala delle categorie di admin_teams.manage_team_members (un rider
+  può correre per un team della sua categoria o di una superiore);
+- al massimo 2 team per rider (solo i team di rider_teams);
+- un rider in una sola formazione per race_date;
+- disponibilità (riders.available_zrl e tabella availability).
+"""
+import time
+import logging
+
+from utils.lineup import MAX_LINEUP_RIDERS
+from utils.race_profiles import profili_per_data
+from .min_cost_flow import FlowGraph
+from .scoring import (
+    DEFAULT_ROLE_SCORE, RACE_TYPES, ROLE_ROUTE_SCORES, ROLES, SCORE_WEIGHTS,
+    calcola_scores, carica_colonne, compatibilita_ruoli,
+)
+
+# Tipo "auto": punteggio sul profilo delle gare reali della data (race_profiles)
+AUTO_RACE_TYPE = "auto"
+
+# Scala delle categorie, come in admin_teams.manage_team_members
+CATEGORY_LADDER = ["D", "C", "B", "A"]
+MAX_TEAMS_PER_RIDER = 2
+
+# Un rider che corre in una categoria superiore rende meno (salti nella scala)
+CATEGORY_GAP_FACTOR = {0: 1.0, 1: 0.85, 2: 0.7, 3: 0.55}
+
+# Stati di availability (captain/view_availability e captain/availability)
+UNAVAILABLE_STATUSES = {"assente", "unavailable"}
+UNCERTAIN_STATUSES = {"incerto", "maybe"}
+UNCERTAIN_FACTOR = 0.8
+
+
+# ===============================================================
+# 🧮 PUNTEGGIO
+# ===============================================================
+# Versione per un singolo rider; per il club intero si usa
+# scoring.calcola_scores, che applica le stesse regole sulle colonne.
+
+def normalize_category(category):
+    """Categoria maiuscola senza spazi, A+ → A."""
+    category = (category or "").strip().upper()
+    return "A" if category == "A+" else category
+
+
+def category_allowed(rider_category, team_category):
+    """Regola di admin_teams: indice del rider <= indice del team nella scala D, C, B, A."""
+    rider_category = normalize_category(rider_category)
+    team_category = normalize_category(team_category)
+    if rider_category not in CATEGORY_LADDER or team_category not in CATEGORY_LADDER:
+        return False
+    return CATEGORY_LADDER.index(rider_category) <= CATEGORY_LADDER.index(team_category)
+
 
 def match_role_score(ruolo, race_type):
-    """Compatibilità tra ruolo e tipo di percorso."""
-    mappa = {
-        "climber": {"montagna": 1.0, "pianura": 0.6, "cronosquadre": 0.8},
-        "rouleur": {"montagna": 0.7, "pianura": 1.0, "cronosquadre": 0.9},
-        "sprinter": {"montagna": 0.4, "pianura": 1.0, "cronosquadre": 0.7},
-        "all-rounder": {"montagna": 0.8, "pianura": 0.8, "cronosquadre": 0.8},
-    }
-    return mappa.get(ruolo, {}).get(race_type, 0.7)
+    """Compatibilità tra ruolo e tipo di percorso (o profilo di gara)."""
+    if isinstance(race_type, dict):
+        return float(compatibilita_ruoli(race_type)[ROLES.index(ruolo)]) if ruolo in ROLES else DEFAULT_ROLE_SCORE
+    return ROLE_ROUTE_SCORES.get(ruolo, {}).get(race_type, DEFAULT_ROLE_SCORE)
+
+
+def ruolo_da_profilo(rider):
+    """Ruolo stimato dal profilo di potenza (rapporto tra 15 secondi e 20 minuti)."""
+    wkg_20 = rider.get("wkg_20min") or 0
+    wkg_15s = rider.get("wkg_15sec") or 0
+    if wkg_20 <= 0:
+        return "all-rounder"
+    sprint_ratio = wkg_15s / wkg_20
+    if sprint_ratio >= 2.8:
+        return "sprinter"
+    if wkg_20 >= 3.8 and (rider.get("weight") or 0) and rider["weight"] < 68:
+        return "climber"
+    if sprint_ratio < 2.2:
+        return "rouleur"
+    return "all-rounder"
+
+
+def forma_da_ranking(ranking):
+    """Forma 0..1 dai punti ranking ZwiftPower (più bassi = migliori)."""
+    if not ranking or ranking <= 0:
+        return 0.5
+    return max(0.0, 1.0 - min(ranking, 1000) / 1000)
+
+
+def prepara_rider(row):
+    """Dati del motore a partire da una riga di riders."""
+    rider = dict(row)
+    weight = rider.get("weight") or 0
+    ftp = rider.get("ftp") or 0
+    rider["ftp"] = ftp
+    rider["peso"] = weight
+    rider["wkg"] = rider.get("wkg_20min") or (ftp / weight if weight else 0)
+    rider["ruolo"] = ruolo_da_profilo(rider)
+    rider["form"] = forma_da_ranking(rider.get("ranking"))
+    rider["category"] = normalize_category(rider.get("category"))
+    return rider
+
 
 def calcola_score(rider, race_type):
-    """Calcola un punteggio finale per ogni rider."""
-    ftp_weight_ratio = rider["ftp"] / rider["peso"]
+    """Calcola un punteggio finale (deterministico) per ogni rider."""
+    ftp_weight_ratio = rider.get("wkg") or (rider["ftp"] / rider["peso"] if rider.get("peso") else 0)
     compatibilita = match_role_score(rider["ruolo"], race_type)
     form = rider["form"]
-    casuale = random.uniform(0.0, 0.05)
-    score = (0.5 * ftp_weight_ratio) + (0.3 * compatibilita) + (0.2 * form) + casuale
+    w_wkg, w_route, w_form = SCORE_WEIGHTS
+    score = (w_wkg * ftp_weight_ratio) + (w_route * compatibilita) + (w_form * form)
     return round(score, 3)
 
-def genera_lineup(riders, race_type, n=6):
-    """Restituisce la formazione migliore basata su AI euristica."""
-    disponibili = [r for r in riders if r.get("disponibile")]
-    for r in disponibili:
-        r["score"] = calcola_score(r, race_type)
-    lineup = sorted(disponibili, key=lambda x: x["score"], reverse=True)[:n]
-    return lineup
+
+def punteggio_assegnazione(rider, team, race_type):
+    """
+    Punteggio atteso del rider in un team: calcola_score ridotto se corre
+    in una categoria superiore alla sua o se la disponibilità è incerta.
+    """
+    gap = CATEGORY_LADDER.index(normalize_category(team["category"])) - CATEGORY_LADDER.index(rider["category"])
+    base = rider["base_score"] if "base_score" in rider else calcola_score(rider, race_type)
+    score = base * CATEGORY_GAP_FACTOR.get(gap, CATEGORY_GAP_FACTOR[3])
+    if rider.get("availability") in UNCERTAIN_STATUSES:
+        score *= UNCERTAIN_FACTOR
+    return round(score, 3)
+
+
+# ===============================================================
+# 📥 DATI DAL DATABASE
+# ===============================================================
+
+def carica_candidati(conn, race_date, team_ids=None, columns=None):
+    """
+    Team da completare, rider candidati e stato di ogni rider in rosa.
+
+    Restituisce (teams, riders, roster):
+    - riders: rider utilizzabili, con "teams" = team compatibili (max 2)
+      e "column" = posizione nelle colonne di scoring.carica_colonne;
+    - roster: {team_id: [(rider_id, nome, motivo_esclusione | None)]}
+      per spiegare i posti rimasti vuoti.
+    I rider già schierati nella data da team esclusi dall'ottimizzazione restano bloccati.
+    """
+    if columns is None:
+        columns = carica_colonne(conn)
+    teams = [dict(row) for row in conn.execute(
+        "SELECT id, name, category FROM teams ORDER BY name"
+    ).fetchall()]
+    if team_ids:
+        wanted = {int(t) for t in team_ids}
+        teams = [t for t in teams if t["id"] in wanted]
+    team_by_id = {t["id"]: t for t in teams}
+
+    blocked = {}
+    for row in conn.execute("""
+        SELECT rl.zwift_power_id, rl.team_id, t.name
+        FROM race_lineup rl
+        LEFT JOIN teams t ON t.id = rl.team_id
+        WHERE rl.race_date = ?
+    """, (race_date,)).fetchall():
+        if row[1] not in team_by_id:
+            blocked[str(row[0])] = row[2] or str(row[1])
+
+    # Disponibilità dichiarata per le gare della data (availability.rider_id = zwift_power_id)
+    availability = {}
+    for row in conn.execute("""
+        SELECT a.rider_id, a.status
+        FROM availability a
+        JOIN races ra ON ra.id = a.race_id
+        WHERE ra.race_date = ?
+    """, (race_date,)).fetchall():
+        status = (row[1] or "").strip().lower()
+        # Se le gare della data sono più di una vale la risposta peggiore
+        if availability.get(str(row[0])) not in UNAVAILABLE_STATUSES:
+            availability[str(row[0])] = status
+
+    rows = conn.execute("""
+        SELECT r.zwift_power_id, r.name, r.category, r.ranking, r.wkg_20min, r.wkg_15sec,
+               r.watt_20min, r.weight, r.ftp, r.is_captain, r.active, r.available_zrl, rt.team_id
+        FROM riders r
+        JOIN rider_teams rt ON rt.zwift_power_id = r.zwift_power_id
+        ORDER BY r.zwift_power_id, rt.team_id
+    """).fetchall()
+
+    riders = {}
+    memberships = {}
+    for row in rows:
+        rider_id = str(row["zwift_power_id"])
+        if rider_id not in riders:
+            rider = dict(row)
+            rider["zwift_power_id"] = rider_id
+            # Ruolo, forma e w/kg già calcolati sulle colonne
+            pos = columns["index"][rider_id]
+            rider["column"] = pos
+            rider["category"] = columns["category"][pos]
+            rider["ruolo"] = ROLES[columns["role"][pos]]
+            rider["form"] = float(columns["form"][pos])
+            rider["wkg"] = float(columns["wkg"][pos])
+            rider["availability"] = availability.get(rider_id)
+            rider.pop("team_id", None)
+            riders[rider_id] = rider
+            memberships[rider_id] = []
+        memberships[rider_id].append(row["team_id"])
+
+    roster = {t["id"]: [] for t in teams}
+    for rider_id, rider in riders.items():
+        rider["teams"] = []
+        for position, team_id in enumerate(memberships[rider_id]):
+            if team_id not in team_by_id:
+                continue
+            if not rider.get("active"):
+                reason = "inattivo"
+            elif not rider.get("available_zrl") or rider["availability"] in UNAVAILABLE_STATUSES:
+                reason = "non disponibile"
+            elif rider_id in blocked:
+                reason = f"già schierato con {blocked[rider_id]}"
+            elif position >= MAX_TEAMS_PER_RIDER:
+                # Oltre 2 team è un errore nei dati: valgono solo i primi due
+                reason = "oltre il limite di 2 team"
+            elif not category_allowed(rider["category"], team_by_id[team_id]["category"]):
+                reason = "categoria non ammessa"
+            else:
+                reason = None
+                rider["teams"].append(team_id)
+            roster[team_id].append((rider_id, rider["name"], reason))
+
+    return teams, [r for r in riders.values() if r["teams"]], roster
+
+
+# ===============================================================
+# 🌳 ASSEGNAZIONE SIMULTANEA (flusso di costo minimo)
+# ===============================================================
+# Il punteggio dipende dalla coppia rider-team (categoria, disponibilità):
+# l'assegnazione migliore di tutti i rider a tutte le formazioni è un
+# b-matching di peso massimo, risolto esattamente con un flusso di costo
+# minimo. Il tempo cresce con rider × team compatibili (al massimo 2 per
+# rider), quindi resta piatto anche con centinaia di rider.
+
+def assegna_formazioni(teams, riders, race_type, max_riders=MAX_LINEUP_RIDERS):
+    """
+    Assegna i rider alle formazioni massimizzando la somma dei punteggi.
+    Restituisce {"assignment": {team_id: [rider, ...]}, "score", "elapsed_ms"}.
+    """
+    t0 = time.perf_counter()
+    team_by_id = {t["id"]: t for t in teams}
+    team_node = {t["id"]: 1 + len(riders) + i for i, t in enumerate(teams)}
+    source, sink = 0, 1 + len(riders) + len(teams)
+    graph = FlowGraph(sink + 1)
+
+    edges = []
+    for i, rider in enumerate(riders, start=1):
+        graph.add_edge(source, i, 1, 0)
+        for team_id in rider["teams"]:
+            score = punteggio_assegnazione(rider, team_by_id[team_id], race_type)
+            # Costi interi (millesimi di punto): niente errori di arrotondamento nei confronti
+            edge = graph.add_edge(i, team_node[team_id], 1, -int(round(score * 1000)))
+            edges.append((edge, rider, team_id, score))
+    for team in teams:
+        graph.add_edge(team_node[team["id"]], sink, max_riders, 0)
+
+    graph.max_profit_flow(source, sink)
+
+    assignment = {t["id"]: [] for t in teams}
+    total = 0.0
+    for edge, rider, team_id, score in edges:
+        if graph.flow_on(edge):
+            assignment[team_id].append(dict(rider, score=score))
+            total += score
+    for team_riders in assignment.values():
+        team_riders.sort(key=lambda r: (-r["score"], r["name"]))
+
+    return {
+        "assignment": assignment,
+        "score": round(total, 3),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def spiega_posti_vuoti(teams, assignment, roster, max_riders=MAX_LINEUP_RIDERS):
+    """Per ogni team con meno di max_riders rider: quanti posti mancano e perché."""
+    team_names = {t["id"]: t["name"] for t in teams}
+    assigned_to = {
+        rider["zwift_power_id"]: team_id
+        for team_id, team_riders in assignment.items()
+        for rider in team_riders
+    }
+
+    explanations = {}
+    for team in teams:
+        missing = max_riders - len(assignment[team["id"]])
+        if missing <= 0:
+            continue
+        reasons = {}
+        for rider_id, name, reason in roster[team["id"]]:
+            if reason is None:
+                other = assigned_to.get(rider_id)
+                if other == team["id"]:
+                    continue
+                reason = f"assegnato a {team_names[other]}" if other else "punteggio inferiore"
+            reasons.setdefault(reason, []).append(name)
+
+        if not roster[team["id"]]:
+            summary = "nessun rider in rosa (rider_teams)"
+        else:
+            usable = sum(1 for _, _, reason in roster[team["id"]] if reason is None)
+            summary = f"{usable} rider utilizzabili su {len(roster[team['id']])} in rosa"
+        explanations[team["id"]] = {
+            "missing": missing,
+            "summary": summary,
+            "reasons": sorted(reasons.items(), key=lambda item: -len(item[1])),
+        }
+    return explanations
+
+
+def profilo_gara(conn, race_date):
+    """
+    Profilo delle gare reali della data: media dei pesi per tipo di percorso
+    delle gare in race_profiles (None se la data non ha gare).
+    """
+    profiles = profili_per_data(conn, race_date)
+    if not profiles:
+        # I profili si calcolano all'import (e nella migrazione 0008), mai per richiesta
+        logging.info(f"ℹ️ Nessun profilo di gara per il {race_date}")
+        return None
+    profile = {
+        f"weight_{t}": sum(p[f"weight_{t}"] for p in profiles) / len(profiles)
+        for t in RACE_TYPES
+    }
+    profile["race_type"] = max(RACE_TYPES, key=lambda t: profile[f"weight_{t}"])
+    profile["races"] = profiles
+    return profile
+
+
+def genera_lineup(conn, race_date, race_type=AUTO_RACE_TYPE, team_ids=None, n=MAX_LINEUP_RIDERS):
+    """
+    Formazioni migliori per la data gara, a partire dai rider reali.
+    race_type è un tipo di RACE_TYPES oppure AUTO_RACE_TYPE (profilo delle gare della data).
+    Restituisce il risultato di assegna_formazioni più:
+    - "lineup": righe piatte (team_name, rider_name, category, is_captain, score) per il template;
+    - "unfilled": spiegazione dei posti vuoti per team;
+    - "profile": profilo di gara usato (solo con AUTO_RACE_TYPE).
+    """
+    profile = None
+    if race_type == AUTO_RACE_TYPE:
+        profile = profilo_gara(conn, race_date)
+    race = profile or (race_type if race_type in RACE_TYPES else RACE_TYPES[0])
+
+    columns = carica_colonne(conn)
+    teams, riders, roster = carica_candidati(conn, race_date, team_ids, columns)
+    # Punteggi di tutto il club in un solo passaggio NumPy
+    scores = calcola_scores(columns, race)
+    for rider in riders:
+        rider["base_score"] = float(scores[rider["column"]])
+    result = assegna_formazioni(teams, riders, race, max_riders=n)
+
+    lineup = []
+    for team in teams:
+        for rider in result["assignment"][team["id"]]:
+            lineup.append({
+                "team_id": team["id"],
+                "team_name": team["name"],
+                "team_category": normalize_category(team["category"]),
+                "zwift_power_id": rider["zwift_power_id"],
+                "rider_name": rider["name"],
+                "category": rider["category"],
+                "ruolo": rider["ruolo"],
+                "availability": rider["availability"],
+                "is_captain": rider.get("is_captain"),
+                "ranking": rider.get("ranking"),
+                "score": rider["score"],
+            })
+    result["lineup"] = lineup
+    result["teams"] = teams
+    result["candidates"] = len(riders)
+    result["profile"] = profile
+    result["unfilled"] = spiega_posti_vuoti(teams, result["assignment"], roster, max_riders=n)
+    return result
@@ -0,0 +1,114 @@
+# blueprints/ai_lineup/min_cost_flow.py
+"""
+Flusso di costo minimo (cammini minimi successivi con potenziali).
+
+Usato per l'assegnazione simultanea dei rider alle formazioni:
+sorgente → rider (capacità 1) → team compatibili (costo = -punteggio)
+→ pozzo (capacità = posti in formazione). Ogni aumento usa Dijkstra sui
+costi ridotti, quindi il tempo cresce con rider × team compatibili e non
+in modo combinatorio.
+"""
+import heapq
+from collections import deque
+
+
+class FlowGraph:
+    """Grafo orientato con capacità e costi interi."""
+
+    def __init__(self, n_nodes):
+        self.n = n_nodes
+        # Per ogni nodo: lista di archi [destinazione, capacità residua, costo, indice arco inverso]
+        self.adj = [[] for _ in range(n_nodes)]
+
+    def add_edge(self, u, v, capacity, cost):
+        """Aggiunge l'arco u → v; restituisce (u, indice) per leggerne il flusso."""
+        self.adj[u].append([v, capacity, cost, len(self.adj[v])])
+        self.adj[v].append([u, 0, -cost, len(self.adj[u]) - 1])
+        return u, len(self.adj[u]) - 1
+
+    def flow_on(self, edge):
+        """Flusso passato sull'arco restituito da add_edge."""
+        u, i = edge
+        v, _, _, rev = self.adj[u][i]
+        return self.adj[v][rev][1]
+
+    def _initial_potentials(self, source):
+        """Bellman-Ford (SPFA) iniziale: i costi negativi rendono necessari i potenziali."""
+        dist = [float("inf")] * self.n
+        dist[source] = 0
+        queue = deque([source])
+        in_queue = [False] * self.n
+        in_queue[source] = True
+        while queue:
+            u = queue.popleft()
+            in_queue[u] = False
+            for v, cap, cost, _ in self.adj[u]:
+                if cap > 0 and dist[u] + cost < dist[v]:
+                    dist[v] = dist[u] + cost
+                    if not in_queue[v]:
+                        queue.append(v)
+                        in_queue[v] = True
+        return [d if d < float("inf") else 0 for d in dist]
+
+    def max_profit_flow(self, source, sink):
+        """
+        Aumenta il flusso finché il cammino migliore ha costo negativo
+        (cioè finché aggiungere un rider migliora il punteggio totale).
+        Restituisce (flusso, costo totale).
+        """
+        potential = self._initial_potentials(source)
+        flow = cost_total = 0
+
+        inf = float("inf")
+        adj = self.adj
+        while True:
+            dist = [inf] * self.n
+            prev = [None] * self.n
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if u == sink:
+                    # Basta il cammino fino al pozzo: il resto del grafo non serve
+                    break
+                base = d + potential[u]
+                for i, edge in enumerate(adj[u]):
+                    if edge[1] <= 0:
+                        continue
+                    v = edge[0]
+                    nd = base + edge[2] - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+
+            if dist[sink] == inf:
+                break
+            path_cost = dist[sink] + potential[sink] - potential[source]
+            if path_cost >= 0:
+                break
+
+            # Potenziali limitati alla distanza del pozzo: i costi ridotti restano >= 0
+            limit = dist[sink]
+            for v, d in enumerate(dist):
+                potential[v] += d if d < limit else limit
+
+            # Capacità del cammino (qui sempre 1: gli archi sorgente → rider hanno capacità 1)
+            push, v = float("inf"), sink
+            while v != source:
+                u, i = prev[v]
+                push = min(push, self.adj[u][i][1])
+                v = u
+            v = sink
+            while v != source:
+                u, i = prev[v]
+                edge = self.adj[u][i]
+                edge[1] -= push
+                self.adj[v][edge[3]][1] += push
+                v = u
+
+            flow += push
+            cost_total += push * path_cost
+        return flow, cost_total
@@ -1,26 +1,141 @@
 # blueprints/ai_lineup/routes.py
-from flask import Blueprint, render_template, request
-from .ai_engine import genera_lineup
+from datetime import date
+
+from flask import Blueprint, render_template, request, session, flash, redirect, url_for
+from db import get_zrl_db
+from utils.auth import require_roles
+from utils.lineup import save_lineups, lineup_error_message
+from .ai_engine import genera_lineup, normalize_category, RACE_TYPES, AUTO_RACE_TYPE
+from .simulation import simula_gara
 
 ai_lineup_bp = Blueprint('ai_lineup', __name__)
 
-# ⚠️ Dati fittizi d’esempio (poi li prenderemo dal database)
-riders = [
-    {"nome": "Mario Rossi", "ftp": 300, "peso": 70, "ruolo": "climber", "form": 0.9, "disponibile": True},
-    {"nome": "Luca Verdi", "ftp": 285, "peso": 75, "ruolo": "rouleur", "form": 0.8, "disponibile": True},
-    {"nome": "Giorgio Neri", "ftp": 310, "peso": 78, "ruolo": "sprinter", "form": 0.7, "disponibile": False},
-    {"nome": "Andrea Blu", "ftp": 270, "peso": 68, "ruolo": "climber", "form": 0.95, "disponibile": True},
-    {"nome": "Pietro Gialli", "ftp": 260, "peso": 80, "ruolo": "rouleur", "form": 0.85, "disponibile": True},
-    {"nome": "Simone Rosa", "ftp": 280, "peso": 73, "ruolo": "all-rounder", "form": 0.75, "disponibile": True},
-]
 
 @ai_lineup_bp.route('/ai-lineup', methods=['GET', 'POST'])
+@require_roles(["admin", "captain"])
 def ai_lineup():
-    lineup = None
-    race_type = None
+    conn = get_zrl_db()
+
+    # 🔹 Prossime date gara e team selezionabili
+    race_dates = [row[0] for row in conn.execute("""
+        SELECT DISTINCT race_date FROM races
+        WHERE race_date >= DATE('now')
+        ORDER BY race_date ASC
+    """).fetchall()]
+    all_teams = conn.execute("SELECT id, name, category FROM teams ORDER BY name").fetchall()
+
+    race_date = request.values.get('race_date') or (race_dates[0] if race_dates else None)
+    race_type = request.values.get('race_type') or AUTO_RACE_TYPE
+    team_ids = [t for t in request.values.getlist('team_ids') if t]
+
+    race = None
+    result = None
+    if race_date and (request.method == 'POST' or request.args.get('race_date')):
+        race = conn.execute(
+            "SELECT * FROM races WHERE race_date = ? ORDER BY name LIMIT 1", (race_date,)
+        ).fetchone()
+        result = genera_lineup(conn, race_date, race_type, team_ids=team_ids)
+
+        # 💾 Applica: salva tutte le formazioni proposte in una sola transazione
+        if request.form.get('action') == 'apply':
+            if session.get('user_role') != 'admin':
+                flash("⛔ Solo gli admin possono applicare le formazioni", "danger")
+            else:
+                saved = save_lineups(conn, race_date, {
+                    team_id: [r["zwift_power_id"] for r in team_riders]
+                    for team_id, team_riders in result["assignment"].items()
+                })
+                if saved["saved"]:
+                    n_riders = sum(len(ids) for ids in saved["riders"].values())
+                    flash(f"✅ Formazioni salvate: {n_riders} rider in {len(saved['riders'])} team", "success")
+                else:
+                    flash(lineup_error_message(saved), "danger")
+            conn.close()
+            return redirect(url_for('ai_lineup.ai_lineup', race_date=race_date, race_type=race_type, team_ids=team_ids))
+
+    conn.close()
+    return render_template(
+        'ai_lineup.html',
+        lineup=result["lineup"] if result else None,
+        result=result,
+        race=race,
+        race_date=race_date,
+        race_dates=race_dates,
+        race_type=race_type,
+        race_types=[AUTO_RACE_TYPE] + RACE_TYPES,
+        auto_race_type=AUTO_RACE_TYPE,
+        all_teams=all_teams,
+        team_ids=team_ids,
+    )
+
+
+# ===============================================================
+# 🎲 SIMULAZIONE DELLE VARIANTI DI FORMAZIONE
+# ===============================================================
+SIM_VARIANTS = 3
+
+
+@ai_lineup_bp.route('/ai-lineup/simulate', methods=['GET', 'POST'])
+@require_roles(["admin", "captain"])
+def simulate():
+    conn = get_zrl_db()
+
+    races = conn.execute("""
+        SELECT r.id, r.name, r.race_date, r.format, r.course
+        FROM races r
+        JOIN race_profiles p ON p.race_id = r.id
+        ORDER BY r.race_date DESC, r.name
+        LIMIT 40
+    """).fetchall()
+    all_teams = conn.execute("SELECT id, name, category FROM teams ORDER BY name").fetchall()
+
+    # Gara di default: la prossima in calendario, altrimenti la più recente
+    today = date.today().isoformat()
+    upcoming = [r for r in races if r["race_date"] >= today]
+    race_id = request.values.get('race_id', type=int) or (
+        (upcoming[-1] if upcoming else races[0])["id"] if races else None
+    )
+    team_id = request.values.get('team_id', type=int) or (all_teams[0]["id"] if all_teams else None)
+    race = next((r for r in races if r["id"] == race_id), None)
+    team = next((t for t in all_teams if t["id"] == team_id), None)
+
+    roster, variants, result = [], [], None
+    if race and team:
+        roster = conn.execute("""
+            SELECT r.zwift_power_id, r.name, r.category
+            FROM rider_teams rt
+            JOIN riders r ON r.zwift_power_id = rt.zwift_power_id
+            WHERE rt.team_id = ?
+            ORDER BY r.name
+        """, (team_id,)).fetchall()
+
+        variants = [request.values.getlist(f'v{i}') for i in range(1, SIM_VARIANTS + 1)]
+        if not any(variants):
+            # Prima apertura: formazione salvata e proposta AI a confronto
+            saved = [str(row[0]) for row in conn.execute(
+                "SELECT zwift_power_id FROM race_lineup WHERE team_id = ? AND race_date = ?",
+                (team_id, race["race_date"]),
+            ).fetchall()]
+            proposal = genera_lineup(conn, race["race_date"], AUTO_RACE_TYPE, team_ids=[team_id])
+            variants = [saved, [r["zwift_power_id"] for r in proposal["assignment"][team_id]], []]
 
-    if request.method == 'POST':
-        race_type = request.form.get('race_type')
-        lineup = genera_lineup(riders, race_type)
+        to_simulate = [(i, v) for i, v in enumerate(variants) if v]
+        if to_simulate:
+            result = simula_gara(
+                conn, race_id, [v for _, v in to_simulate],
+                category=normalize_category(team["category"]),
+            )
+            if result:
+                result["variants"] = [i for i, _ in to_simulate]
 
-    return render_template('ai_lineup.html', lineup=lineup, race_type=race_type)
+    conn.close()
+    return render_template(
+        'ai_simulation.html',
+        races=races,
+        race=race,
+        all_teams=all_teams,
+        team=team,
+        roster=roster,
+        variants=variants,
+        result=result,
+    )
@@ -0,0 +1,156 @@
+# blueprints/ai_lineup/scoring.py
+"""
+Punteggio vettoriale dei rider (NumPy).
+
+La tabella riders viene caricata una volta in array colonna (ftp, peso,
+watt e wkg 20 minuti, wkg 15 secondi, ranking, categoria) con ruolo, forma e w/kg
+già derivati; la cache si invalida con la versione di riders in
+data_versions. I punteggi di tutto il club per uno o più tipi di gara
+(o profili di gare reali) si calcolano in un solo passaggio, con la
+compatibilità ruolo/percorso letta da una matrice precalcolata.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.cache import VersionedCache
+
+# Compatibilità tra ruolo e tipo di percorso
+ROLE_ROUTE_SCORES = {
+    "climber": {"montagna": 1.0, "pianura": 0.6, "cronosquadre": 0.8},
+    "rouleur": {"montagna": 0.7, "pianura": 1.0, "cronosquadre": 0.9},
+    "sprinter": {"montagna": 0.4, "pianura": 1.0, "cronosquadre": 0.7},
+    "all-rounder": {"montagna": 0.8, "pianura": 0.8, "cronosquadre": 0.8},
+}
+RACE_TYPES = ["pianura", "montagna", "cronosquadre"]
+DEFAULT_ROLE_SCORE = 0.7
+
+# Pesi del punteggio: w/kg, compatibilità col percorso, forma
+SCORE_WEIGHTS = (0.5, 0.3, 0.2)
+
+ROLES = list(ROLE_ROUTE_SCORES)
+ROLE_INDEX = {role: i for i, role in enumerate(ROLES)}
+
+# Matrice ruolo × tipo di gara, costruita una volta all'import
+ROLE_ROUTE_MATRIX = np.array([
+    [ROLE_ROUTE_SCORES[role].get(race_type, DEFAULT_ROLE_SCORE) for race_type in RACE_TYPES]
+    for role in ROLES
+])
+
+_columns_cache = VersionedCache(("riders",))
+
+
+def _numeric(values):
+    """Colonna numerica: None, stringhe vuote o non valide → 0."""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+def ruoli_vettoriali(wkg_20, wkg_15s, weight):
+    """Indici di ROLES, stessa regola di ai_engine.ruolo_da_profilo."""
+    ratio = np.divide(wkg_15s, wkg_20, out=np.zeros_like(wkg_20), where=wkg_20 > 0)
+    return np.select(
+        [
+            wkg_20 <= 0,
+            ratio >= 2.8,
+            (wkg_20 >= 3.8) & (weight > 0) & (weight < 68),
+            ratio < 2.2,
+        ],
+        [
+            ROLE_INDEX["all-rounder"],
+            ROLE_INDEX["sprinter"],
+            ROLE_INDEX["climber"],
+            ROLE_INDEX["rouleur"],
+        ],
+        default=ROLE_INDEX["all-rounder"],
+    )
+
+
+def forma_vettoriale(ranking):
+    """Forma 0..1 dai punti ranking (0 o mancante → 0.5), come ai_engine.forma_da_ranking."""
+    form = np.maximum(0.0, 1.0 - np.minimum(ranking, 1000) / 1000)
+    return np.where(ranking > 0, form, 0.5)
+
+
+def costruisci_colonne(rows):
+    """
+    Array colonna a partire dalle righe
+    (zwift_power_id, ftp, weight, wkg_20min, wkg_15sec, ranking, category, watt_20min).
+    """
+    ids = [str(row[0]) for row in rows]
+    ftp = _numeric([row[1] for row in rows])
+    weight = _numeric([row[2] for row in rows])
+    wkg_20 = _numeric([row[3] for row in rows])
+    wkg_15s = _numeric([row[4] for row in rows])
+    ranking = _numeric([row[5] for row in rows])
+
+    watt_20 = _numeric([row[7] for row in rows])
+
+    category = np.array([(row[6] or "").strip().upper() for row in rows], dtype=object)
+    category[category == "A+"] = "A"
+
+    wkg_ftp = np.divide(ftp, weight, out=np.zeros_like(ftp), where=weight > 0)
+    return {
+        "ids": ids,
+        "index": {rider_id: i for i, rider_id in enumerate(ids)},
+        "ftp": ftp,
+        "weight": weight,
+        "wkg_20min": wkg_20,
+        "wkg_15sec": wkg_15s,
+        # Watt a 20 minuti: dal dato o, se manca, da wkg × peso
+        "watt_20min": np.where(watt_20 > 0, watt_20, wkg_20 * weight),
+        "ranking": ranking,
+        "category": category,
+        "wkg": np.where(wkg_20 != 0, wkg_20, wkg_ftp),
+        "role": ruoli_vettoriali(wkg_20, wkg_15s, weight),
+        "form": forma_vettoriale(ranking),
+    }
+
+
+def carica_colonne(conn):
+    """Colonne di tutta la tabella riders, ricaricate solo quando riders cambia."""
+    def build():
+        rows = conn.execute("""
+            SELECT zwift_power_id, ftp, weight, wkg_20min, wkg_15sec, ranking, category, watt_20min
+            FROM riders
+            ORDER BY zwift_power_id
+        """).fetchall()
+        return costruisci_colonne(rows)
+    return _columns_cache.get_or_build(conn, "riders", build)
+
+
+def route_weights(race):
+    """
+    Pesi sui RACE_TYPES di una gara: un tipo ("montagna") vale 1 su quel
+    tipo; un profilo di utils.race_profiles porta i suoi weight_<tipo>.
+    """
+    if isinstance(race, str):
+        return np.array([1.0 if t == race else 0.0 for t in RACE_TYPES])
+    return np.array([float(race.get(f"weight_{t}") or 0) for t in RACE_TYPES])
+
+
+def compatibilita_ruoli(race):
+    """Compatibilità di ogni ruolo (ordine ROLES) con una gara o un tipo di gara."""
+    weights = route_weights(race)
+    if not weights.any():
+        # Tipo sconosciuto o profilo vuoto
+        return np.full(len(ROLES), DEFAULT_ROLE_SCORE)
+    return ROLE_ROUTE_MATRIX @ weights / weights.sum()
+
+
+def calcola_scores(columns, races):
+    """
+    Punteggi di tutti i rider in un solo passaggio.
+    races è un tipo di gara, un profilo di gara (utils.race_profiles) oppure
+    una lista di questi: con uno solo restituisce un array (un valore per
+    rider), con una lista una matrice gare × rider.
+    """
+    single = isinstance(races, (str, dict))
+    races = [races] if single else list(races)
+
+    # Riga della matrice ruolo/percorso per ogni gara richiesta
+    route = np.array([compatibilita_ruoli(race) for race in races]).reshape(len(races), len(ROLES))
+
+    # Stesso ordine delle somme di ai_engine.calcola_score: arrotondamenti identici
+    w_wkg, w_route, w_form = SCORE_WEIGHTS
+    scores = w_wkg * columns["wkg"][np.newaxis, :] + w_route * route[:, columns["role"]]
+    scores = np.round(scores + w_form * columns["form"][np.newaxis, :], 3)
+    return scores[0] if single else scores
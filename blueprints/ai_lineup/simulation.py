@@ -0,0 +1,297 @@
+# blueprints/ai_lineup/simulation.py
+"""
+Simulatore Monte Carlo dei punti di gara per formazioni candidate.
+
+Ogni prova estrae un campo avversario (OPPONENT_TEAMS team da 6 rider
+ricampionati dai rider del club della stessa categoria) e aggiunge
+rumore di forma a tutti i rider. Dalle metriche di potenza si ricavano:
+- FIN: arrivo (N - posizione + 1 punti su un campo di N rider);
+- FAL / FTS: per ogni segmento sprint o salita del profilo di gara,
+  10..1 punti ai primi 10 (FAL più aleatorio di FTS);
+- PBT: bonus di squadra sulla classifica a squadre del 4° rider;
+- nelle cronosquadre solo FIN, per team, sul 4° rider (almeno 4 rider).
+
+Metriche: pianura = watt_20min / peso^(1/3), salita = wkg_20min,
+sprint = wkg_15sec, standardizzate sul gruppo di riferimento (i valori
+mancanti valgono la mediana). Le prove sono calcolate con array NumPy;
+le formazioni condividono le stesse estrazioni (numeri
+casuali comuni), quindi le differenze tra varianti sono poco rumorose.
+Le prove sono divise in blocchi fissi da BATCH_TRIALS, ognuno con il
+proprio seme: con SIM_WORKERS > 1 i blocchi vanno a un pool di processi
+e i risultati non cambiano.
+"""
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .scoring import carica_colonne
+
+
+# ===============================================================
+# ⚙️ CONFIGURAZIONE
+# ===============================================================
+SIM_TRIALS = int(os.environ.get("ZRL_SIM_TRIALS", "2000"))
+# 0 o 1 = nel processo della richiesta
+SIM_WORKERS = int(os.environ.get("ZRL_SIM_WORKERS", "0"))
+BATCH_TRIALS = 1000
+
+OPPONENT_TEAMS = 15
+TEAM_SIZE = 6
+MIN_POOL = 12
+
+FORM_SIGMA = 0.5
+FTS_SIGMA = 0.5
+FAL_SIGMA = 0.9
+# Peso dello sprint nell'arrivo delle gare in linea
+FINISH_SPRINT_SHARE = 0.3
+
+SEGMENT_POINTS = 10
+PBT_POINTS = [10, 8, 6, 5, 4, 3, 2, 1]
+COMPONENTS = ["FAL", "FTS", "FIN", "PBT"]
+
+_executor = None
+
+
+def _get_executor(workers):
+    global _executor
+    if _executor is None:
+        # spawn: il processo figlio non eredita connessioni DB e thread di Flask
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+# ===============================================================
+# 🧱 MODELLO
+# ===============================================================
+
+def _standardizza(values, reference):
+    """z-score rispetto al gruppo di riferimento; 0 (dato mancante) → mediana."""
+    present = reference[reference > 0]
+    if not len(present):
+        return np.zeros_like(values)
+    median = np.median(present)
+    values = np.where(values > 0, values, median)
+    std = present.std() or 1.0
+    return (values - present.mean()) / std
+
+
+def prepara_modello(columns, profile, lineups, category=None, opponent_teams=OPPONENT_TEAMS):
+    """
+    Array del modello (serializzabili per il pool di processi).
+    lineups: liste di zwift_power_id; gli id sconosciuti vengono ignorati.
+    """
+    weight = np.where(columns["weight"] > 0, columns["weight"], 75.0)
+    flat = np.where(columns["watt_20min"] > 0, columns["watt_20min"] / np.cbrt(weight), 0.0)
+    climb = columns["wkg_20min"]
+    sprint = columns["wkg_15sec"]
+
+    # Gruppo di riferimento e avversari: rider della categoria con dati di potenza
+    has_data = climb > 0
+    pool = has_data & (columns["category"] == category) if category else has_data
+    if pool.sum() < MIN_POOL:
+        pool = has_data
+    if not pool.any():
+        pool = np.ones(len(climb), dtype=bool)
+
+    z_flat = _standardizza(flat, flat[pool])
+    z_climb = _standardizza(climb, climb[pool])
+    z_sprint = _standardizza(sprint, sprint[pool])
+
+    is_ttt = bool(profile.get("is_ttt"))
+    w_flat = float(profile.get("weight_pianura") or 0) + float(profile.get("weight_cronosquadre") or 0)
+    w_climb = float(profile.get("weight_montagna") or 0)
+    if not w_flat + w_climb:
+        w_flat = w_climb = 0.5
+    finish = w_flat * z_flat + w_climb * z_climb
+    if not is_ttt:
+        finish = finish + FINISH_SPRINT_SHARE * z_sprint
+
+    members = [
+        [columns["index"][str(rider_id)] for rider_id in lineup if str(rider_id) in columns["index"]]
+        for lineup in lineups
+    ]
+    union = sorted({i for lineup in members for i in lineup})
+    position = {i: n for n, i in enumerate(union)}
+
+    n_sprint = 0 if is_ttt else int(profile.get("sprint_segments") or 0)
+    n_climb = 0 if is_ttt else int(profile.get("climb_segments") or 0)
+    pool_idx = np.flatnonzero(pool)
+    return {
+        "is_ttt": is_ttt,
+        "opponent_teams": opponent_teams,
+        "segment_is_sprint": np.array([True] * n_sprint + [False] * n_climb, dtype=bool),
+        "members": [np.array([position[i] for i in lineup], dtype=int) for lineup in members],
+        "our_finish": finish[union].astype(np.float32),
+        "our_sprint": z_sprint[union].astype(np.float32),
+        "our_climb": z_climb[union].astype(np.float32),
+        "pool_finish": finish[pool_idx].astype(np.float32),
+        "pool_sprint": z_sprint[pool_idx].astype(np.float32),
+        "pool_climb": z_climb[pool_idx].astype(np.float32),
+    }
+
+
+# ===============================================================
+# 🎲 PROVE
+# ===============================================================
+
+def _rumore(rng, sigma, shape):
+    """Rumore gaussiano in float32: metà memoria e generazione più rapida."""
+    return rng.standard_normal(shape, dtype=np.float32) * np.float32(sigma)
+
+
+def _avversari_migliori(opponents, ours, limit=None):
+    """
+    opponents (..., n), ours (..., u): per ognuno dei nostri rider, quanti
+    avversari vanno più forte. Con limit conta solo i primi `limit` avversari
+    (basta per i segmenti, dove prendono punti solo i primi 10).
+    """
+    if limit is not None and opponents.shape[-1] > limit:
+        opponents = -np.partition(-opponents, limit - 1, axis=-1)[..., :limit]
+    return np.count_nonzero(opponents[..., None, :] > ours[..., :, None], axis=-1)
+
+
+def _compagni_migliori(values):
+    """values (..., k): per ogni rider, quanti compagni della formazione vanno più forte."""
+    return np.count_nonzero(values[..., None, :] > values[..., :, None], axis=-1)
+
+
+def _simula_blocco(model, trials, seed):
+    """
+    Esegue `trials` prove e restituisce l'array (formazioni, componenti
+    FAL/FTS/FIN/PBT, prove). Il confronto con gli avversari si fa una volta
+    per tutti i rider delle formazioni; per formazione restano solo i
+    confronti tra compagni.
+    """
+    rng = np.random.default_rng(seed)
+    members = model["members"]
+    n_teams = model["opponent_teams"]
+    n_opp = n_teams * TEAM_SIZE
+    n_ours = len(model["our_finish"])
+    is_sprint = model["segment_is_sprint"]
+    S = len(is_sprint)
+    pbt = np.array(PBT_POINTS + [0] * (n_teams + 1))
+    result = np.zeros((len(members), len(COMPONENTS), trials))
+
+    for start in range(0, trials, BATCH_TRIALS):
+        B = min(BATCH_TRIALS, trials - start)
+        block = slice(start, start + B)
+        picked = rng.integers(0, len(model["pool_finish"]), size=(B, n_opp))
+
+        # 🏁 Arrivo
+        opp_finish = model["pool_finish"][picked] + _rumore(rng, FORM_SIGMA, (B, n_opp))
+        our_finish = model["our_finish"][None, :] + _rumore(rng, FORM_SIGMA, (B, n_ours))
+        better_finish = _avversari_migliori(opp_finish, our_finish)
+        # Classifica a squadre sul 4° rider di ogni team avversario
+        opp_keys = np.sort(opp_finish.reshape(B, n_teams, TEAM_SIZE), axis=2)[:, :, -4]
+
+        # 🚩 Segmenti (FAL e FTS): metrica sprint o salita secondo il tipo di segmento
+        segments = []
+        if S:
+            opp_base = np.where(
+                is_sprint[None, :, None],
+                model["pool_sprint"][picked][:, None, :],
+                model["pool_climb"][picked][:, None, :],
+            )
+            our_base = np.where(is_sprint[:, None], model["our_sprint"][None, :], model["our_climb"][None, :])
+            for sigma in (FAL_SIGMA, FTS_SIGMA):
+                opp = opp_base + _rumore(rng, sigma, opp_base.shape)
+                ours = our_base[None, :, :] + _rumore(rng, sigma, (B, S, n_ours))
+                segments.append((ours, _avversari_migliori(opp, ours, limit=SEGMENT_POINTS)))
+
+        for l, m in enumerate(members):
+            if not len(m):
+                continue
+            for c, (ours, better) in enumerate(segments):
+                pos = 1 + better[:, :, m] + _compagni_migliori(ours[:, :, m])
+                result[l, c, block] = np.clip(SEGMENT_POINTS + 1 - pos, 0, None).sum(axis=(1, 2))
+
+            ours = our_finish[:, m]
+            team_rank = np.full(B, n_teams + 1)
+            if len(m) >= 4:
+                our_key = np.sort(ours, axis=1)[:, -4]
+                team_rank = 1 + (opp_keys > our_key[:, None]).sum(1)
+
+            if model["is_ttt"]:
+                # Tempo del 4° rider: tutti i rider prendono i punti del team
+                result[l, 2, block] = (n_teams + 2 - team_rank) * len(m) if len(m) >= 4 else 0
+            else:
+                pos = 1 + better_finish[:, m] + _compagni_migliori(ours)
+                result[l, 2, block] = (n_opp + len(m) + 1 - pos).sum(1)
+                result[l, 3, block] = pbt[team_rank - 1] if len(m) >= 4 else 0
+    return result
+
+
+def _simula_blocchi(model, blocks):
+    """_simula_blocco su una lista di (prove, seme), concatenati in ordine."""
+    return np.concatenate([_simula_blocco(model, size, s) for size, s in blocks], axis=2)
+
+
+# ===============================================================
+# 📊 SIMULAZIONE
+# ===============================================================
+
+def _intervallo(samples):
+    """Media e intervallo di confidenza al 95% della media."""
+    mean = float(samples.mean())
+    half = 1.96 * float(samples.std(ddof=1)) / len(samples) ** 0.5 if len(samples) > 1 else 0.0
+    return {"mean": round(mean, 1), "low": round(mean - half, 1), "high": round(mean + half, 1)}
+
+
+def simula_formazioni(columns, profile, lineups, trials=SIM_TRIALS, seed=0,
+                      workers=SIM_WORKERS, category=None):
+    """
+    Punti attesi di ogni formazione sulla gara descritta da profile
+    (riga di race_profiles). Restituisce {"results": [...], "trials", "elapsed_ms"}:
+    per formazione FAL/FTS/FIN/PBT/TOTAL con media e IC 95%, più "best_share",
+    la quota di prove in cui la formazione ha il totale più alto.
+    """
+    t0 = time.perf_counter()
+    model = prepara_modello(columns, profile, lineups, category=category)
+
+    # Blocchi fissi da BATCH_TRIALS prove, ognuno col suo seme: la divisione
+    # non dipende dai processi, quindi stesso seed = stessi numeri con o senza pool
+    n_blocks = max(1, -(-trials // BATCH_TRIALS))
+    blocks = list(zip(
+        [min(BATCH_TRIALS, trials - i * BATCH_TRIALS) for i in range(n_blocks)],
+        np.random.SeedSequence(seed).spawn(n_blocks),
+    ))
+    if workers > 1 and n_blocks > 1:
+        # Blocchi consecutivi per processo: l'ordine delle prove resta quello sequenziale
+        groups = [g.tolist() for g in np.array_split(np.arange(n_blocks), min(workers, n_blocks))]
+        futures = [
+            _get_executor(workers).submit(_simula_blocchi, model, [blocks[i] for i in group])
+            for group in groups
+        ]
+        samples = np.concatenate([f.result() for f in futures], axis=2)
+    else:
+        samples = _simula_blocchi(model, blocks)
+
+    totals = samples.sum(axis=1)
+    best = totals.max(axis=0)
+    results = []
+    for l, lineup in enumerate(lineups):
+        row = {name: _intervallo(samples[l, c]) for c, name in enumerate(COMPONENTS)}
+        row["TOTAL"] = _intervallo(totals[l])
+        row["riders"] = len(model["members"][l])
+        row["best_share"] = round(float((totals[l] == best).mean()) * 100, 1)
+        results.append(row)
+
+    return {
+        "results": results,
+        "trials": int(samples.shape[2]),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def simula_gara(conn, race_id, lineups, category=None, **options):
+    """simula_formazioni sul profilo della gara race_id (None se la gara non ha profilo)."""
+    row = conn.execute("SELECT * FROM race_profiles WHERE race_id = ?", (race_id,)).fetchone()
+    if row is None:
+        return None
+    return simula_formazioni(carica_colonne(conn), dict(row), lineups, category=category, **options)
@@ -1,16 +1,12 @@
-import os
-import sqlite3
 from flask import Blueprint
+from db import get_zrl_db
 
 auth_bp = Blueprint("auth", __name__)
 
 from . import routes  # importa le rotte dopo aver creato il blueprint
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-DB_PATH = os.path.join(BASE_DIR, "zrl.db")  # ← togli "istances"
 
-
-conn = sqlite3.connect(DB_PATH)
+conn = get_zrl_db()
 cur = conn.cursor()
 
 cur.executescript("""
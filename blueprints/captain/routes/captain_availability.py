@@ -1,15 +1,7 @@
-import os
-import sqlite3
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from db import get_zrl_db
 from utils.auth import require_captain
 
-def get_zrl_db():
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    DB_PATH = os.path.join(BASE_DIR, "zrl.db")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 availability_bp = Blueprint("availability_captain", __name__)
 
 @availability_bp.route("/view_availability", methods=["GET", "POST"])
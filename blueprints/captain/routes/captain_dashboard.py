@@ -1,14 +1,6 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash
+from db import get_zrl_db
 from utils.auth import require_captain
-import sqlite3
-import os
-
-def get_zrl_db():
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    DB_PATH = os.path.join(BASE_DIR, "zrl.db")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
 
 dashboard_bp = Blueprint("dashboard_captain", __name__)
 
@@ -1,14 +1,7 @@
-import os
-import sqlite3
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash
+from db import get_zrl_db
 from utils.auth import require_captain
-
-def get_zrl_db():
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    DB_PATH = os.path.join(BASE_DIR, "zrl.db")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from utils.lineup import save_lineup as save_team_lineup, lineup_error_message, lineup_skipped_message
 
 lineup_bp = Blueprint("lineup_captain", __name__)
 @lineup_bp.route("/save_lineup", methods=["POST"])
@@ -27,15 +20,18 @@ def save_lineup():
         return redirect(url_for("auth.login_captain"))
 
     team_id = captain["team_id"]
-    cur.execute("DELETE FROM lineup WHERE team_id = ? AND race_id = ?", (team_id, race_id))
+    race = cur.execute("SELECT race_date FROM races WHERE id = ?", (race_id,)).fetchone()
+    if not race:
+        flash("⚠️ Gara non trovata.", "danger")
+        return redirect(url_for("dashboard_captain.captain_dashboard"))
+    race_date = race["race_date"]
 
-    for rider_id in selected_riders[:12]:
-        cur.execute("""
-            INSERT INTO lineup (team_id, rider_id, race_id)
-            VALUES (?, ?, ?)
-        """, (team_id, rider_id, race_id))
+    # Stessa tabella e stesse regole delle formazioni admin (race_lineup, per data gara)
+    result = save_team_lineup(conn, team_id, race_date, selected_riders)
+    if not result["saved"]:
+        flash(lineup_error_message(result), "warning" if result["error"] == "too_many" else "danger")
+        return redirect(url_for("dashboard_captain.captain_dashboard"))
 
-    conn.commit()
     flash("✅ Formazione salvata", "success")
     return redirect(url_for("dashboard_captain.captain_dashboard"))
 
@@ -60,51 +56,45 @@ def manage_lineup(team_id, race_id):
         flash("⚠️ Gara non trovata.", "danger")
         return redirect(url_for("dashboard_captain.captain_dashboard"))
 
+    race_date = race["race_date"]
+
+    # Rider del team (rider_teams) e formazioni della data (race_lineup)
     riders = cur.execute("""
-        SELECT id AS rider_id, name, zwift_power_id
-        FROM riders
-        WHERE team_id = ? AND active = 1
+        SELECT r.zwift_power_id AS rider_id, r.name, r.zwift_power_id
+        FROM riders r
+        JOIN rider_teams rt ON rt.zwift_power_id = r.zwift_power_id
+        WHERE rt.team_id = ? AND r.active = 1
     """, (team_id,)).fetchall()
 
-    blocked_ids = [r["rider_id"] for r in cur.execute("""
-        SELECT rider_id FROM lineup
-        WHERE race_id = ? AND team_id != ?
-    """, (race_id, team_id)).fetchall()]
+    blocked_ids = [r["zwift_power_id"] for r in cur.execute("""
+        SELECT zwift_power_id FROM race_lineup
+        WHERE race_date = ? AND team_id != ?
+    """, (race_date, team_id)).fetchall()]
 
-    selected_ids = [r["rider_id"] for r in cur.execute("""
-        SELECT rider_id FROM lineup
-        WHERE race_id = ? AND team_id = ?
-    """, (race_id, team_id)).fetchall()]
+    selected_ids = [r["zwift_power_id"] for r in cur.execute("""
+        SELECT zwift_power_id FROM race_lineup
+        WHERE race_date = ? AND team_id = ?
+    """, (race_date, team_id)).fetchall()]
 
     if request.method == "POST":
-        try:
-            new_selection = [int(rid) for rid in request.form.getlist("rider_ids")]
-        except ValueError:
-            flash("❌ Selezione non valida.", "danger")
-            return redirect(url_for("lineup_captain.manage_lineup", team_id=team_id, race_id=race_id))
-
-        if len(new_selection) > 6:
-            flash("⚠️ Puoi selezionare al massimo 6 corridori.", "warning")
+        # I rider già schierati da altri team vengono esclusi, come prima, e segnalati al capitano
+        result = save_team_lineup(conn, team_id, race_date, request.form.getlist("rider_ids"), skip_conflicts=True)
+        if not result["saved"]:
+            flash(lineup_error_message(result), "warning" if result["error"] == "too_many" else "danger")
             return redirect(url_for("lineup_captain.manage_lineup", team_id=team_id, race_id=race_id))
 
-        valid_selection = [rid for rid in new_selection if rid not in blocked_ids]
-
-        cur.execute("DELETE FROM lineup WHERE race_id = ? AND team_id = ?", (race_id, team_id))
-        for rider_id in valid_selection:
-            cur.execute("""
-                INSERT INTO lineup (race_id, rider_id, team_id)
-                VALUES (?, ?, ?)
-            """, (race_id, rider_id, team_id))
-
-        conn.commit()
-        flash("✅ Formazione aggiornata con successo.", "success")
+        skipped = lineup_skipped_message(result)
+        if skipped:
+            flash(skipped, "warning")
+        else:
+            flash("✅ Formazione aggiornata con successo.", "success")
         return redirect(url_for("lineup_captain.manage_lineup", team_id=team_id, race_id=race_id))
 
     return render_template("captain/manage_lineup.html",
         page_title="Gestione Formazione",
         team_id=team_id,
         team_name=session.get("team_name"),
-        race_date=race["race_date"],
+        race_date=race_date,
         race=race,
         riders=riders,
         selected_ids=selected_ids,
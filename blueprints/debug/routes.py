@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, current_app
+import db
 
 debug_bp = Blueprint("debug", __name__, url_prefix="/debug")
 
@@ -11,4 +12,23 @@ def list_routes():
             "rule": rule.rule,
             "methods": ", ".join(rule.methods - {"HEAD", "OPTIONS"})
         })
-    return render_template("debug/routes.html", routes=routes)
\ No newline at end of file
+    return render_template("debug/routes.html", routes=routes)
+
+@debug_bp.route("/perf")
+def perf():
+    """Tempi DB per richiesta, query lente e sospetti N+1."""
+    requests_log = sorted(db.recent_requests, key=lambda r: r["at"], reverse=True)
+    slow_log = sorted(db.slow_queries, key=lambda q: q["ms"], reverse=True)
+    return render_template(
+        "debug/perf.html",
+        page_title="⏱️ Performance database",
+        requests_log=requests_log,
+        slow_log=slow_log,
+        n_plus_one=[r for r in requests_log if r["n_plus_one"]],
+        thresholds={
+            "slow_query_ms": db.SLOW_QUERY_MS,
+            "slow_request_ms": db.SLOW_REQUEST_MS,
+            "n_plus_one_min": db.N_PLUS_ONE_MIN,
+            "log_size": db.PERF_LOG_SIZE,
+        },
+    )
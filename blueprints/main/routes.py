@@ -1,6 +1,5 @@
 from flask import Blueprint, render_template
-import sqlite3
-import os
+from db import get_zrl_db
 
 main_bp = Blueprint("main", __name__)
 
@@ -10,13 +9,8 @@ def home():
 
 @main_bp.route("/import")
 def import_links():
-    # Costruzione percorso assoluto del database
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    DB_PATH = os.path.join(BASE_DIR, "zrl.db")  # ← percorso unificato
-
     # Connessione al database
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_zrl_db()
     cursor = conn.cursor()
 
     # Query stagioni
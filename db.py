@@ -1,7 +1,11 @@
 import os
 import sqlite3
 import logging
-from flask import g, has_app_context
+import time
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+from flask import g, has_app_context, has_request_context, request
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # 📁 Percorsi assoluti dei database (ora nella root)
@@ -9,25 +13,290 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 ZRL_DB_PATH = os.path.join(BASE_DIR, "zrl.db") 
 ZWIFT_DB_PATH = os.path.join(BASE_DIR, "zwift.db")
 
+# ⚙️ Tuning SQLite (sovrascrivibile da variabili d'ambiente)
+BUSY_TIMEOUT_MS = int(os.environ.get("ZRL_DB_BUSY_TIMEOUT_MS", "15000"))
+CACHE_SIZE_KB = int(os.environ.get("ZRL_DB_CACHE_SIZE_KB", "16384"))
+MMAP_SIZE = int(os.environ.get("ZRL_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+SYNCHRONOUS = os.environ.get("ZRL_DB_SYNCHRONOUS", "NORMAL")
+
+# ⏱️ Strumentazione query (soglie in millisecondi)
+SLOW_QUERY_MS = float(os.environ.get("ZRL_DB_SLOW_QUERY_MS", "50"))
+SLOW_REQUEST_MS = float(os.environ.get("ZRL_DB_SLOW_REQUEST_MS", "300"))
+N_PLUS_ONE_MIN = int(os.environ.get("ZRL_DB_N_PLUS_ONE_MIN", "5"))
+PERF_LOG_SIZE = int(os.environ.get("ZRL_DB_PERF_LOG_SIZE", "200"))
+
+# 🐘 Backend del database ZRL: "sqlite" (default) oppure "postgres".
+# Con DATABASE_URL postgres:// impostato (es. Render) si passa a PostgreSQL
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DB_BACKEND = os.environ.get(
+    "ZRL_DB_BACKEND",
+    "postgres" if DATABASE_URL.startswith(("postgres://", "postgresql://")) else "sqlite",
+).lower()
+
+if DB_BACKEND == "postgres":
+    import psycopg2
+    IntegrityError = (sqlite3.IntegrityError, psycopg2.IntegrityError)
+else:
+    IntegrityError = sqlite3.IntegrityError
+
+# ===============================================================
+# ⏱️ STRUMENTAZIONE QUERY
+# ===============================================================
+
+# Log a scorrimento condivisi dal processo (append su deque è thread-safe)
+slow_queries = deque(maxlen=PERF_LOG_SIZE)
+recent_requests = deque(maxlen=PERF_LOG_SIZE)
+
+
+class QueryRecord:
+    """Statistiche di uno statement: testo, forma dei parametri, durata e righe."""
+    __slots__ = ("sql", "params", "duration", "rows")
+
+    def __init__(self, sql, params):
+        self.sql = " ".join(sql.split())
+        self.params = _params_shape(params)
+        self.duration = 0.0
+        self.rows = 0
+
+    def add(self, elapsed, rows=0):
+        self.duration += elapsed
+        self.rows += rows
+
+
+class _NullRecord:
+    """Usato fuori da una richiesta: nessun costo di registrazione."""
+    def add(self, elapsed, rows=0):
+        pass
+
+
+_NULL_RECORD = _NullRecord()
+
+
+def _params_shape(params):
+    """Solo i tipi dei parametri, mai i valori (password, email...)."""
+    if not params:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+def start_query(sql, params=()):
+    """Registra uno statement nella richiesta corrente e restituisce il suo record."""
+    if not has_request_context():
+        return _NULL_RECORD
+    record = QueryRecord(sql, params)
+    queries = g.get("db_queries")
+    if queries is None:
+        queries = g.db_queries = []
+    queries.append(record)
+    return record
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursore SQLite che misura execute e fetch di ogni statement."""
+
+    _record = _NULL_RECORD
+
+    def execute(self, sql, parameters=()):
+        self._record = start_query(sql, parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            rows = self.rowcount if self.description is None and self.rowcount > 0 else 0
+            self._record.add(time.perf_counter() - t0, rows)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        self._record = start_query(sql, seq_of_parameters[0] if seq_of_parameters else ())
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record.add(time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._record.add(time.perf_counter() - t0, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._record.add(time.perf_counter() - t0, len(rows))
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._record.add(time.perf_counter() - t0, len(rows))
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._record.add(time.perf_counter() - t0)
+            raise
+        self._record.add(time.perf_counter() - t0, 1)
+        return row
+
+
+def _finish_request(response):
+    """Chiude le statistiche della richiesta: header, log lenti, sospetti N+1."""
+    queries = g.pop("db_queries", None) or []
+    total_ms = sum(q.duration for q in queries) * 1000
+
+    response.headers["X-DB-Time"] = f"{total_ms:.2f}"
+    response.headers["X-DB-Queries"] = str(len(queries))
+
+    if request.endpoint == "debug.perf":
+        return response
+
+    now = time.time()
+    for q in queries:
+        if q.duration * 1000 >= SLOW_QUERY_MS:
+            slow_queries.append({
+                "at": now,
+                "path": request.path,
+                "sql": q.sql,
+                "params": q.params,
+                "ms": q.duration * 1000,
+                "rows": q.rows,
+            })
+
+    # Stesso statement ripetuto molte volte nella stessa richiesta = probabile N+1
+    repeated = Counter(q.sql for q in queries)
+    n_plus_one = [
+        {"sql": sql, "count": count}
+        for sql, count in repeated.most_common()
+        if count >= N_PLUS_ONE_MIN
+    ]
+
+    recent_requests.append({
+        "at": now,
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "status": response.status_code,
+        "ms": total_ms,
+        "queries": len(queries),
+        "rows": sum(q.rows for q in queries),
+        "slow": total_ms >= SLOW_REQUEST_MS,
+        "n_plus_one": n_plus_one,
+    })
+    if n_plus_one:
+        logging.warning(f"🐢 Possibile N+1 su {request.path}: {n_plus_one[0]['count']}× {n_plus_one[0]['sql'][:120]}")
+    return response
+
+
+def init_instrumentation(app):
+    """Aggiunge header X-DB-Time / X-DB-Queries e alimenta /debug/perf."""
+    app.after_request(_finish_request)
+
+
 # ===============================================================
 # 🔌 CONNESSIONE DATABASE
 # ===============================================================
 
+class PooledConnection(sqlite3.Connection):
+    """
+    Connessione SQLite riutilizzata dal pool del thread corrente.
+    close() non chiude il file: annulla l'eventuale transazione
+    pendente, riporta i pragma di sessione ai default e lascia la
+    connessione al pool.
+    Tutti i cursori sono strumentati (vedi InstrumentedCursor).
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        # I pragma di sessione (es. foreign_keys di get_fresh_zrl_db) non
+        # devono passare alla richiesta successiva servita da questo thread
+        self.execute("PRAGMA foreign_keys = OFF")
+        self.row_factory = sqlite3.Row
+
+    def really_close(self):
+        super().close()
+
+
+# Pool per thread: {db_path: PooledConnection}
+_pool = threading.local()
+
+
+def _configure(conn):
+    """Applica WAL e i pragma di performance a una nuova connessione."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def _pooled_connection(db_path):
+    """Restituisce la connessione del thread corrente per db_path, creandola se serve."""
+    conns = getattr(_pool, "conns", None)
+    # Dopo un fork (gunicorn --preload) le connessioni del padre non sono riutilizzabili
+    if conns is None or getattr(_pool, "pid", None) != os.getpid():
+        conns = _pool.conns = {}
+        _pool.pid = os.getpid()
+
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+        )
+        _configure(conn)
+        conns[db_path] = conn
+        logging.info(f"📂 Nuova connessione nel pool → {db_path}")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _postgres_connection():
+    """Connessione PostgreSQL del thread corrente per gli script standalone."""
+    from utils import db_postgres
+
+    conn = getattr(_pool, "pg_conn", None)
+    if conn is None or conn.raw is None or getattr(_pool, "pid", None) != os.getpid():
+        conn = _pool.pg_conn = db_postgres.connect()
+        _pool.pid = os.getpid()
+    return conn
+
+
+def _new_connection(db_path):
+    # Solo il database ZRL supporta il backend PostgreSQL; zwift.db resta locale
+    if DB_BACKEND == "postgres" and db_path == ZRL_DB_PATH:
+        if has_app_context():
+            from utils import db_postgres
+            return db_postgres.connect()
+        return _postgres_connection()
+    return _pooled_connection(db_path)
+
+
 def _connect_db(db_path, attr_name):
-    """Crea o riusa una connessione SQLite."""
+    """Restituisce la connessione del pool (una per thread e per database)."""
     if has_app_context():
         if not hasattr(g, attr_name):
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            setattr(g, attr_name, conn)
-            logging.info(f"📂 Connessione Flask attiva → {db_path}")
+            setattr(g, attr_name, _new_connection(db_path))
         return getattr(g, attr_name)
 
-    # Esecuzione standalone
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    logging.info(f"📂 Connessione diretta → {db_path}")
-    return conn
+    # Esecuzione standalone (script, worker): stesso pool per thread
+    return _new_connection(db_path)
 
 def get_zrl_db():
     """Connessione al database ZRL."""
@@ -38,10 +307,68 @@ def get_zwift_db():
     return _connect_db(ZWIFT_DB_PATH, "zwift_db")
 
 def close_db(e=None):
-    """Chiude la connessione ZRL se esiste."""
-    db = g.pop("zrl_db", None)
-    if db is not None:
-        db.close()
+    """Restituisce al pool le connessioni usate dalla richiesta."""
+    for attr_name in ("zrl_db", "zwift_db"):
+        db = g.pop(attr_name, None)
+        if db is not None:
+            # PostgreSQL: la connessione torna al pool condiviso tra i thread
+            getattr(db, "release", db.close)()
+
+def close_pool():
+    """Chiude davvero le connessioni del thread corrente (shutdown, test)."""
+    conns = getattr(_pool, "conns", None) or {}
+    for conn in conns.values():
+        conn.really_close()
+    conns.clear()
+    pg_conn = getattr(_pool, "pg_conn", None)
+    if pg_conn is not None:
+        pg_conn.release()
+        _pool.pg_conn = None
+
+def _has_pending_writes(conn):
+    """
+    True se la connessione ha lavoro non confermato. sqlite3 apre la
+    transazione solo con una scrittura o un BEGIN; PgConnection anche con
+    una SELECT, per questo tiene il suo flag.
+    """
+    pending = getattr(conn, "pending_writes", None)
+    return conn.in_transaction if pending is None else pending
+
+@contextmanager
+def transaction(conn):
+    """
+    Transazione di scrittura con BEGIN IMMEDIATE: il lock di scrittura
+    viene preso subito (rispettando busy_timeout) invece che a metà
+    transazione, dove SQLite restituirebbe "database is locked".
+    In WAL i lettori non vengono mai bloccati.
+
+    Se il chiamante ha già scritture non confermate (o è dentro un altro
+    transaction()), il blocco diventa un SAVEPOINT: un errore annulla solo
+    il blocco e il commit resta a chi ha aperto la transazione.
+    """
+    if _has_pending_writes(conn):
+        conn.execute("SAVEPOINT zrl_tx")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK TO SAVEPOINT zrl_tx")
+            conn.execute("RELEASE SAVEPOINT zrl_tx")
+            raise
+        else:
+            conn.execute("RELEASE SAVEPOINT zrl_tx")
+        return
+
+    if conn.in_transaction:
+        # Solo letture (PostgreSQL apre la transazione anche per una SELECT)
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
 
 # Alias comodo
 get_db = get_zrl_db
@@ -70,7 +397,7 @@ def create_admin(username, password, email=None):
                 VALUES (?, ?, ?)
             """, (username, hashed_pw, email))
         print(f"✅ Admin '{username}' creato con successo")
-    except sqlite3.IntegrityError:
+    except IntegrityError:
         print(f"⚠️ Admin '{username}' già esistente")
 
 def verify_admin_password(admin_row, password):
@@ -1,16 +1,12 @@
 from flask import Blueprint, request, redirect, url_for, flash
-import sqlite3
+from db import get_zrl_db
 from utils.wtrl_import_rounds import import_rounds
 from utils.wtrl_import_races import import_races
 
 races_bp = Blueprint("races_import", __name__, url_prefix="/races")
 
-DB_PATH = "zrl.db"
-
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_zrl_db()
 
 def get_or_create_round(cursor, season_id, round_name):
     cursor.execute("""
@@ -1,6 +1,5 @@
 from flask import Blueprint, request, redirect, url_for, flash
-import sqlite3
-import os
+from db import get_zrl_db
 from utils.seasons import get_or_create_season  # Assicurati che esista
 
 seasons_bp = Blueprint("seasons", __name__)
@@ -15,13 +14,8 @@ def create_season():
         flash("⚠️ Anni non validi", "danger")
         return redirect(url_for("main.dashboard"))
 
-    # Costruzione percorso assoluto del database
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    DB_PATH = os.path.join(BASE_DIR, "zrl.db")
-
     # Connessione sicura al database
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
+    with get_zrl_db() as conn:
         cursor = conn.cursor()
         get_or_create_season(cursor, name, start_year, end_year)
         conn.commit()
@@ -1,7 +1,11 @@
+import os
 import threading
 import webbrowser
 from flask import Flask, redirect, render_template
-from db import close_db
+from db import close_db, get_zrl_db, init_instrumentation
+from utils.migrations import run_migrations
+from utils.seasons import refresh_round_activation, refresh_round_activation_daily
+from utils.import_jobs import avvia_worker_thread
 
 # Blueprint principali
 from blueprints.auth.routes import auth_bp
@@ -27,6 +31,13 @@ def create_app():
     app.secret_key = "supersegreto"
     app.config["TEMPLATES_AUTO_RELOAD"] = True
     app.teardown_appcontext(close_db)
+    init_instrumentation(app)
+
+    # 🧱 Migrazioni dello schema (una sola volta per versione)
+    with app.app_context():
+        run_migrations(get_zrl_db())
+        refresh_round_activation(get_zrl_db())
+    app.before_request(refresh_round_activation_daily)
 
     # 🔧 Blueprint principali
     app.register_blueprint(auth_bp)
@@ -70,5 +81,8 @@ def open_browser():
     threading.Timer(1.0, lambda: webbrowser.open_new("http://localhost:5000/")).start()
 
 if __name__ == "__main__":
+    # In sviluppo il worker dei job di import gira in un thread (col reloader solo nel processo figlio)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        avvia_worker_thread()
     open_browser()
     app.run(debug=True)
\ No newline at end of file
@@ -1,22 +1,46 @@
 # ocr_screenshots_to_csv.py
-import os, re, json
+"""
+OCR degli screenshot Race Result → data/ocr_results.csv.
+
+Gli screenshot vengono elaborati in parallelo da un pool di processi
+(preprocessing + Tesseract sono CPU-bound). Il testo di ogni immagine è in
+cache per sha256 del contenuto (e impostazioni OCR): una nuova esecuzione
+rifà l'OCR solo degli screenshot nuovi o cambiati.
+
+    python scripts/ocr_screenshots_to_csv.py [--workers N] [--no-cache]
+
+Percorsi e Tesseract da variabili d'ambiente (default relativi al progetto):
+ZRL_OCR_SCREENSHOT_DIR, ZRL_OCR_OUTPUT_CSV, ZRL_OCR_DEBUG_DIR,
+ZRL_OCR_CACHE_DIR, ZRL_OCR_WORKERS, ZRL_TESSERACT_CMD, TESSDATA_PREFIX.
+"""
+import os, re, json, time, shutil, hashlib, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image, ImageFilter, ImageOps
 import pytesseract
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 
 # CONFIG
-TESSERACT_CMD = r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe"
-TESSDATA_DIR = r"C:\Program Files (x86)\Tesseract-OCR"
-SCREENSHOT_DIR = r"C:\Progetti\gestioneZRL\screenshots"
-OUTPUT_CSV = r"C:\Progetti\gestioneZRL\data\ocr_results.csv"
-DEBUG_TEXT_DIR = r"C:\Progetti\gestioneZRL\data\ocr_debug"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCREENSHOT_DIR = os.environ.get("ZRL_OCR_SCREENSHOT_DIR", os.path.join(BASE_DIR, "screenshots"))
+OUTPUT_CSV = os.environ.get("ZRL_OCR_OUTPUT_CSV", os.path.join(BASE_DIR, "data", "ocr_results.csv"))
+DEBUG_TEXT_DIR = os.environ.get("ZRL_OCR_DEBUG_DIR", os.path.join(BASE_DIR, "data", "ocr_debug"))
+CACHE_DIR = os.environ.get("ZRL_OCR_CACHE_DIR", os.path.join(BASE_DIR, "data", "ocr_cache"))
+WORKERS = int(os.environ.get("ZRL_OCR_WORKERS", "0")) or os.cpu_count() or 1
 
-# Impostazioni Tesseract
+# Impostazioni Tesseract: eseguibile dal PATH (Linux) o da ZRL_TESSERACT_CMD;
+# TESSDATA_PREFIX, se serve, arriva già dall'ambiente
+TESSERACT_CMD = os.environ.get("ZRL_TESSERACT_CMD") or shutil.which("tesseract") or "tesseract"
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
-os.environ["TESSDATA_PREFIX"] = TESSDATA_DIR
 
-os.makedirs(DEBUG_TEXT_DIR, exist_ok=True)
+# psm 6: assume un blocco uniforme di testo
+TESS_CONFIG = r'--oem 3 --psm 6'
+TESS_LANG = 'eng'
+# Da incrementare se cambia preprocess_image: invalida la cache
+PREPROCESS_VERSION = 1
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+STAGES = ("hash", "load", "preprocess", "ocr", "parse", "write")
 
 
 # Colonne attese nella tabella Race Result (ordine idealizzato)
@@ -61,33 +85,129 @@ def parse_table_text(text):
     return rows
 
 
-def process_all():
-    all_rows = []
-    files = sorted([f for f in os.listdir(SCREENSHOT_DIR) if f.lower().endswith((".png",".jpg",".jpeg"))])
+# ===============================================================
+# 🔹 CACHE PER CONTENUTO
+# ===============================================================
+
+def image_hash(path):
+    """sha256 del file insieme alle impostazioni OCR che ne determinano il testo."""
+    h = hashlib.sha256(f"{TESS_CONFIG}|{TESS_LANG}|{PREPROCESS_VERSION}|".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.json")
+
+def load_cached(digest):
+    try:
+        with open(_cache_path(digest), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_cached(digest, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{_cache_path(digest)}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp, _cache_path(digest))
+
+
+# ===============================================================
+# 🔹 OCR DI UNO SCREENSHOT (eseguito nei processi del pool)
+# ===============================================================
+
+def ocr_image(path):
+    """Testo OCR di uno screenshot con i tempi di load, preprocess e ocr (s)."""
+    timings = {}
+    t0 = time.perf_counter()
+    with Image.open(path) as im:
+        im.load()
+        t1 = time.perf_counter()
+        im = preprocess_image(im)
+    t2 = time.perf_counter()
+    text = pytesseract.image_to_string(im, config=TESS_CONFIG, lang=TESS_LANG)
+    t3 = time.perf_counter()
+    timings["load"], timings["preprocess"], timings["ocr"] = t1 - t0, t2 - t1, t3 - t2
+    return {"text": text, "extracted_at": datetime.now(timezone.utc).isoformat()}, timings
+
+
+def process_all(workers=WORKERS, use_cache=True):
+    files = sorted(f for f in os.listdir(SCREENSHOT_DIR) if f.lower().endswith(IMAGE_EXTENSIONS)) \
+        if os.path.isdir(SCREENSHOT_DIR) else []
     if not files:
         print("Nessuno screenshot in", SCREENSHOT_DIR)
         return
+    os.makedirs(DEBUG_TEXT_DIR, exist_ok=True)
+
+    started = time.perf_counter()
+    totals = dict.fromkeys(STAGES, 0.0)
+
+    # 1) hash e cache: al pool vanno solo gli screenshot mai visti
+    t = time.perf_counter()
+    digests = {fn: image_hash(os.path.join(SCREENSHOT_DIR, fn)) for fn in files}
+    totals["hash"] += time.perf_counter() - t
+    results = {}
+    if use_cache:
+        for fn, digest in digests.items():
+            cached = load_cached(digest)
+            if cached is not None:
+                results[fn] = cached
+    todo = [fn for fn in files if fn not in results]
+    print(f"OCR: {len(files)} screenshot, {len(files) - len(todo)} dalla cache, {len(todo)} da elaborare"
+          + (f" con {min(workers, len(todo))} processi" if todo else ""))
+
+    # 2) preprocessing + Tesseract in parallelo
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            futures = {pool.submit(ocr_image, os.path.join(SCREENSHOT_DIR, fn)): fn for fn in todo}
+            for future in as_completed(futures):
+                fn = futures[future]
+                try:
+                    entry, timings = future.result()
+                except Exception as e:
+                    print(f"❌ {fn}: {type(e).__name__}: {e}")
+                    continue
+                for stage, seconds in timings.items():
+                    totals[stage] += seconds
+                results[fn] = entry
+                t = time.perf_counter()
+                save_cached(digests[fn], entry)
+                with open(os.path.join(DEBUG_TEXT_DIR, fn + ".txt"), "w", encoding="utf-8") as f:
+                    f.write(entry["text"])
+                totals["write"] += time.perf_counter() - t
+                print("OCR:", fn)
+
+    # 3) parsing nell'ordine dei file
+    t = time.perf_counter()
+    all_rows = []
     for fn in files:
-        fp = os.path.join(SCREENSHOT_DIR, fn)
-        print("OCR:", fn)
-        im = Image.open(fp)
-        im = preprocess_image(im)
-        # prova OCR impostando psm e oem
-        custom_config = r'--oem 3 --psm 6'  # psm 6: assume un blocco uniforme di testo
-        text = pytesseract.image_to_string(im, config=custom_config, lang='eng')
-        debug_txt_path = os.path.join(DEBUG_TEXT_DIR, fn + ".txt")
-        with open(debug_txt_path, "w", encoding="utf-8") as f:
-            f.write(text)
-        rows = parse_table_text(text)
+        if fn not in results:
+            continue
+        rows = parse_table_text(results[fn]["text"])
         # arricchisci con metadata
         for r in rows:
             r["_screenshot"] = fn
-            from datetime import datetime, timezone
-            r["_extracted_at"] = datetime.now(timezone.utc).isoformat()
-
+            r["_extracted_at"] = results[fn]["extracted_at"]
         all_rows.extend(rows)
+    totals["parse"] += time.perf_counter() - t
 
-        import re
+    # salva in CSV con pandas (salva tutti i campi trovati)
+    t = time.perf_counter()
+    if all_rows:
+        df = pd.DataFrame(all_rows)
+        df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
+        print("Salvato CSV:", OUTPUT_CSV)
+    else:
+        print("Nessun dato estratto.")
+    totals["write"] += time.perf_counter() - t
+
+    # Tempi per fase (load/preprocess/ocr sommati sui processi del pool)
+    elapsed = time.perf_counter() - started
+    print("⏱️ Tempi per fase: " + ", ".join(f"{stage} {totals[stage]:.2f}s" for stage in STAGES)
+          + f" · totale {elapsed:.2f}s")
 
 def clean_ocr_text(df):
     """
@@ -130,13 +250,9 @@ def clean_ocr_text(df):
     return df
 
 
-    # salva in CSV con pandas (salva tutti i campi trovati)
-    if all_rows:
-        df = pd.DataFrame(all_rows)
-        df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8")
-        print("Salvato CSV:", OUTPUT_CSV)
-    else:
-        print("Nessun dato estratto.")
-
 if __name__ == "__main__":
-    process_all()
+    parser = argparse.ArgumentParser(description="OCR degli screenshot Race Result")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="processi OCR in parallelo")
+    parser.add_argument("--no-cache", action="store_true", help="rifà l'OCR anche degli screenshot già in cache")
+    args = parser.parse_args()
+    process_all(workers=max(1, args.workers), use_cache=not args.no_cache)
@@ -0,0 +1,26 @@
+import os
+import shutil
+import sqlite3
+import sys
+
+import pytest
+
+# I moduli del progetto si importano dalla radice (db, utils, blueprints)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def zrl_conn(tmp_path):
+    """Copia di zrl.db con le migrazioni applicate, in tmp_path."""
+    from db import ZRL_DB_PATH
+    from utils.migrations import run_migrations
+
+    path = tmp_path / "zrl.db"
+    shutil.copyfile(ZRL_DB_PATH, path)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    run_migrations(conn)
+    yield conn
+    conn.close()
@@ -0,0 +1,208 @@
+"""
+Vincoli di carica_candidati e assegnazione di assegna_formazioni,
+confrontati con una ricerca esaustiva su istanze piccole.
+"""
+import itertools
+import random
+import sqlite3
+
+import pytest
+
+from blueprints.ai_lineup.ai_engine import (
+    CATEGORY_LADDER, assegna_formazioni, carica_candidati, category_allowed, punteggio_assegnazione,
+)
+from blueprints.ai_lineup.scoring import costruisci_colonne
+
+RACE_DATE = "2025-10-07"
+RACE_TYPE = "pianura"
+
+
+def _db(teams, riders, memberships, lineups=()):
+    """Database in memoria con le sole colonne lette da carica_candidati."""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE teams (id INTEGER PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE riders (
+            zwift_power_id TEXT PRIMARY KEY, name TEXT, category TEXT, ranking REAL,
+            wkg_20min REAL, wkg_15sec REAL, watt_20min REAL, weight REAL, ftp REAL,
+            is_captain INTEGER DEFAULT 0, active INTEGER DEFAULT 1, available_zrl INTEGER DEFAULT 1
+        );
+        CREATE TABLE rider_teams (zwift_power_id TEXT, team_id INTEGER);
+        CREATE TABLE race_lineup (team_id INTEGER, race_date TEXT, zwift_power_id TEXT);
+        CREATE TABLE races (id INTEGER PRIMARY KEY, race_date TEXT);
+        CREATE TABLE availability (rider_id INTEGER, race_id INTEGER, status TEXT);
+    """)
+    conn.executemany("INSERT INTO teams VALUES (?, ?, ?)", teams)
+    conn.executemany(
+        "INSERT INTO riders (zwift_power_id, name, category, ranking, wkg_20min, wkg_15sec, watt_20min,"
+        " weight, ftp, active, available_zrl) VALUES (:id, :name, :category, :ranking, :wkg, :wkg15,"
+        " :watt, 70, :watt, :active, :available)",
+        riders,
+    )
+    conn.executemany("INSERT INTO rider_teams VALUES (?, ?)", memberships)
+    conn.executemany("INSERT INTO race_lineup VALUES (?, ?, ?)", lineups)
+    return conn
+
+
+def _rider(rider_id, category, wkg=3.5, active=1, available=1):
+    return {
+        "id": rider_id, "name": f"R{rider_id}", "category": category, "ranking": 300,
+        "wkg": wkg, "wkg15": wkg * 2.4, "watt": wkg * 70, "active": active, "available": available,
+    }
+
+
+def _candidati(conn, team_ids=None):
+    rows = conn.execute("""
+        SELECT zwift_power_id, ftp, weight, wkg_20min, wkg_15sec, ranking, category, watt_20min
+        FROM riders ORDER BY zwift_power_id
+    """).fetchall()
+    return carica_candidati(conn, RACE_DATE, team_ids, columns=costruisci_colonne(rows))
+
+
+def _reasons(roster, team_id):
+    return {rider_id: reason for rider_id, _, reason in roster[team_id]}
+
+
+# ===============================================================
+# 🔹 VINCOLI
+# ===============================================================
+
+@pytest.mark.parametrize("rider, team, allowed", [
+    ("D", "D", True), ("D", "A", True), ("C", "B", True), ("B", "C", False),
+    ("A", "B", False), ("A+", "A", True), ("a", "A", True), ("", "A", False), ("B", "E", False),
+])
+def test_scala_categorie(rider, team, allowed):
+    assert category_allowed(rider, team) is allowed
+
+
+def test_categoria_non_ammessa():
+    conn = _db(
+        teams=[(1, "T-C", "C"), (2, "T-A", "A")],
+        riders=[_rider("10", "B")],
+        memberships=[("10", 1), ("10", 2)],
+    )
+    teams, riders, roster = _candidati(conn)
+    assert _reasons(roster, 1)["10"] == "categoria non ammessa"
+    assert _reasons(roster, 2)["10"] is None
+    assert riders[0]["teams"] == [2]
+
+
+def test_limite_due_team():
+    conn = _db(
+        teams=[(1, "T1", "A"), (2, "T2", "A"), (3, "T3", "A")],
+        riders=[_rider("10", "A")],
+        memberships=[("10", 3), ("10", 1), ("10", 2)],
+    )
+    teams, riders, roster = _candidati(conn)
+    # Valgono i primi due team per team_id
+    assert riders[0]["teams"] == [1, 2]
+    assert _reasons(roster, 3)["10"] == "oltre il limite di 2 team"
+
+
+def test_blocco_stessa_data():
+    conn = _db(
+        teams=[(1, "T1", "B"), (2, "Altro", "B")],
+        riders=[_rider("10", "B"), _rider("11", "B")],
+        memberships=[("10", 1), ("11", 1), ("10", 2)],
+        lineups=[(2, RACE_DATE, "10"), (2, "2025-10-14", "11")],
+    )
+    teams, riders, roster = _candidati(conn, team_ids=[1])
+    # Schierato da un team escluso nella stessa data: bloccato; in un'altra data no
+    assert _reasons(roster, 1) == {"10": "già schierato con Altro", "11": None}
+    assert [r["zwift_power_id"] for r in riders] == ["11"]
+
+    # Se anche il team 2 è da ottimizzare la sua formazione viene rifatta: nessun blocco
+    teams, riders, roster = _candidati(conn, team_ids=[1, 2])
+    assert _reasons(roster, 1)["10"] is None
+
+
+def test_inattivi_e_non_disponibili():
+    conn = _db(
+        teams=[(1, "T1", "B")],
+        riders=[_rider("10", "B", active=0), _rider("11", "B", available=0), _rider("12", "B")],
+        memberships=[("10", 1), ("11", 1), ("12", 1)],
+    )
+    teams, riders, roster = _candidati(conn)
+    assert _reasons(roster, 1) == {"10": "inattivo", "11": "non disponibile", "12": None}
+    assert [r["zwift_power_id"] for r in riders] == ["12"]
+
+
+# ===============================================================
+# 🔹 CONFRONTO CON LA RICERCA ESAUSTIVA
+# ===============================================================
+
+def _eligible_brute(teams, riders, memberships, lineups, selected):
+    """Team ammessi per rider, ricavati dai dati grezzi senza passare da carica_candidati."""
+    category_of = {t[0]: t[2] for t in teams}
+    blocked = {rider_id for team_id, date, rider_id in lineups if date == RACE_DATE and team_id not in selected}
+    eligible = {}
+    for rider in riders:
+        if not rider["active"] or not rider["available"] or rider["id"] in blocked:
+            continue
+        own = sorted(team_id for rider_id, team_id in memberships if rider_id == rider["id"])
+        eligible[rider["id"]] = [
+            team_id for team_id in own[:2]
+            if team_id in selected
+            and CATEGORY_LADDER.index(rider["category"]) <= CATEGORY_LADDER.index(category_of[team_id])
+        ]
+    return {rider_id: teams_ for rider_id, teams_ in eligible.items() if teams_}
+
+
+def _brute_force(eligible, score, max_riders):
+    """Miglior somma su tutte le scelte (nessun team o uno dei team ammessi) di ogni rider."""
+    rider_ids = list(eligible)
+    best = 0.0
+    for choice in itertools.product(*[[None] + eligible[r] for r in rider_ids]):
+        load = {}
+        total = 0.0
+        for rider_id, team_id in zip(rider_ids, choice):
+            if team_id is None:
+                continue
+            load[team_id] = load.get(team_id, 0) + 1
+            total += score[rider_id, team_id]
+        if all(n <= max_riders for n in load.values()):
+            best = max(best, total)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_ottimo_come_ricerca_esaustiva(seed):
+    rnd = random.Random(seed)
+    teams = [(i, f"T{i}", rnd.choice(CATEGORY_LADDER)) for i in range(1, 5)]
+    riders = [
+        _rider(str(100 + i), rnd.choice(CATEGORY_LADDER), wkg=round(rnd.uniform(2.0, 5.0), 2),
+               active=int(rnd.random() > 0.1), available=int(rnd.random() > 0.1))
+        for i in range(7)
+    ]
+    memberships = [
+        (rider["id"], team_id)
+        for rider in riders
+        for team_id in rnd.sample(range(1, 5), rnd.randint(1, 3))
+    ]
+    lineups = [(4, rnd.choice([RACE_DATE, "2025-10-14"]), rnd.choice(riders)["id"]) for _ in range(2)]
+    selected = {1, 2, 3} if seed % 2 else {1, 2, 3, 4}
+    max_riders = rnd.randint(1, 3)
+
+    conn = _db(teams, riders, memberships, lineups)
+    team_rows, candidates, _ = _candidati(conn, team_ids=sorted(selected))
+    eligible = _eligible_brute(teams, riders, memberships, lineups, selected)
+    assert {r["zwift_power_id"]: r["teams"] for r in candidates} == eligible
+
+    result = assegna_formazioni(team_rows, candidates, RACE_TYPE, max_riders=max_riders)
+
+    # Soluzione ammissibile: capienza, un solo team per rider, solo team ammessi
+    seen = set()
+    for team_id, team_riders in result["assignment"].items():
+        assert len(team_riders) <= max_riders
+        for rider in team_riders:
+            assert team_id in eligible[rider["zwift_power_id"]]
+            assert rider["zwift_power_id"] not in seen
+            seen.add(rider["zwift_power_id"])
+
+    team_by_id = {t["id"]: t for t in team_rows}
+    score = {
+        (r["zwift_power_id"], team_id): punteggio_assegnazione(r, team_by_id[team_id], RACE_TYPE)
+        for r in candidates for team_id in r["teams"]
+    }
+    assert result["score"] == pytest.approx(_brute_force(eligible, score, max_riders), abs=1e-6)
@@ -0,0 +1,110 @@
+"""
+Retention dei backup (da_tenere, pulisci) con un "now" fisso e metadati
+sintetici: nessun database da copiare.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from utils import backups
+
+NOW = datetime(2026, 3, 18, 12, 30)  # mercoledì, settimana ISO 2026-W12
+
+
+@pytest.fixture(autouse=True)
+def finestre(monkeypatch, tmp_path):
+    monkeypatch.setattr(backups, "HOURLY", 24)
+    monkeypatch.setattr(backups, "DAILY", 7)
+    monkeypatch.setattr(backups, "WEEKLY", 8)
+    monkeypatch.setattr(backups, "BACKUP_DIR", str(tmp_path))
+
+
+def _meta(stamp, content_hash="h"):
+    created = datetime.fromisoformat(stamp)
+    return {
+        "id": created.strftime("%Y%m%d_%H%M%S_%f"),
+        "created_at": created.isoformat(timespec="seconds"),
+        "hash": content_hash,
+    }
+
+
+def _ids(*stamps):
+    return {_meta(stamp)["id"] for stamp in stamps}
+
+
+def test_bucket_orari_giornalieri_settimanali():
+    snapshots = [_meta(s) for s in (
+        "2026-03-18T12:10", "2026-03-18T12:20",  # stessa ora: solo il più recente
+        "2026-03-18T11:05", "2026-03-18T11:50",
+        "2026-03-17T23:40",                      # entro 24 ore e ultimo del 17
+        "2026-03-17T08:00",                      # fuori dalle 24 ore, non l'ultimo del giorno
+        "2026-03-12T10:00", "2026-03-12T18:00",  # entro 7 giorni: l'ultimo del 12
+        "2026-03-10T09:00",                      # fuori dai 7 giorni, settimana W11 già coperta
+        "2026-02-02T09:00", "2026-02-03T09:00",  # settimana W06: solo il più recente
+        "2026-01-05T09:00",                      # oltre le 8 settimane
+    )]
+    assert backups.da_tenere(snapshots, now=NOW) == _ids(
+        "2026-03-18T12:20", "2026-03-18T11:50", "2026-03-17T23:40", "2026-03-12T18:00", "2026-02-03T09:00",
+    )
+
+
+def test_settimana_iso_a_cavallo_dell_anno(monkeypatch):
+    monkeypatch.setattr(backups, "HOURLY", 0)
+    monkeypatch.setattr(backups, "DAILY", 0)
+    snapshots = [_meta(s) for s in (
+        "2025-12-28T10:00",  # domenica: 2025-W52
+        "2025-12-29T10:00",  # lunedì: 2026-W01, come il 2 gennaio
+        "2026-01-02T10:00",
+        "2026-01-06T10:00",  # 2026-W02
+    )]
+    keep = backups.da_tenere(snapshots, now=datetime(2026, 1, 10, 12, 0))
+    assert keep == _ids("2025-12-28T10:00", "2026-01-02T10:00", "2026-01-06T10:00")
+
+
+def test_il_piu_recente_resta_sempre():
+    snapshots = [_meta(s) for s in ("2024-01-01T10:00", "2024-06-01T10:00", "2024-05-01T10:00")]
+    assert backups.da_tenere(snapshots, now=NOW) == _ids("2024-06-01T10:00")
+    assert backups.da_tenere([], now=NOW) == set()
+
+
+def _scrivi(meta, tmp_path):
+    snapshots_dir = tmp_path / "snapshots"
+    snapshots_dir.mkdir(exist_ok=True)
+    (snapshots_dir / f"{meta['id']}.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _oggetto(content_hash, tmp_path, age_s):
+    objects_dir = tmp_path / "objects"
+    objects_dir.mkdir(exist_ok=True)
+    path = objects_dir / f"{content_hash}.db.lz4"
+    path.write_bytes(b"x")
+    old = time.time() - age_s
+    os.utime(path, (old, old))
+    return path
+
+
+def test_pulisci_rimuove_solo_gli_oggetti_non_referenziati(tmp_path):
+    old = backups.ORPHAN_GRACE_S + 60
+    kept_new = _meta("2026-03-18T12:20", "aaa")        # tenuto
+    dropped_same = _meta("2026-03-18T12:10", "aaa")    # scartato, stesso contenuto di uno tenuto
+    kept_day = _meta("2026-03-12T18:00", "bbb")        # tenuto (bucket giornaliero)
+    dropped_only = _meta("2026-03-12T10:00", "ccc")    # scartato, unico riferimento a ccc
+    for meta in (kept_new, dropped_same, kept_day, dropped_only):
+        _scrivi(meta, tmp_path)
+    objects = {h: _oggetto(h, tmp_path, old) for h in ("aaa", "bbb", "ccc", "ddd")}
+    young_orphan = _oggetto("eee", tmp_path, 10)       # forse di un backup in corso
+
+    result = backups.pulisci(now=NOW)
+
+    assert result == {"kept": 2, "removed": 2, "objects_removed": 2}
+    assert {m["id"] for m in backups.lista_backup()} == {kept_new["id"], kept_day["id"]}
+    assert objects["aaa"].exists() and objects["bbb"].exists()
+    assert not objects["ccc"].exists() and not objects["ddd"].exists()
+    assert young_orphan.exists()
+
+
+def test_pulisci_senza_backup(tmp_path):
+    assert backups.pulisci(now=NOW) == {"kept": 0, "removed": 0, "objects_removed": 0}
@@ -0,0 +1,101 @@
+"""
+translate_sql sulle query reali dei blueprint: nessun server PostgreSQL,
+solo il confronto fra il testo SQLite e quello tradotto.
+"""
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from utils.db_postgres import translate_sql
+
+
+@pytest.mark.parametrize("sqlite, postgres", [
+    # admin_lineup / ai_lineup / captain_dashboard
+    (
+        "SELECT MIN(race_date) as race_date FROM races WHERE race_date >= DATE('now')",
+        "SELECT MIN(race_date) as race_date FROM races WHERE race_date >= TO_CHAR(CURRENT_DATE, 'YYYY-MM-DD')",
+    ),
+    # utils/wtrl/wtrl_import_races.py
+    (
+        "WHERE date('now') BETWEEN date(r.start_date) AND date(r.end_date)",
+        "WHERE TO_CHAR(CURRENT_DATE, 'YYYY-MM-DD') BETWEEN SUBSTR(CAST(r.start_date AS TEXT), 1, 10)"
+        " AND SUBSTR(CAST(r.end_date AS TEXT), 1, 10)",
+    ),
+    # captain_availability
+    (
+        "UPDATE races SET active = 1 WHERE race_date = ("
+        " SELECT MIN(race_date) FROM races WHERE race_date >= DATE('now'))",
+        "UPDATE races SET active = 1 WHERE race_date = ("
+        " SELECT MIN(race_date) FROM races WHERE race_date >= TO_CHAR(CURRENT_DATE, 'YYYY-MM-DD'))",
+    ),
+])
+def test_date_now(sqlite, postgres):
+    assert translate_sql(sqlite) == postgres
+
+
+def test_group_concat():
+    # admin_reports
+    assert translate_sql("COALESCE(GROUP_CONCAT(DISTINCT t.name), '') AS teams") == \
+        "COALESCE(STRING_AGG(DISTINCT CAST(t.name AS TEXT), ','), '') AS teams"
+    assert translate_sql("SELECT GROUP_CONCAT(name, ' | ') FROM riders") == \
+        "SELECT STRING_AGG(CAST(name AS TEXT), ' | ') FROM riders"
+
+
+def test_group_concat_annidato():
+    assert translate_sql("SELECT GROUP_CONCAT(DATE(race_date)) FROM races") == \
+        "SELECT STRING_AGG(CAST(SUBSTR(CAST(race_date AS TEXT), 1, 10) AS TEXT), ',') FROM races"
+
+
+def test_substr_negativo():
+    assert translate_sql("SELECT SUBSTR(race_date, -5) FROM races") == \
+        "SELECT RIGHT(CAST(race_date AS TEXT), 5) FROM races"
+    assert translate_sql("SELECT SUBSTR(race_date, 1, 4) FROM races") == \
+        "SELECT SUBSTR(race_date, 1, 4) FROM races"
+
+
+def test_insert_or_replace():
+    # admin_teams.manage_team_members: tutte le colonne sono chiave
+    assert translate_sql("""
+        INSERT OR REPLACE INTO rider_teams (zwift_power_id, team_id)
+        VALUES (?, ?)
+    """) == """
+        INSERT INTO rider_teams (zwift_power_id, team_id)
+        VALUES (%s, %s) ON CONFLICT (zwift_power_id, team_id) DO NOTHING"""
+
+    assert translate_sql(
+        "INSERT OR REPLACE INTO availability (rider_id, race_id, status) VALUES (?, ?, ?);"
+    ) == (
+        "INSERT INTO availability (rider_id, race_id, status) VALUES (%s, %s, %s)"
+        " ON CONFLICT (rider_id, race_id) DO UPDATE SET status = EXCLUDED.status"
+    )
+
+
+def test_insert_or_replace_tabella_sconosciuta():
+    with pytest.raises(ValueError, match="chiave di conflitto"):
+        translate_sql("INSERT OR REPLACE INTO zwift_power_riders (zwift_power_id, name) VALUES (?, ?)")
+
+
+def test_insert_or_ignore():
+    assert translate_sql("INSERT OR IGNORE INTO captains (team_id, zwift_power_id) VALUES (?, ?)") == \
+        "INSERT INTO captains (team_id, zwift_power_id) VALUES (%s, %s) ON CONFLICT DO NOTHING"
+
+
+def test_segnaposto_nelle_stringhe():
+    # ? e % dentro gli apici restano testo; % fuori va raddoppiato per psycopg2
+    assert translate_sql("SELECT 'it''s ?' AS x, ? AS y") == "SELECT 'it''s ?' AS x, %s AS y"
+    assert translate_sql("SELECT * FROM riders WHERE name LIKE '%?%' AND category = ?") == \
+        "SELECT * FROM riders WHERE name LIKE '%%?%%' AND category = %s"
+    assert translate_sql('SELECT "col?" FROM t WHERE a = ?') == 'SELECT "col?" FROM t WHERE a = %s'
+    assert translate_sql("SELECT ftp % 10 FROM riders WHERE id = ?") == "SELECT ftp %% 10 FROM riders WHERE id = %s"
+
+
+def test_parametri_con_nome():
+    assert translate_sql("UPDATE riders SET name = :name WHERE zwift_power_id = :id", named=True) == \
+        "UPDATE riders SET name = %(name)s WHERE zwift_power_id = %(id)s"
+    # Senza named il testo ":x" dentro gli apici e fuori resta com'è
+    assert translate_sql("SELECT '10:30' AS t") == "SELECT '10:30' AS t"
+
+
+def test_autoincrement():
+    assert translate_sql("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT)") == \
+        "CREATE TABLE t (id SERIAL PRIMARY KEY, name TEXT)"
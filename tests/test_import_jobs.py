@@ -0,0 +1,121 @@
+"""
+Pianificazioni dei job di import: parse_cron e prossima_esecuzione,
+confrontata con la scansione minuto per minuto.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.import_jobs import _cron_match, parse_cron, prossima_esecuzione
+
+SUNDAY = datetime(2026, 10, 18, 12, 0)  # domenica
+
+
+# ===============================================================
+# 🔹 parse_cron
+# ===============================================================
+
+def test_campi():
+    minutes, hours, days, months, weekdays, day_or = parse_cron("30 3 * * *")
+    assert minutes == {30} and hours == {3}
+    assert days == set(range(1, 32)) and months == set(range(1, 13)) and weekdays == set(range(7))
+    assert day_or is False
+
+
+def test_liste_intervalli_passi():
+    minutes, hours, days, months, weekdays, _ = parse_cron("0,15-17,*/20 9-17/4 1,15 */3 1-5")
+    assert minutes == {0, 15, 16, 17, 20, 40}
+    assert hours == {9, 13, 17}
+    assert days == {1, 15}
+    assert months == {1, 4, 7, 10}
+    assert weekdays == {1, 2, 3, 4, 5}
+
+
+def test_domenica_7():
+    assert parse_cron("0 0 * * 7")[4] == {0}
+    assert parse_cron("0 0 * * 5-7")[4] == {0, 5, 6}
+
+
+@pytest.mark.parametrize("expr, day_or", [
+    ("0 0 13 * 5", True), ("0 0 * * 5", False), ("0 0 13 * *", False), ("0 0 */2 * 2", False),
+])
+def test_giorno_o(expr, day_or):
+    assert parse_cron(expr)[5] is day_or
+
+
+@pytest.mark.parametrize("expr", [
+    "* * * *", "* * * * * *", "60 * * * *", "* 24 * * *", "* * 0 * *",
+    "* * * 13 *", "* * * * 8", "*/0 * * * *", "5-3 * * * *", "a * * * *",
+])
+def test_espressioni_non_valide(expr):
+    with pytest.raises(ValueError):
+        parse_cron(expr)
+
+
+# ===============================================================
+# 🔹 prossima_esecuzione
+# ===============================================================
+
+@pytest.mark.parametrize("expr, after, expected", [
+    # Pianificazioni di default
+    ("30 3 * * *", SUNDAY, datetime(2026, 10, 19, 3, 30)),
+    ("0 4 * * 1", SUNDAY, datetime(2026, 10, 19, 4, 0)),
+    ("0 4 * * 1", datetime(2026, 10, 19, 4, 0), datetime(2026, 10, 26, 4, 0)),
+    ("15 * * * *", datetime(2026, 10, 18, 12, 15, 30), datetime(2026, 10, 18, 13, 15)),
+    ("15 * * * *", datetime(2026, 10, 18, 23, 50), datetime(2026, 10, 19, 0, 15)),
+    # Cambio di mese e di anno
+    ("0 0 1 * *", datetime(2026, 12, 15), datetime(2027, 1, 1)),
+    ("0 12 29 2 *", datetime(2027, 3, 1), datetime(2028, 2, 29, 12, 0)),
+    # Giorno del mese e della settimana entrambi limitati: basta uno dei due
+    ("0 0 13 * 5", SUNDAY, datetime(2026, 10, 23)),
+    ("0 0 20 * 5", SUNDAY, datetime(2026, 10, 20)),
+    # Uno solo limitato: vale quello
+    ("0 0 */2 * 2", SUNDAY, datetime(2026, 10, 27)),
+])
+def test_casi_noti(expr, after, expected):
+    assert prossima_esecuzione(expr, after) == expected
+
+
+def test_mai():
+    assert prossima_esecuzione("0 0 30 2 *", SUNDAY) is None
+
+
+def _scansione(cron, after, days):
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    for _ in range(days * 24 * 60):
+        if _cron_match(cron, moment):
+            return moment
+        moment += timedelta(minutes=1)
+    return None
+
+
+def _campo(rnd, low, high):
+    kind = rnd.choice(["*", "value", "list", "range", "step"])
+    if kind == "*":
+        return "*"
+    if kind == "value":
+        return str(rnd.randint(low, high))
+    if kind == "list":
+        return ",".join(str(v) for v in rnd.sample(range(low, high + 1), 2))
+    if kind == "range":
+        start = rnd.randint(low, high)
+        return f"{start}-{rnd.randint(start, high)}"
+    return f"*/{rnd.randint(2, 5)}"
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_come_scansione_minuto_per_minuto(seed):
+    rnd = random.Random(seed)
+    expr = " ".join([
+        _campo(rnd, 0, 59), _campo(rnd, 0, 23), _campo(rnd, 1, 31),
+        rnd.choice(["*", "*", f"{rnd.randint(1, 12)}-12"]), _campo(rnd, 0, 6),
+    ])
+    after = datetime(2026, 1, 1) + timedelta(minutes=rnd.randint(0, 365 * 24 * 60))
+    days = 45
+    expected = _scansione(parse_cron(expr), after, days)
+    found = prossima_esecuzione(expr, after)
+    if expected is None:
+        assert found is None or found >= after + timedelta(days=days)
+    else:
+        assert found == expected, expr
@@ -0,0 +1,46 @@
+"""
+save_lineup con skip_conflicts: i rider già schierati da un altro team
+vengono esclusi e restano in result["conflicts"] per il messaggio al capitano.
+"""
+from utils.lineup import lineup_error_message, lineup_skipped_message, save_lineup
+
+RACE_DATE = "2030-01-07"
+
+
+def _riders(conn, n):
+    return [row[0] for row in conn.execute(
+        "SELECT zwift_power_id FROM riders ORDER BY zwift_power_id LIMIT ?", (n,)
+    ).fetchall()]
+
+
+def _team_name(conn, team_id):
+    return conn.execute("SELECT name FROM teams WHERE id = ?", (team_id,)).fetchone()[0]
+
+
+def _rider_name(conn, rider_id):
+    return conn.execute("SELECT name FROM riders WHERE zwift_power_id = ?", (rider_id,)).fetchone()[0]
+
+
+def test_salvataggio_parziale(zrl_conn):
+    a, b, c = _riders(zrl_conn, 3)
+    assert save_lineup(zrl_conn, 2, RACE_DATE, [a])["saved"]
+
+    result = save_lineup(zrl_conn, 1, RACE_DATE, [a, b, c], skip_conflicts=True)
+    assert result["saved"] and result["riders"] == [str(b), str(c)]
+    assert [conflict["zwift_power_id"] for conflict in result["conflicts"]] == [str(a)]
+
+    message = lineup_skipped_message(result)
+    assert f"{_rider_name(zrl_conn, a)} ({_team_name(zrl_conn, 2)})" in message
+    assert _rider_name(zrl_conn, b) not in message
+
+
+def test_nessun_conflitto(zrl_conn):
+    result = save_lineup(zrl_conn, 1, RACE_DATE, _riders(zrl_conn, 2), skip_conflicts=True)
+    assert result["saved"] and lineup_skipped_message(result) is None
+
+
+def test_troppi_rider(zrl_conn):
+    result = save_lineup(zrl_conn, 1, RACE_DATE, _riders(zrl_conn, 7), skip_conflicts=True)
+    assert not result["saved"]
+    assert lineup_skipped_message(result) is None
+    assert lineup_error_message(result) == "⚠️ Puoi selezionare al massimo 6 rider"
@@ -0,0 +1,175 @@
+"""
+FlowGraph.max_profit_flow su assegnazioni rider → team, confrontato con
+la ricerca esaustiva e, con punteggi che dipendono solo dal rider, con
+l'assegnazione greedy a cammini aumentanti usata prima del flusso.
+"""
+import itertools
+import random
+
+import pytest
+
+from blueprints.ai_lineup.ai_engine import assegna_formazioni
+from blueprints.ai_lineup.min_cost_flow import FlowGraph
+
+
+def _assegna(scores, capacity):
+    """
+    scores: {rider: {team: punteggio intero}}; capacity: {team: posti}.
+    Restituisce ({rider: team}, somma) letti dal flusso.
+    """
+    riders = list(scores)
+    teams = list(capacity)
+    team_node = {team: 1 + len(riders) + i for i, team in enumerate(teams)}
+    source, sink = 0, 1 + len(riders) + len(teams)
+    graph = FlowGraph(sink + 1)
+    edges = []
+    for i, rider in enumerate(riders, start=1):
+        graph.add_edge(source, i, 1, 0)
+        for team, score in scores[rider].items():
+            edges.append((graph.add_edge(i, team_node[team], 1, -score), rider, team))
+    for team in teams:
+        graph.add_edge(team_node[team], sink, capacity[team], 0)
+
+    flow, cost = graph.max_profit_flow(source, sink)
+    chosen = {rider: team for edge, rider, team in edges if graph.flow_on(edge)}
+    total = sum(scores[rider][team] for rider, team in chosen.items())
+    assert flow == len(chosen)
+    assert cost == -total
+    return chosen, total
+
+
+def _ammissibile(chosen, scores, capacity):
+    load = {}
+    for rider, team in chosen.items():
+        assert team in scores[rider]
+        load[team] = load.get(team, 0) + 1
+    assert all(load[team] <= capacity[team] for team in load)
+
+
+def _brute_force(scores, capacity):
+    riders = list(scores)
+    best = 0
+    for choice in itertools.product(*[[None] + list(scores[r]) for r in riders]):
+        load = {}
+        for team in choice:
+            if team is not None:
+                load[team] = load.get(team, 0) + 1
+        if all(load[team] <= capacity[team] for team in load):
+            best = max(best, sum(scores[r][t] for r, t in zip(riders, choice) if t is not None))
+    return best
+
+
+# ===============================================================
+# 🔹 CASI NOTI
+# ===============================================================
+
+def test_parita():
+    # Tre rider identici per due posti: qualunque coppia è ottima
+    scores = {r: {"A": 5, "B": 5} for r in ("r1", "r2", "r3")}
+    capacity = {"A": 1, "B": 1}
+    chosen, total = _assegna(scores, capacity)
+    _ammissibile(chosen, scores, capacity)
+    assert total == 10 and len(chosen) == 2
+
+
+def test_team_senza_rider_ammessi():
+    scores = {"r1": {"A": 7}, "r2": {"A": 3}}
+    capacity = {"A": 1, "B": 6}
+    chosen, total = _assegna(scores, capacity)
+    assert chosen == {"r1": "A"}
+    assert total == 7
+
+
+def test_rider_con_un_solo_team():
+    # r2 può andare solo in A: r1, più forte ma con un'alternativa, va spostato in B
+    scores = {"r1": {"A": 10, "B": 8}, "r2": {"A": 9}}
+    capacity = {"A": 1, "B": 1}
+    chosen, total = _assegna(scores, capacity)
+    assert chosen == {"r1": "B", "r2": "A"}
+    assert total == 17
+
+
+def test_posti_piu_dei_rider():
+    scores = {"r1": {"A": 4, "B": 6}, "r2": {"B": 2}, "r3": {"A": 1}}
+    capacity = {"A": 6, "B": 6}
+    chosen, total = _assegna(scores, capacity)
+    # Ogni rider prende il suo team migliore
+    assert chosen == {"r1": "B", "r2": "B", "r3": "A"}
+    assert total == 9
+
+
+def test_nessun_rider():
+    chosen, total = _assegna({}, {"A": 6})
+    assert chosen == {} and total == 0
+
+
+def test_punteggi_nulli_non_aggiunti():
+    # Un rider a punteggio zero non migliora la somma: il flusso si ferma prima
+    chosen, total = _assegna({"r1": {"A": 0}, "r2": {"A": 3}}, {"A": 6})
+    assert chosen == {"r2": "A"} and total == 3
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_ottimo_come_ricerca_esaustiva(seed):
+    rnd = random.Random(seed)
+    teams = ["A", "B", "C", "D"][:rnd.randint(1, 4)]
+    capacity = {team: rnd.randint(0, 3) for team in teams}
+    scores = {
+        f"r{i}": {team: rnd.choice([1, 2, 3, 5, 5, 8]) for team in rnd.sample(teams, rnd.randint(1, min(2, len(teams))))}
+        for i in range(rnd.randint(0, 7))
+    }
+    chosen, total = _assegna(scores, capacity)
+    _ammissibile(chosen, scores, capacity)
+    assert total == _brute_force(scores, capacity)
+
+
+# ===============================================================
+# 🔹 PUNTEGGI SOLO DEL RIDER: COME L'ASSEGNAZIONE PRECEDENTE
+# ===============================================================
+
+def _trova_posto(rider_id, teams_of, members, capacity, visited):
+    """Cammino aumentante dell'ottimizzatore greedy precedente (ai_engine, prima del flusso)."""
+    for team_id in teams_of[rider_id]:
+        if team_id in visited:
+            continue
+        visited.add(team_id)
+        if len(members[team_id]) < capacity[team_id]:
+            members[team_id].append(rider_id)
+            return True
+        for other_id in list(members[team_id]):
+            members[team_id].remove(other_id)
+            if _trova_posto(other_id, teams_of, members, capacity, visited):
+                members[team_id].append(rider_id)
+                return True
+            members[team_id].append(other_id)
+    return False
+
+
+def _greedy_precedente(riders, teams, max_riders):
+    teams_of = {r["zwift_power_id"]: r["teams"] for r in riders}
+    capacity = {t["id"]: max_riders for t in teams}
+    members = {t["id"]: [] for t in teams}
+    score_of = {r["zwift_power_id"]: r["base_score"] for r in riders}
+    order = sorted(riders, key=lambda r: (-r["base_score"], len(r["teams"]), r["zwift_power_id"]))
+    for rider in order:
+        _trova_posto(rider["zwift_power_id"], teams_of, members, capacity, set())
+    return round(sum(score_of[rider_id] for ids in members.values() for rider_id in ids), 3)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_come_greedy_precedente_con_punteggi_del_rider(seed):
+    rnd = random.Random(seed)
+    n_teams = rnd.randint(1, 5)
+    # Stessa categoria per tutti e disponibilità certa: il punteggio non dipende dal team
+    teams = [{"id": i, "name": f"T{i}", "category": "B"} for i in range(n_teams)]
+    riders = [
+        {
+            "zwift_power_id": str(1000 + i), "name": f"R{i}", "category": "B", "availability": None,
+            "base_score": round(rnd.uniform(1, 10), 3),
+            "teams": rnd.sample(range(n_teams), rnd.randint(1, min(2, n_teams))),
+        }
+        for i in range(rnd.randint(0, 25))
+    ]
+    max_riders = rnd.randint(1, 6)
+    result = assegna_formazioni(teams, riders, "pianura", max_riders=max_riders)
+    assert result["score"] == pytest.approx(_greedy_precedente(riders, teams, max_riders), abs=1e-6)
@@ -0,0 +1,46 @@
+"""
+simula_formazioni: a parità di seed i risultati non dipendono dal numero
+di processi del pool.
+"""
+import random
+
+import pytest
+
+from blueprints.ai_lineup import simulation
+from blueprints.ai_lineup.scoring import costruisci_colonne
+
+PROFILE = {"weight_pianura": 0.6, "weight_montagna": 0.4, "sprint_segments": 2, "climb_segments": 1}
+
+
+def _colonne(n=60):
+    rnd = random.Random(7)
+    rows = []
+    for i in range(n):
+        weight = rnd.uniform(55, 90)
+        wkg = rnd.uniform(2.5, 5.0)
+        rows.append((str(1000 + i), wkg * weight, weight, wkg, wkg * 2.5, 300, "B", wkg * weight))
+    return costruisci_colonne(rows)
+
+
+def test_stessi_risultati_con_o_senza_pool():
+    columns = _colonne()
+    lineups = [columns["ids"][:6], columns["ids"][3:9]]
+    trials = 2 * simulation.BATCH_TRIALS + 500
+
+    runs = [
+        simulation.simula_formazioni(columns, PROFILE, lineups, trials=trials, seed=42, workers=workers)
+        for workers in (0, 1, 2, 3)
+    ]
+    for run in runs:
+        assert run["trials"] == trials
+        for row, first in zip(run["results"], runs[0]["results"]):
+            for name in simulation.COMPONENTS + ["TOTAL"]:
+                assert row[name] == first[name]
+            assert row["best_share"] == first["best_share"]
+
+
+@pytest.mark.parametrize("trials", [1, 999, 1000, 1001])
+def test_numero_di_prove(trials):
+    columns = _colonne()
+    result = simulation.simula_formazioni(columns, PROFILE, [columns["ids"][:6]], trials=trials, seed=1)
+    assert result["trials"] == trials
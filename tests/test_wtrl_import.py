@@ -0,0 +1,84 @@
+"""
+Reimport WTRL invariato: upsert_races, refresh_race_profiles e
+wtrl_import non scrivono nulla (conn.total_changes non cambia).
+"""
+import pytest
+
+from utils import wtrl_import as importer
+from utils.race_digest import upsert_races
+from utils.race_profiles import refresh_race_profiles
+
+
+@pytest.fixture
+def conn(zrl_conn):
+    return zrl_conn
+
+
+def _gara(name, race_date, round_id, **fields):
+    race = {
+        "name": name, "race_date": race_date, "format": "Points Race", "world": "Watopia",
+        "course": "Volcano Flat", "laps": 3, "distance_km": 36.8, "elevation_m": 180.0,
+        "powerups": "", "fal_segments": "Volcano KOM", "fts_segments": "Fuego Flats Sprint",
+        "round_id": round_id, "active": 1,
+    }
+    race.update(fields)
+    return race
+
+
+def _round(conn):
+    return conn.execute("SELECT id FROM rounds ORDER BY id LIMIT 1").fetchone()["id"]
+
+
+def _import(conn, races):
+    counts = upsert_races(conn, races)
+    written = refresh_race_profiles(conn, counts["race_ids"])
+    conn.commit()
+    return counts, written
+
+
+def test_upsert_invariato_non_scrive(conn):
+    round_id = _round(conn)
+    races = [_gara("Test race 1", "2030-01-07", round_id), _gara("Test race 2", "2030-01-14", round_id)]
+
+    counts, written = _import(conn, races)
+    assert (counts["inserted"], counts["updated"], counts["skipped"]) == (2, 0, 0)
+    assert len(counts["race_ids"]) == 2 and written == 2
+
+    before = conn.total_changes
+    counts, written = _import(conn, races)
+    assert (counts["inserted"], counts["updated"], counts["skipped"]) == (0, 0, 2)
+    assert counts["race_ids"] == [] and written == 0
+    assert conn.total_changes == before
+
+
+def test_upsert_solo_le_gare_cambiate(conn):
+    round_id = _round(conn)
+    races = [_gara("Test race 1", "2030-01-07", round_id), _gara("Test race 2", "2030-01-14", round_id)]
+    _import(conn, races)
+
+    races[1] = dict(races[1], laps=5)
+    counts, written = _import(conn, races)
+    changed_id = conn.execute("SELECT id FROM races WHERE name = 'Test race 2'").fetchone()["id"]
+    assert counts["updated"] == 1 and counts["race_ids"] == [changed_id]
+    assert written == 1
+    assert conn.execute("SELECT laps FROM races WHERE id = ?", (changed_id,)).fetchone()["laps"] == 5
+
+
+def test_wtrl_import_invariato_non_scrive(conn, monkeypatch):
+    def gare(job):
+        n = job["round_number"]
+        return [_gara(f"Round {n} race {i}", f"2030-0{n}-{10 + i}", None) for i in range(3)]
+
+    async def scarica(jobs, parse, writer):
+        for job in jobs:
+            writer(job, gare(job), {"start_date": f"2030-0{job['round_number']}-01", "end_date": f"2030-0{job['round_number']}-28"})
+        return []
+
+    monkeypatch.setattr(importer, "get_fresh_zrl_db", lambda: conn)
+    monkeypatch.setattr(importer, "close_zrl_db", lambda c: None)
+    monkeypatch.setattr(importer, "scarica_calendario", scarica)
+
+    assert importer.wtrl_import()["failed_rounds"] == []
+    before = conn.total_changes
+    assert importer.wtrl_import() == {"imported": 12, "failed_rounds": []}
+    assert conn.total_changes == before
@@ -1,17 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from werkzeug.security import check_password_hash
 from functools import wraps
-import sqlite3
+from db import get_zrl_db
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
-DB_PATH = "zrl.db"
-
 # 🔌 Connessione al database
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_zrl_db()
 
 # 🔐 Decoratori di accesso
 def require_admin(f):
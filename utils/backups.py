@@ -0,0 +1,309 @@
+"""
+Backup online del database ZRL (SQLite).
+
+La copia usa l'API di backup di SQLite a blocchi di pagine, con una pausa
+fra un blocco e l'altro: gli altri processi continuano a scrivere e la
+copia resta coerente (mai un file a metà come con shutil.copy2).
+
+Ogni snapshot viene compresso con lz4 e salvato una volta sola per
+contenuto (sha256): un backup di un database invariato costa solo il
+file dei metadati.
+
+    backups/objects/<sha256>.db.lz4     contenuto
+    backups/snapshots/<id>.json         id, data, hash, dimensioni, motivo
+
+Retention: l'ultimo snapshot di ogni ora per HOURLY ore, di ogni giorno per
+DAILY giorni, di ogni settimana per WEEKLY settimane.
+
+    python -m utils.backups create | list | verify [id] | restore <id> | prune
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import lz4.frame
+
+from db import BASE_DIR, DB_BACKEND, ZRL_DB_PATH
+from utils.import_jobs import NO_PROGRESS
+
+# ===============================================================
+# ⚙️ CONFIGURAZIONE
+# ===============================================================
+BACKUP_DIR = os.environ.get("ZRL_BACKUP_DIR", os.path.join(BASE_DIR, "backups"))
+# Pagine copiate per passo e pausa fra i passi (i writer prendono il lock nel frattempo)
+PAGES_PER_STEP = int(os.environ.get("ZRL_BACKUP_PAGES_PER_STEP", "256"))
+STEP_PAUSE_S = float(os.environ.get("ZRL_BACKUP_STEP_PAUSE_S", "0.005"))
+
+HOURLY = int(os.environ.get("ZRL_BACKUP_HOURLY", "24"))
+DAILY = int(os.environ.get("ZRL_BACKUP_DAILY", "7"))
+WEEKLY = int(os.environ.get("ZRL_BACKUP_WEEKLY", "8"))
+
+# Un oggetto non referenziato più giovane di così può essere di un backup in corso
+ORPHAN_GRACE_S = 3600
+
+
+def _objects_dir():
+    return os.path.join(BACKUP_DIR, "objects")
+
+
+def _snapshots_dir():
+    return os.path.join(BACKUP_DIR, "snapshots")
+
+
+def _object_path(content_hash):
+    return os.path.join(_objects_dir(), f"{content_hash}.db.lz4")
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _copia_online(source_path, target_path):
+    """Copia SQLite → SQLite a passi di PAGES_PER_STEP pagine."""
+    def pausa(status, remaining, total):
+        time.sleep(STEP_PAUSE_S)
+
+    src = sqlite3.connect(source_path)
+    dst = sqlite3.connect(target_path)
+    try:
+        src.backup(dst, pages=PAGES_PER_STEP, progress=pausa)
+    finally:
+        dst.close()
+        src.close()
+
+
+# ===============================================================
+# 💾 BACKUP
+# ===============================================================
+
+def crea_backup(reason="manuale", db_path=ZRL_DB_PATH):
+    """
+    Snapshot del database. Restituisce i metadati (con "deduplicated" se il
+    contenuto era già salvato) oppure None con il backend PostgreSQL.
+    """
+    if DB_BACKEND == "postgres" and db_path == ZRL_DB_PATH:
+        logging.info("ℹ️ Backend PostgreSQL: backup con gli strumenti del server (pg_dump)")
+        return None
+
+    os.makedirs(_objects_dir(), exist_ok=True)
+    os.makedirs(_snapshots_dir(), exist_ok=True)
+
+    t0 = time.perf_counter()
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        _copia_online(db_path, tmp_path)
+        with open(tmp_path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(tmp_path)
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = _object_path(content_hash)
+    deduplicated = os.path.exists(path)
+    if deduplicated:
+        # Rinnova la data: prune non lo considera orfano
+        os.utime(path)
+    else:
+        _write_atomic(path, lz4.frame.compress(data))
+
+    now = datetime.now()
+    meta = {
+        "id": now.strftime("%Y%m%d_%H%M%S_%f"),
+        "created_at": now.isoformat(timespec="seconds"),
+        "hash": content_hash,
+        "size": len(data),
+        "compressed_size": os.path.getsize(path),
+        "reason": reason,
+        "deduplicated": deduplicated,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+    _write_atomic(os.path.join(_snapshots_dir(), f"{meta['id']}.json"), json.dumps(meta, indent=1).encode("utf-8"))
+    logging.info(f"💾 Backup {meta['id']} ({reason}){' invariato' if deduplicated else ''}")
+    return meta
+
+
+def lista_backup():
+    """Metadati degli snapshot, dal più recente."""
+    if not os.path.isdir(_snapshots_dir()):
+        return []
+    snapshots = []
+    for name in os.listdir(_snapshots_dir()):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(_snapshots_dir(), name), encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(snapshots, key=lambda meta: meta["id"], reverse=True)
+
+
+def _trova(backup_id):
+    for meta in lista_backup():
+        if meta["id"] == backup_id:
+            return meta
+    raise LookupError(f"Backup {backup_id} non trovato")
+
+
+def _estrai(meta, target_path):
+    """Decomprime lo snapshot in target_path controllandone l'hash."""
+    with open(_object_path(meta["hash"]), "rb") as f:
+        data = lz4.frame.decompress(f.read())
+    if hashlib.sha256(data).hexdigest() != meta["hash"]:
+        raise ValueError(f"Backup {meta['id']}: contenuto non corrisponde all'hash")
+    with open(target_path, "wb") as f:
+        f.write(data)
+
+
+# ===============================================================
+# ✅ VERIFICA E RIPRISTINO
+# ===============================================================
+
+def verifica(backup_id=None):
+    """Hash e PRAGMA integrity_check di uno snapshot (o di tutti). Restituisce {id: esito}."""
+    snapshots = [_trova(backup_id)] if backup_id else lista_backup()
+    results = {}
+    checked = {}
+    for meta in snapshots:
+        if meta["hash"] not in checked:
+            checked[meta["hash"]] = _verifica_oggetto(meta)
+        results[meta["id"]] = checked[meta["hash"]]
+    return results
+
+
+def _verifica_oggetto(meta):
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        _estrai(meta, tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        return result
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    finally:
+        os.remove(tmp_path)
+
+
+def ripristina(backup_id, db_path=ZRL_DB_PATH):
+    """
+    Riporta il database allo snapshot indicato, dopo averlo verificato e aver
+    salvato lo stato attuale (motivo "pre-restore"). La scrittura passa
+    dall'API di backup: le connessioni aperte vedono il nuovo contenuto.
+    """
+    meta = _trova(backup_id)
+    outcome = verifica(backup_id)[backup_id]
+    if outcome != "ok":
+        raise ValueError(f"Backup {backup_id} non valido: {outcome}")
+
+    before = crea_backup(reason=f"pre-restore {backup_id}", db_path=db_path)
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        _estrai(meta, tmp_path)
+        _copia_online(tmp_path, db_path)
+    finally:
+        os.remove(tmp_path)
+    logging.info(f"♻️ Database ripristinato dal backup {backup_id}")
+    return before
+
+
+# ===============================================================
+# 🧹 RETENTION
+# ===============================================================
+
+def da_tenere(snapshots, now=None):
+    """Id degli snapshot da tenere: il più recente di ogni ora, giorno e settimana nelle finestre."""
+    now = now or datetime.now()
+    windows = (
+        (now - timedelta(hours=HOURLY), "%Y%m%d%H"),
+        (now - timedelta(days=DAILY), "%Y%m%d"),
+        (now - timedelta(weeks=WEEKLY), "%G%V"),
+    )
+    keep = set()
+    if snapshots:
+        keep.add(max(snapshots, key=lambda meta: meta["id"])["id"])
+    for since, bucket_format in windows:
+        buckets = {}
+        for meta in snapshots:
+            created = datetime.fromisoformat(meta["created_at"])
+            if created < since:
+                continue
+            bucket = created.strftime(bucket_format)
+            if bucket not in buckets or meta["id"] > buckets[bucket]["id"]:
+                buckets[bucket] = meta
+        keep.update(meta["id"] for meta in buckets.values())
+    return keep
+
+
+def pulisci(now=None):
+    """Applica la retention e rimuove i contenuti non più referenziati."""
+    snapshots = lista_backup()
+    keep = da_tenere(snapshots, now)
+    removed = 0
+    for meta in snapshots:
+        if meta["id"] not in keep:
+            os.remove(os.path.join(_snapshots_dir(), f"{meta['id']}.json"))
+            removed += 1
+
+    referenced = {meta["hash"] for meta in snapshots if meta["id"] in keep}
+    orphans = 0
+    for name in os.listdir(_objects_dir()) if os.path.isdir(_objects_dir()) else []:
+        path = os.path.join(_objects_dir(), name)
+        if name.split(".")[0] in referenced:
+            continue
+        if time.time() - os.path.getmtime(path) > ORPHAN_GRACE_S:
+            os.remove(path)
+            orphans += 1
+    return {"kept": len(keep), "removed": removed, "objects_removed": orphans}
+
+
+def job_backup(progress=None):
+    """Job pianificato (utils.import_jobs): snapshot e retention."""
+    progress = progress or NO_PROGRESS
+    with progress.stage("backup"):
+        meta = crea_backup(reason="pianificato")
+    if meta is None:
+        return {"skipped": "postgres"}
+    with progress.stage("retention"):
+        cleanup = pulisci()
+    return {"id": meta["id"], "deduplicated": meta["deduplicated"], **cleanup}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    arg = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == "create":
+        print(crea_backup(reason=arg or "manuale"))
+    elif command == "list":
+        for meta in lista_backup():
+            print(
+                f"{meta['id']}  {meta['created_at']}  {meta['size'] / 1024:8.0f} KB → "
+                f"{meta['compressed_size'] / 1024:6.0f} KB  {meta['hash'][:12]}  {meta['reason']}"
+            )
+    elif command == "verify":
+        results = verifica(arg)
+        for backup_id, outcome in results.items():
+            print(f"{'✅' if outcome == 'ok' else '❌'} {backup_id}  {outcome}")
+        sys.exit(0 if all(outcome == "ok" for outcome in results.values()) else 1)
+    elif command == "restore" and arg:
+        ripristina(arg)
+    elif command == "prune":
+        print(pulisci())
+    else:
+        print(__doc__)
+        sys.exit(1)
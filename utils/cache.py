@@ -0,0 +1,123 @@
+"""
+Cache in memoria invalidata dalle versioni dei dati.
+
+Ogni scrittura su una tabella tracciata incrementa il contatore in
+data_versions (trigger creati dalla migrazione 0006), anche se arriva
+da un altro worker o da uno script. Una voce di cache resta valida
+finché le versioni delle tabelle da cui dipende non cambiano.
+"""
+import os
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+# Budget di memoria della cache report (MB)
+REPORT_CACHE_MB = float(os.environ.get("ZRL_REPORT_CACHE_MB", "32"))
+
+# Tabelle con trigger di versione (vedi utils/migrations.py)
+TRACKED_TABLES = ("race_lineup", "teams", "rider_teams", "riders", "captains", "races")
+
+
+def get_data_versions(conn, tables=TRACKED_TABLES):
+    """Vettore delle versioni delle tabelle indicate (una sola query)."""
+    rows = conn.execute("SELECT name, version FROM data_versions").fetchall()
+    versions = {row[0]: row[1] for row in rows}
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+class VersionedCache:
+    """Valori calcolati per chiave, ricostruiti quando cambiano le tabelle da cui dipendono."""
+
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, conn, key, build):
+        versions = get_data_versions(conn, self.tables)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry[1]
+
+        value = build()
+        with self._lock:
+            # Le voci costruite su versioni superate non servono più
+            self._entries = {k: v for k, v in self._entries.items() if v[0] == versions}
+            self._entries[key] = (versions, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _estimate_size(value):
+    """Dimensione approssimativa di un valore in byte."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 64 * 1024
+
+
+class ReportCache:
+    """
+    Cache LRU con budget di memoria per report ed export.
+    La chiave include il vettore di versioni delle tabelle: una scrittura
+    rende irraggiungibili le voci vecchie, che escono per LRU o alla prima
+    lettura con versioni diverse.
+    """
+
+    def __init__(self, tables, max_bytes=None):
+        self.tables = tuple(tables)
+        self.max_bytes = int((max_bytes if max_bytes is not None else REPORT_CACHE_MB * 1024 * 1024))
+        self._entries = OrderedDict()   # key → (versions, value, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, conn, key, build):
+        versions = get_data_versions(conn, self.tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = build()
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            logging.info(f"🧠 Report {key} troppo grande per la cache ({size} byte)")
+            return value
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            self._entries[key] = (versions, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,712 @@
+"""
+Backend PostgreSQL per il data layer ZRL.
+
+Le query dell'applicazione sono scritte in dialetto SQLite: questo modulo
+offre una connessione compatibile con l'interfaccia sqlite3 usata nei
+blueprint (execute, cursor, commit, righe accessibili per nome e indice)
+e traduce al volo le particolarità di SQLite:
+
+    ?                      → %s
+    INSERT OR REPLACE      → INSERT ... ON CONFLICT (pk) DO UPDATE
+    INSERT OR IGNORE       → INSERT ... ON CONFLICT DO NOTHING
+    GROUP_CONCAT(x)        → STRING_AGG(CAST(x AS TEXT), ',')
+    DATE('now') / DATE(x)  → data ISO come testo
+    substr(x, -n)          → RIGHT(CAST(x AS TEXT), n)
+    AUTOINCREMENT          → SERIAL
+
+Attivazione: ZRL_DB_BACKEND=postgres e DATABASE_URL=postgresql://...
+
+Test in locale con un'istanza usa e getta:
+
+    initdb -D /tmp/pgdata -U zrl --auth=trust
+    pg_ctl -D /tmp/pgdata -o "-p 5433 -k /tmp" -l /tmp/pg.log start
+    createdb -h /tmp -p 5433 -U zrl zrl
+    export DATABASE_URL=postgresql://zrl@/zrl?host=/tmp&port=5433
+    python -m utils.db_postgres init
+    python -m utils.db_postgres copy-from-sqlite
+"""
+import os
+import re
+import sys
+import time
+import datetime
+import logging
+import threading
+import warnings
+
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+from psycopg2 import extensions
+
+from db import start_query
+
+# pandas.read_sql_query funziona con qualsiasi connessione DB-API
+warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy", category=UserWarning)
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+POOL_MIN = int(os.environ.get("ZRL_PG_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("ZRL_PG_POOL_MAX", "10"))
+POOL_WAIT_S = float(os.environ.get("ZRL_PG_POOL_WAIT_S", "15"))
+
+IntegrityError = psycopg2.IntegrityError
+
+# ===============================================================
+# 🗂️ SCHEMA
+# ===============================================================
+
+# Chiavi di conflitto per tradurre INSERT OR REPLACE
+CONFLICT_KEYS = {
+    "riders": ("zwift_power_id",),
+    "rider_teams": ("zwift_power_id", "team_id"),
+    "race_results": ("race_date", "zwift_power_id"),
+    "captains": ("team_id", "zwift_power_id"),
+    "availability": ("rider_id", "race_id"),
+    "races": ("race_date", "name"),
+    "seasons": ("name",),
+    "leagues": ("name", "type", "region"),
+    "users": ("email",),
+    "admins": ("username",),
+}
+
+# Tabelle con chiave surrogata "id" (per cursor.lastrowid)
+SERIAL_TABLES = {
+    "admins", "users", "password_reset_tokens", "leagues", "seasons",
+    "rounds", "races", "teams", "captains", "availability", "import_jobs",
+}
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS admins (
+    id SERIAL PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    email TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL CHECK (role IN ('admin', 'captain')),
+    team_id INTEGER,
+    active INTEGER DEFAULT 1,
+    zwift_power_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    token TEXT UNIQUE NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS leagues (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    UNIQUE (name, type, region)
+);
+
+CREATE TABLE IF NOT EXISTS seasons (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    start_year TEXT NOT NULL,    -- l'app vi salva date ISO (YYYY-MM-DD)
+    end_year TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rounds (
+    id SERIAL PRIMARY KEY,
+    season_id INTEGER NOT NULL REFERENCES seasons(id) ON DELETE CASCADE,
+    round_number INTEGER NOT NULL,
+    name TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    is_active INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS races (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    race_date TEXT NOT NULL,
+    format TEXT,
+    world TEXT,
+    course TEXT,
+    laps INTEGER,
+    distance_km REAL,
+    elevation_m REAL,
+    powerups TEXT,
+    fal_segments TEXT,
+    fts_segments TEXT,
+    active INTEGER DEFAULT 1,
+    round_id INTEGER REFERENCES rounds(id),
+    external_id TEXT,
+    UNIQUE (race_date, name)
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    division TEXT NOT NULL,
+    captain_id TEXT,
+    captain_zwift_id TEXT,
+    league_id INTEGER REFERENCES leagues(id),
+    division_number INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS riders (
+    zwift_power_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT,
+    ranking REAL,
+    wkg_20min REAL,
+    watt_20min REAL,
+    wkg_15sec REAL,
+    watt_15sec REAL,
+    status TEXT,
+    races INTEGER,
+    weight REAL,
+    ftp REAL,
+    age INTEGER,
+    available_zrl INTEGER DEFAULT 1,
+    is_captain INTEGER DEFAULT 0,
+    email TEXT,
+    password TEXT,
+    active INTEGER DEFAULT 1,
+    profile_url TEXT,
+    created_at TEXT,
+    country TEXT
+);
+
+CREATE TABLE IF NOT EXISTS rider_teams (
+    zwift_power_id TEXT NOT NULL,
+    team_id INTEGER NOT NULL,
+    active INTEGER DEFAULT 1,
+    PRIMARY KEY (zwift_power_id, team_id)
+);
+
+CREATE TABLE IF NOT EXISTS race_lineup (
+    team_id INTEGER,
+    race_date TEXT,
+    zwift_power_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS captains (
+    id SERIAL PRIMARY KEY,
+    zwift_power_id TEXT NOT NULL,
+    name TEXT,
+    team_id INTEGER NOT NULL,
+    assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    active INTEGER DEFAULT 1,
+    UNIQUE (team_id, zwift_power_id)
+);
+
+CREATE TABLE IF NOT EXISTS availability (
+    id SERIAL PRIMARY KEY,
+    rider_id INTEGER NOT NULL,
+    race_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (rider_id, race_id)
+);
+
+CREATE TABLE IF NOT EXISTS race_results (
+    race_date TEXT NOT NULL,
+    zwift_power_id TEXT NOT NULL,
+    team_id INTEGER REFERENCES teams(id),
+    position INTEGER,
+    time TEXT,
+    points INTEGER,
+    PRIMARY KEY (race_date, zwift_power_id)
+);
+
+-- Tabella legacy creata dagli script di init dei blueprint
+-- (la FK verso riders(id) non esiste: riders ha come chiave zwift_power_id)
+CREATE TABLE IF NOT EXISTS rider_team (
+    rider_id INTEGER,
+    team_id INTEGER,
+    PRIMARY KEY (rider_id, team_id)
+);
+
+-- Compatibilità con le query che interrogano il catalogo SQLite
+CREATE OR REPLACE VIEW sqlite_master AS
+    SELECT 'table'::text AS type, table_name::text AS name, table_name::text AS tbl_name
+    FROM information_schema.tables
+    WHERE table_schema = current_schema();
+"""
+
+# Ordine di copia rispettando le foreign key
+COPY_ORDER = [
+    "admins", "users", "password_reset_tokens", "leagues", "seasons", "rounds",
+    "races", "teams", "riders", "rider_teams", "race_lineup", "captains",
+    "availability", "race_results",
+]
+
+# ===============================================================
+# 🔤 TRADUZIONE DIALETTO SQLITE → POSTGRESQL
+# ===============================================================
+
+_RE_BEGIN = re.compile(r"^\s*BEGIN(\s+(IMMEDIATE|EXCLUSIVE|DEFERRED))?(\s+TRANSACTION)?\s*;?\s*$", re.I)
+_RE_PRAGMA_TABLE_INFO = re.compile(r"^\s*PRAGMA\s+table_info\s*\(\s*['\"]?(\w+)['\"]?\s*\)\s*;?\s*$", re.I)
+_RE_PRAGMA = re.compile(r"^\s*PRAGMA\b", re.I)
+_RE_INSERT_OR = re.compile(r"\bINSERT\s+OR\s+(REPLACE|IGNORE)\s+INTO\s+(\w+)\s*\(([^)]*)\)", re.I)
+_RE_INSERT_INTO = re.compile(r"^\s*INSERT\s+INTO\s+(\w+)", re.I)
+_RE_FUNC = re.compile(r"\b(GROUP_CONCAT|DATE|SUBSTR)\s*\(", re.I)
+_RE_AUTOINCREMENT = re.compile(r"\bINTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT\b", re.I)
+_RE_NAMED = re.compile(r":(\w+)")
+_RE_READ = re.compile(r"^\s*(SELECT|WITH|SHOW|EXPLAIN)\b", re.I)
+
+
+def _split_literals(sql):
+    """Divide la query in segmenti (testo, is_literal) per non toccare le stringe tra apici."""
+    parts, buf, i, quote = [], [], 0, None
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                if i + 1 < len(sql) and sql[i + 1] == quote:
+                    buf.append(sql[i + 1])
+                    i += 1
+                else:
+                    parts.append(("".join(buf), True))
+                    buf, quote = [], None
+        elif ch in ("'", '"'):
+            if buf:
+                parts.append(("".join(buf), False))
+            buf, quote = [ch], ch
+        else:
+            buf.append(ch)
+        i += 1
+    if buf:
+        parts.append(("".join(buf), bool(quote)))
+    return parts
+
+
+def _split_args(body):
+    """Divide gli argomenti di una funzione SQL rispettando le parentesi."""
+    args, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(body):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(body[start:i].strip())
+            start = i + 1
+    args.append(body[start:].strip())
+    return args
+
+
+def _rewrite_functions(sql):
+    """Riscrive GROUP_CONCAT, DATE e SUBSTR negativo (anche annidati)."""
+    out, pos = [], 0
+    while True:
+        m = _RE_FUNC.search(sql, pos)
+        if not m:
+            out.append(sql[pos:])
+            return "".join(out)
+
+        # Trova la parentesi di chiusura corrispondente
+        depth, quote, end = 1, None, None
+        for j in range(m.end(), len(sql)):
+            ch = sql[j]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in ("'", '"'):
+                quote = ch
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    end = j
+                    break
+        if end is None:
+            out.append(sql[pos:])
+            return "".join(out)
+
+        func = m.group(1).upper()
+        body = _rewrite_functions(sql[m.end():end])
+        args = _split_args(body)
+        out.append(sql[pos:m.start()])
+
+        if func == "GROUP_CONCAT":
+            expr = args[0]
+            distinct = ""
+            if re.match(r"DISTINCT\s", expr, re.I):
+                distinct, expr = "DISTINCT ", expr[9:].strip()
+            sep = args[1] if len(args) > 1 else "','"
+            out.append(f"STRING_AGG({distinct}CAST({expr} AS TEXT), {sep})")
+        elif func == "DATE":
+            if len(args) == 1 and args[0].strip().lower() == "'now'":
+                out.append("TO_CHAR(CURRENT_DATE, 'YYYY-MM-DD')")
+            else:
+                out.append(f"SUBSTR(CAST({args[0]} AS TEXT), 1, 10)")
+        else:  # SUBSTR
+            neg = re.fullmatch(r"-\s*(\d+)", args[1]) if len(args) == 2 else None
+            if neg:
+                out.append(f"RIGHT(CAST({args[0]} AS TEXT), {neg.group(1)})")
+            else:
+                out.append(f"SUBSTR({', '.join(args)})")
+        pos = end + 1
+
+
+def _rewrite_insert_or(sql):
+    m = _RE_INSERT_OR.search(sql)
+    if not m:
+        return sql
+    mode, table, cols = m.group(1).upper(), m.group(2), m.group(3)
+    sql = sql[:m.start()] + f"INSERT INTO {table} ({cols})" + sql[m.end():]
+    sql = sql.rstrip().rstrip(";")
+    if mode == "IGNORE":
+        return sql + " ON CONFLICT DO NOTHING"
+
+    keys = CONFLICT_KEYS.get(table.lower())
+    if not keys:
+        raise ValueError(f"INSERT OR REPLACE su '{table}': chiave di conflitto sconosciuta")
+    columns = [c.strip() for c in cols.split(",")]
+    updates = [f"{c} = EXCLUDED.{c}" for c in columns if c not in keys]
+    if not updates:
+        return sql + f" ON CONFLICT ({', '.join(keys)}) DO NOTHING"
+    return sql + f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}"
+
+
+def translate_sql(sql, named=False):
+    """Traduce una query SQLite nel dialetto PostgreSQL (named: parametri :nome)."""
+    parts = []
+    for text, is_literal in _split_literals(sql):
+        if is_literal:
+            parts.append(text.replace("%", "%%"))
+            continue
+        text = text.replace("%", "%%")
+        text = text.replace("?", "%s")
+        if named:
+            text = _RE_NAMED.sub(r"%(\1)s", text)
+        text = _RE_AUTOINCREMENT.sub("SERIAL PRIMARY KEY", text)
+        parts.append(text)
+    sql = "".join(parts)
+    sql = _rewrite_functions(sql)
+    return _rewrite_insert_or(sql)
+
+
+# ===============================================================
+# 🔌 CONNESSIONE COMPATIBILE SQLITE3
+# ===============================================================
+
+class PgCursor:
+    """Cursore con l'interfaccia di sqlite3.Cursor sopra psycopg2."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cur = connection.raw.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        self.lastrowid = None
+        self._empty = False
+
+    @property
+    def description(self):
+        return None if self._empty else self._cur.description
+
+    @property
+    def rowcount(self):
+        return -1 if self._empty else self._cur.rowcount
+
+    def execute(self, sql, params=()):
+        # psycopg2 scarica tutte le righe in execute: tempo e righe si misurano qui
+        record = start_query(sql, params)
+        t0 = time.perf_counter()
+        try:
+            return self._execute(sql, params)
+        finally:
+            record.add(time.perf_counter() - t0, max(self.rowcount, 0))
+
+    def _execute(self, sql, params):
+        self._empty = False
+        self.lastrowid = None
+
+        if _RE_BEGIN.match(sql):
+            # psycopg2 apre la transazione da solo al primo statement
+            self.connection.pending_writes = True
+            self._empty = True
+            return self
+
+        table_info = _RE_PRAGMA_TABLE_INFO.match(sql)
+        if table_info:
+            self._cur.execute("""
+                SELECT ordinal_position - 1 AS cid, column_name AS name, data_type AS type,
+                       CASE WHEN is_nullable = 'NO' THEN 1 ELSE 0 END AS notnull,
+                       column_default AS dflt_value, 0 AS pk
+                FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s
+                ORDER BY ordinal_position
+            """, (table_info.group(1).lower(),))
+            return self
+
+        if _RE_PRAGMA.match(sql):
+            self._empty = True
+            return self
+
+        query = translate_sql(sql, named=isinstance(params, dict))
+        if not _RE_READ.match(query):
+            self.connection.pending_writes = True
+        insert = _RE_INSERT_INTO.match(query)
+        wants_id = (
+            insert is not None
+            and insert.group(1).lower() in SERIAL_TABLES
+            and " RETURNING " not in query.upper()
+        )
+        if wants_id:
+            query = query.rstrip().rstrip(";") + " RETURNING id"
+
+        self._cur.execute(query, _adapt_params(params))
+        if wants_id:
+            row = self._cur.fetchone()
+            self.lastrowid = row[0] if row else None
+            self._empty = True
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._empty = False
+        self.connection.pending_writes = True
+        seq_of_params = [_adapt_params(p) for p in seq_of_params]
+        named = bool(seq_of_params) and isinstance(seq_of_params[0], dict)
+        record = start_query(sql, seq_of_params[0] if seq_of_params else ())
+        t0 = time.perf_counter()
+        try:
+            psycopg2.extras.execute_batch(self._cur, translate_sql(sql, named=named), seq_of_params)
+        finally:
+            record.add(time.perf_counter() - t0, len(seq_of_params))
+        return self
+
+    def executescript(self, script):
+        for statement in _split_statements(script):
+            self.execute(statement)
+        return self
+
+    def fetchone(self):
+        return None if self._empty else self._cur.fetchone()
+
+    def fetchmany(self, size=None):
+        if self._empty:
+            return []
+        return self._cur.fetchmany(size or self._cur.arraysize)
+
+    def fetchall(self):
+        return [] if self._empty else self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+
+class PgConnection:
+    """Connessione PostgreSQL presa dal pool, con l'interfaccia usata dai blueprint."""
+
+    def __init__(self, raw, pool):
+        self.raw = raw
+        self._pool = pool
+        self.row_factory = None  # ignorato: le righe sono sempre accessibili per nome
+        # Scritture (o BEGIN) dall'ultimo commit: in_transaction è vero anche dopo una SELECT
+        self.pending_writes = False
+
+    @property
+    def in_transaction(self):
+        return self.raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, factory=None):
+        return PgCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        cur = self.cursor().executescript(script)
+        self.commit()
+        return cur
+
+    def commit(self):
+        self.raw.commit()
+        self.pending_writes = False
+
+    def rollback(self):
+        self.raw.rollback()
+        self.pending_writes = False
+
+    def close(self):
+        """Come per SQLite: annulla la transazione pendente, la connessione resta in uso."""
+        if self.in_transaction:
+            self.rollback()
+
+    def release(self):
+        """Restituisce la connessione al pool."""
+        if self.raw is None:
+            return
+        if not self.raw.closed and self.in_transaction:
+            self.rollback()
+        self._pool.putconn(self.raw)
+        self.raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def _adapt_value(value):
+    # Come gli adapter di sqlite3: date e datetime diventano stringhe ISO
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _adapt_params(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {k: _adapt_value(v) for k, v in params.items()}
+    return tuple(_adapt_value(v) for v in params)
+
+
+def _split_statements(script):
+    statements, buf = [], []
+    for text, is_literal in _split_literals(script):
+        if is_literal:
+            buf.append(text)
+            continue
+        chunks = text.split(";")
+        for chunk in chunks[:-1]:
+            buf.append(chunk)
+            statements.append("".join(buf))
+            buf = []
+        buf.append(chunks[-1])
+    statements.append("".join(buf))
+    return [s for s in statements if s.strip()]
+
+
+# ===============================================================
+# 🏊 POOL DI CONNESSIONI
+# ===============================================================
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def get_pool():
+    """Pool psycopg2 del processo corrente (ricreato dopo un fork)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if not DATABASE_URL:
+                raise RuntimeError("DATABASE_URL non impostato per il backend PostgreSQL")
+            _pool = psycopg2.pool.ThreadedConnectionPool(
+                POOL_MIN, POOL_MAX, dsn=DATABASE_URL, client_encoding="UTF8"
+            )
+            _pool_pid = os.getpid()
+            logging.info(f"🐘 Pool PostgreSQL creato ({POOL_MIN}-{POOL_MAX} connessioni)")
+        return _pool
+
+
+def connect():
+    """Prende una connessione dal pool, attendendo se è esaurito."""
+    pool = get_pool()
+    deadline = time.monotonic() + POOL_WAIT_S
+    while True:
+        try:
+            return PgConnection(pool.getconn(), pool)
+        except psycopg2.pool.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+# ===============================================================
+# 🛠️ CLI: schema e copia dati da SQLite
+# ===============================================================
+
+def init_schema(conn):
+    """Crea lo schema ZRL su PostgreSQL (idempotente)."""
+    with conn.raw.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+    conn.commit()
+
+
+def _coerce_sqlite_value(value):
+    """Gli int64 numpy salvati da pandas finiscono in SQLite come BLOB di 8 byte."""
+    if isinstance(value, bytes):
+        if len(value) == 8:
+            return int.from_bytes(value, "little", signed=True)
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+def copy_from_sqlite(conn, sqlite_path):
+    """Copia tutte le tabelle dello schema dal file SQLite indicato."""
+    import sqlite3
+
+    src = sqlite3.connect(sqlite_path)
+    src.row_factory = sqlite3.Row
+    existing = {r[0] for r in src.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    with conn.raw.cursor() as cur:
+        for table in COPY_ORDER:
+            if table not in existing:
+                continue
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s", (table,)
+            )
+            pg_columns = {r[0] for r in cur.fetchall()}
+            src_columns = [r[1] for r in src.execute(f'PRAGMA table_info("{table}")')]
+            columns = [c for c in src_columns if c in pg_columns]
+            rows = src.execute(f'SELECT {", ".join(columns)} FROM "{table}"').fetchall()
+
+            cur.execute(f"TRUNCATE {table} CASCADE")
+            psycopg2.extras.execute_values(
+                cur,
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT DO NOTHING",
+                [tuple(_coerce_sqlite_value(v) for v in row) for row in rows],
+            )
+            if "id" in columns:
+                cur.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+                )
+            print(f"📦 {table}: {len(rows)} righe copiate")
+    conn.commit()
+    src.close()
+
+
+if __name__ == "__main__":
+    from db import ZRL_DB_PATH
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "init"
+    conn = connect()
+    if command == "init":
+        init_schema(conn)
+        print("✅ Schema PostgreSQL inizializzato")
+    elif command == "copy-from-sqlite":
+        init_schema(conn)
+        copy_from_sqlite(conn, sys.argv[2] if len(sys.argv) > 2 else ZRL_DB_PATH)
+        print("✅ Copia completata")
+    else:
+        print("Uso: python -m utils.db_postgres [init | copy-from-sqlite [percorso.db]]")
+    conn.release()
@@ -0,0 +1,225 @@
+"""
+Coda di rendering dei PDF dei report.
+
+La richiesta HTTP prepara i dati e accoda il rendering: un pool locale di
+processi genera il PDF con reportlab e lo salva in exports/ con nome pari
+all'hash del contenuto. Richieste identiche condividono lo stesso job:
+nello stesso processo tramite il Future in corso, tra worker gunicorn
+diversi tramite il file .lock creato in modo esclusivo.
+
+File di un job (job_id = prefisso esadecimale dell'hash):
+    <job_id>.pdf    risultato pronto
+    <job_id>.lock   rendering in corso
+    <job_id>.err    rendering fallito (contiene l'errore)
+    <job_id>.json   metadati (tipo di report, per il nome del download)
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from db import BASE_DIR
+from utils.report_pdf import render_report_pdf
+
+
+# ===============================================================
+# ⚙️ CONFIGURAZIONE
+# ===============================================================
+EXPORT_DIR = os.environ.get("ZRL_EXPORT_DIR", os.path.join(BASE_DIR, "exports"))
+EXPORT_WORKERS = int(os.environ.get("ZRL_EXPORT_WORKERS", "2"))
+# "process" (default) oppure "thread" dove i processi figli non sono disponibili
+EXPORT_POOL = os.environ.get("ZRL_EXPORT_POOL", "process")
+# Ore dopo cui i PDF generati vengono eliminati
+EXPORT_TTL_H = float(os.environ.get("ZRL_EXPORT_TTL_H", "24"))
+# Un .lock più vecchio di così appartiene a un worker morto
+LOCK_TIMEOUT_S = 300
+
+# Da incrementare quando cambia il layout dei PDF: invalida i file già generati
+RENDER_VERSION = "1"
+JOB_ID_LENGTH = 32
+
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def _path(job_id, ext):
+    return os.path.join(EXPORT_DIR, f"{job_id}.{ext}")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if EXPORT_POOL == "thread":
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="pdf-export")
+        else:
+            # spawn: il processo figlio non eredita connessioni DB e thread di Flask
+            _executor = ProcessPoolExecutor(
+                max_workers=EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+def is_valid_job_id(job_id):
+    return (
+        isinstance(job_id, str)
+        and len(job_id) == JOB_ID_LENGTH
+        and all(c in "0123456789abcdef" for c in job_id)
+    )
+
+
+def job_key(report_type, df):
+    """Hash del contenuto: stesso report con gli stessi dati = stesso job."""
+    digest = hashlib.sha256()
+    digest.update(f"{report_type}|{RENDER_VERSION}|".encode())
+    digest.update(df.to_json(orient="split", date_format="iso").encode())
+    return digest.hexdigest()[:JOB_ID_LENGTH]
+
+
+# ===============================================================
+# 🖨️ RENDERING (eseguito nel pool)
+# ===============================================================
+
+def _render_job(job_id, report_type, df, export_dir):
+    """Genera il PDF su file temporaneo e lo rende visibile solo a fine scrittura."""
+    pdf_path = os.path.join(export_dir, f"{job_id}.pdf")
+    tmp_path = os.path.join(export_dir, f"{job_id}.{os.getpid()}.tmp")
+    try:
+        payload = render_report_pdf(df, report_type)
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, pdf_path)
+        return len(payload)
+    except Exception as e:
+        with open(os.path.join(export_dir, f"{job_id}.err"), "w", encoding="utf-8") as f:
+            f.write(f"{type(e).__name__}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        try:
+            os.remove(os.path.join(export_dir, f"{job_id}.lock"))
+        except FileNotFoundError:
+            pass
+
+
+def _job_done(job_id, future):
+    with _lock:
+        _futures.pop(job_id, None)
+    error = future.exception()
+    if error:
+        logging.error(f"❌ Export PDF {job_id} fallito: {error}")
+    else:
+        logging.info(f"📄 Export PDF {job_id} pronto ({future.result()} byte)")
+
+
+# ===============================================================
+# 📬 API DEI JOB
+# ===============================================================
+
+def _acquire_lock(job_id):
+    """True se questo processo deve eseguire il rendering, False se lo sta già facendo un altro."""
+    lock_path = _path(job_id, "lock")
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            stale = time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT_S
+        except FileNotFoundError:
+            stale = True  # appena terminato: riprova
+        if not stale:
+            return False
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        return _acquire_lock(job_id)
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+def submit_pdf(report_type, df):
+    """Accoda il rendering del PDF (se serve) e restituisce il job_id."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cleanup_expired()
+
+    job_id = job_key(report_type, df)
+    with open(_path(job_id, "json"), "w", encoding="utf-8") as f:
+        json.dump({"report_type": report_type, "created": time.time()}, f)
+
+    if os.path.exists(_path(job_id, "pdf")):
+        # Già pronto: rinnova la scadenza
+        os.utime(_path(job_id, "pdf"))
+        return job_id
+
+    with _lock:
+        if job_id in _futures:
+            return job_id
+        if not _acquire_lock(job_id):
+            return job_id
+        if os.path.exists(_path(job_id, "err")):
+            os.remove(_path(job_id, "err"))
+        future = _get_executor().submit(_render_job, job_id, report_type, df, EXPORT_DIR)
+        _futures[job_id] = future
+    future.add_done_callback(lambda fut: _job_done(job_id, fut))
+    return job_id
+
+
+def job_status(job_id):
+    """Stato del job: done, running, error oppure unknown."""
+    if not is_valid_job_id(job_id):
+        return {"job_id": job_id, "status": "unknown"}
+
+    meta = {}
+    if os.path.exists(_path(job_id, "json")):
+        with open(_path(job_id, "json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    status = {"job_id": job_id, "report_type": meta.get("report_type")}
+
+    if os.path.exists(_path(job_id, "pdf")):
+        status.update(status="done", size=os.path.getsize(_path(job_id, "pdf")))
+    elif job_id in _futures or os.path.exists(_path(job_id, "lock")):
+        status["status"] = "running"
+    elif os.path.exists(_path(job_id, "err")):
+        with open(_path(job_id, "err"), encoding="utf-8") as f:
+            status.update(status="error", error=f.read())
+    else:
+        status["status"] = "unknown"
+    return status
+
+
+def job_file(job_id):
+    """Percorso del PDF pronto, None se il job non è (ancora) completato."""
+    if not is_valid_job_id(job_id):
+        return None
+    path = _path(job_id, "pdf")
+    return path if os.path.exists(path) else None
+
+
+def cleanup_expired(force=False):
+    """Elimina i file dei job scaduti (al massimo una scansione ogni 10 minuti)."""
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < 600:
+        return 0
+    _last_cleanup = now
+
+    removed = 0
+    for name in os.listdir(EXPORT_DIR) if os.path.isdir(EXPORT_DIR) else []:
+        path = os.path.join(EXPORT_DIR, name)
+        if name.endswith(".lock"):
+            continue
+        try:
+            if now - os.path.getmtime(path) > EXPORT_TTL_H * 3600:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,180 @@
+"""
+Archivio delle pagine HTML scaricate dagli scraper (WTRL, ZwiftPower).
+
+Ogni pagina viene salvata compressa con lz4, con chiave URL (+ variante,
+es. categoria o numero di pagina) e hash del contenuto:
+
+    snapshots/<chiave URL>/<sha256>.html.lz4
+    snapshots/<chiave URL>/meta.json     url, variante, ultimo hash, storico
+
+Una pagina identica a una già salvata non viene riscritta.
+
+Modalità (ZRL_SCRAPE_MODE):
+    live     scarica dal sito e salva lo snapshot (default)
+    replay   nessun browser: gli import leggono l'ultimo snapshot salvato
+    off      scarica senza salvare
+
+Da riga di comando, per ripetere il parsing dopo una correzione del
+parser o per misurarlo senza rete:
+
+    python -m utils.html_snapshots list
+    python -m utils.html_snapshots replay [wtrl|zwiftpower]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+
+import lz4.frame
+
+from db import BASE_DIR
+
+SNAPSHOT_DIR = os.environ.get("ZRL_SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots"))
+SCRAPE_MODE = os.environ.get("ZRL_SCRAPE_MODE", "live")
+# Voci dello storico tenute in meta.json per ogni URL
+HISTORY_LIMIT = 50
+
+
+def replay_mode():
+    return SCRAPE_MODE == "replay"
+
+
+def _url_dir(url, variant=None):
+    key = hashlib.sha1(f"{url}|{variant or ''}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(SNAPSHOT_DIR, key)
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save_snapshot(url, html, kind, variant=None):
+    """
+    Salva la pagina (se non già presente) e aggiorna meta.json.
+    kind: "wtrl" o "zwiftpower", per il replay. Restituisce l'hash del contenuto.
+    Con ZRL_SCRAPE_MODE=off non salva nulla.
+    """
+    data = html.encode("utf-8")
+    content_hash = hashlib.sha256(data).hexdigest()
+    if SCRAPE_MODE == "off":
+        return content_hash
+
+    try:
+        directory = _url_dir(url, variant)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{content_hash}.html.lz4")
+        if not os.path.exists(path):
+            _write_atomic(path, lz4.frame.compress(data))
+
+        meta = _read_meta(directory) or {"url": url, "variant": variant, "kind": kind, "history": []}
+        if meta.get("latest") != content_hash:
+            meta["latest"] = content_hash
+            meta["history"] = (meta["history"] + [{"hash": content_hash, "saved_at": time.time()}])[-HISTORY_LIMIT:]
+        meta["fetched_at"] = time.time()
+        _write_atomic(os.path.join(directory, "meta.json"), json.dumps(meta, indent=1).encode("utf-8"))
+    except OSError as e:
+        # Lo snapshot è un di più: l'import prosegue comunque
+        logging.warning(f"⚠️ Snapshot non salvato per {url}: {e}")
+    return content_hash
+
+
+def load_snapshot(url, variant=None, content_hash=None):
+    """HTML dell'ultimo snapshot (o di quello con content_hash); None se non c'è."""
+    directory = _url_dir(url, variant)
+    if content_hash is None:
+        meta = _read_meta(directory)
+        if not meta:
+            return None
+        content_hash = meta["latest"]
+    try:
+        with open(os.path.join(directory, f"{content_hash}.html.lz4"), "rb") as f:
+            return lz4.frame.decompress(f.read()).decode("utf-8")
+    except OSError:
+        return None
+
+
+def require_snapshot(url, variant=None):
+    """Come load_snapshot, ma in replay una pagina mancante è un errore esplicito."""
+    html = load_snapshot(url, variant)
+    if html is None:
+        raise LookupError(f"Nessuno snapshot per {url} {variant or ''}".strip())
+    return html
+
+
+def list_snapshots(kind=None):
+    """Metadati degli URL salvati (url, variant, kind, latest, history)."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    entries = []
+    for name in sorted(os.listdir(SNAPSHOT_DIR)):
+        meta = _read_meta(os.path.join(SNAPSHOT_DIR, name))
+        if meta and (kind is None or meta.get("kind") == kind):
+            entries.append(meta)
+    return entries
+
+
+# ===============================================================
+# 🔁 REPLAY DA RIGA DI COMANDO
+# ===============================================================
+
+def _parsers():
+    # Import locali: i parser vivono negli scraper (Flask, Playwright...)
+    from utils.wtrl.schedule_parser import parse_schedule
+    from utils.zwift.zwiftpower import parse_team_riders
+    return {
+        "wtrl": lambda html, meta: parse_schedule(html),
+        "zwiftpower": lambda html, meta: parse_team_riders(html),
+    }
+
+
+def replay(kind=None, out=sys.stdout):
+    """Riesegue i parser su tutti gli snapshot: righe estratte e tempi, senza rete."""
+    parsers = _parsers()
+    totals = {"pages": 0, "rows": 0, "read_s": 0.0, "parse_s": 0.0}
+    for meta in list_snapshots(kind):
+        parse = parsers.get(meta.get("kind"))
+        if parse is None:
+            continue
+        t0 = time.perf_counter()
+        html = load_snapshot(meta["url"], meta.get("variant"))
+        t1 = time.perf_counter()
+        rows = parse(html, meta) if html is not None else []
+        t2 = time.perf_counter()
+        totals["pages"] += 1
+        totals["rows"] += len(rows)
+        totals["read_s"] += t1 - t0
+        totals["parse_s"] += t2 - t1
+        variant = f" [{meta['variant']}]" if meta.get("variant") else ""
+        print(f"{meta['kind']:<10} {len(rows):>4} righe  {(t2 - t1) * 1000:7.1f} ms  {meta['url']}{variant}", file=out)
+    print(
+        f"📦 {totals['pages']} pagine, {totals['rows']} righe · lettura {totals['read_s'] * 1000:.1f} ms"
+        f" · parsing {totals['parse_s'] * 1000:.1f} ms",
+        file=out,
+    )
+    return totals
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        for meta in list_snapshots():
+            variant = f" [{meta['variant']}]" if meta.get("variant") else ""
+            print(f"{meta.get('kind', '?'):<10} {len(meta['history']):>3} versioni  {meta['url']}{variant}")
+    elif command == "replay":
+        replay(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        print(__doc__)
+        sys.exit(1)
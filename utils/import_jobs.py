@@ -0,0 +1,504 @@
+"""
+Job di import (WTRL, ZwiftPower) eseguiti da un processo worker.
+
+Le richieste HTTP non aprono più browser: accodano un job nella tabella
+import_jobs e rimandano alla pagina di stato. Il worker
+
+    python -m utils.import_jobs worker        (Procfile: worker)
+
+prende i job in ordine di arrivo, uno alla volta, e registra per ogni
+fase (stage) stato e durata. Accoda anche i job pianificati in SCHEDULES
+(sintassi cron: minuto ora giorno mese giorno-settimana, 0 = domenica).
+
+Tabelle (migrazione 0010):
+    import_jobs        un job: tipo, parametri, stato, fasi, risultato
+    import_schedules   ultima esecuzione di ogni pianificazione
+    import_workers     heartbeat dei worker attivi
+
+Con `python run.py` in sviluppo il worker gira in un thread dell'app.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db import get_zrl_db, transaction
+
+# ===============================================================
+# ⚙️ CONFIGURAZIONE
+# ===============================================================
+POLL_S = float(os.environ.get("ZRL_JOBS_POLL_S", "5"))
+HEARTBEAT_S = 30
+# Un worker senza heartbeat da così tanto è considerato morto
+STALE_S = 180
+# Job mostrati nella pagina di stato
+RECENT_JOBS = 50
+
+SCHEDULES = {
+    "wtrl-notturno": {
+        "label": "Calendario WTRL",
+        "cron": os.environ.get("ZRL_CRON_WTRL", "30 3 * * *"),
+        "kind": "wtrl_season",
+    },
+    "zwiftpower-settimanale": {
+        "label": "Rider ZwiftPower",
+        "cron": os.environ.get("ZRL_CRON_ZWIFTPOWER", "0 4 * * 1"),
+        "kind": "zwiftpower_riders",
+    },
+    "backup-orario": {
+        "label": "Backup del database",
+        "cron": os.environ.get("ZRL_CRON_BACKUP", "15 * * * *"),
+        "kind": "backup",
+    },
+}
+
+JOB_LABELS = {
+    "wtrl_season": "Calendario WTRL (stagione)",
+    "wtrl_round": "Gare WTRL di un round",
+    "zwiftpower_riders": "Rider ZwiftPower",
+    "backup": "Backup del database",
+}
+
+JOBS_SQL = """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'queued',
+        source TEXT,
+        stages TEXT NOT NULL DEFAULT '[]',
+        result TEXT,
+        error TEXT,
+        worker TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        elapsed_s REAL
+    )
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def create_import_jobs(conn):
+    """Step di migrazione: job, pianificazioni e heartbeat dei worker."""
+    conn.execute(JOBS_SQL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_status ON import_jobs(status, id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_schedules (
+            name TEXT PRIMARY KEY,
+            last_run_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_workers (
+            worker TEXT PRIMARY KEY,
+            started_at TEXT,
+            seen_at TEXT
+        )
+    """)
+
+
+# ===============================================================
+# ⏰ PIANIFICAZIONI (cron)
+# ===============================================================
+
+def _cron_field(spec, low, high):
+    values = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-"))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Campo cron fuori intervallo: {spec!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """
+    Insiemi di minuti, ore, giorni, mesi e giorni della settimana
+    (0 o 7 = domenica), più day_or: True se giorno del mese e giorno della
+    settimana sono entrambi limitati (non "*"), e allora basta che ne
+    corrisponda uno, come in cron.
+    """
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"Espressione cron non valida: {expr!r}")
+    limits = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+    minutes, hours, days, months, weekdays = (
+        _cron_field(spec, low, high) for spec, (low, high) in zip(fields, limits)
+    )
+    weekdays = {day % 7 for day in weekdays}
+    day_or = not fields[2].startswith("*") and not fields[4].startswith("*")
+    return minutes, hours, days, months, weekdays, day_or
+
+
+def _cron_day(cron, moment):
+    days, weekdays, day_or = cron[2], cron[4], cron[5]
+    day_ok = moment.day in days
+    weekday_ok = (moment.weekday() + 1) % 7 in weekdays
+    return day_ok or weekday_ok if day_or else day_ok and weekday_ok
+
+
+def _cron_match(cron, moment):
+    return (
+        moment.minute in cron[0] and moment.hour in cron[1]
+        and moment.month in cron[3] and _cron_day(cron, moment)
+    )
+
+
+def prossima_esecuzione(expr, after):
+    """
+    Primo minuto dopo `after` in cui scatta la pianificazione (entro un anno).
+    Mesi e giorni che non corrispondono si saltano interi, ore e minuti si
+    cercano fra i valori ammessi: poche iterazioni anche per i cron settimanali.
+    """
+    cron = parse_cron(expr)
+    hours, minutes = sorted(cron[1]), sorted(cron[0])
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment + timedelta(days=366)
+    while moment < limit:
+        if moment.month not in cron[3]:
+            moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        if not _cron_day(cron, moment):
+            moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        hour = next((h for h in hours if h >= moment.hour), None)
+        if hour is None:
+            moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if hour != moment.hour:
+            moment = moment.replace(hour=hour, minute=0)
+        minute = next((m for m in minutes if m >= moment.minute), None)
+        if minute is None:
+            moment = moment.replace(minute=0) + timedelta(hours=1)
+            continue
+        return moment.replace(minute=minute)
+    return None
+
+
+def accoda_pianificati(conn, now=None):
+    """Accoda i job pianificati scattati dall'ultimo controllo. Restituisce gli id accodati."""
+    now = now or datetime.now()
+    last_runs = {
+        row["name"]: row["last_run_at"]
+        for row in conn.execute("SELECT name, last_run_at FROM import_schedules").fetchall()
+    }
+    queued = []
+    for name, schedule in SCHEDULES.items():
+        last_run = last_runs.get(name)
+        if last_run is None:
+            # Prima volta: si parte da adesso, senza recuperare esecuzioni passate
+            conn.execute("INSERT INTO import_schedules (name, last_run_at) VALUES (?, ?)", (name, _now()))
+            conn.commit()
+            continue
+        due = prossima_esecuzione(schedule["cron"], datetime.fromisoformat(last_run))
+        if due is None or due > now:
+            continue
+        queued.append(enqueue(conn, schedule["kind"], source=f"cron:{name}"))
+        conn.execute("UPDATE import_schedules SET last_run_at = ? WHERE name = ?", (_now(), name))
+        conn.commit()
+    return queued
+
+
+# ===============================================================
+# 📬 CODA
+# ===============================================================
+
+def enqueue(conn, kind, params=None, source="web"):
+    """
+    Accoda un job e ne restituisce l'id. Se lo stesso job (tipo e parametri)
+    è già in coda o in esecuzione restituisce quello.
+    """
+    if kind not in JOB_LABELS:
+        raise ValueError(f"Tipo di job sconosciuto: {kind}")
+    params_json = json.dumps(params or {}, sort_keys=True)
+    with transaction(conn):
+        row = conn.execute(
+            "SELECT id FROM import_jobs WHERE kind = ? AND params = ? AND status IN ('queued', 'running')",
+            (kind, params_json),
+        ).fetchone()
+        if row:
+            return row["id"]
+        cur = conn.execute(
+            "INSERT INTO import_jobs (kind, params, status, source, created_at) VALUES (?, ?, 'queued', ?, ?)",
+            (kind, params_json, source, _now()),
+        )
+        return cur.lastrowid
+
+
+def _claim_next(conn, worker):
+    """Prende il job in coda più vecchio; None se la coda è vuota."""
+    with transaction(conn):
+        row = conn.execute(
+            "SELECT id FROM import_jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        cur = conn.execute(
+            "UPDATE import_jobs SET status = 'running', worker = ?, started_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (worker, _now(), row["id"]),
+        )
+        if cur.rowcount != 1:
+            return None
+    return get_job(conn, row["id"])
+
+
+def _decode(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["stages"] = json.loads(job["stages"] or "[]")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["label"] = JOB_LABELS.get(job["kind"], job["kind"])
+    return job
+
+
+def get_job(conn, job_id):
+    row = conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _decode(row) if row else None
+
+
+def recent_jobs(conn, limit=RECENT_JOBS):
+    rows = conn.execute("SELECT * FROM import_jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_decode(row) for row in rows]
+
+
+def stato_worker(conn):
+    """Worker con heartbeat recente (id, started_at, seen_at)."""
+    limit = (datetime.now() - timedelta(seconds=STALE_S)).isoformat(timespec="seconds")
+    rows = conn.execute(
+        "SELECT worker, started_at, seen_at FROM import_workers WHERE seen_at >= ? ORDER BY worker",
+        (limit,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def stato_pianificazioni(conn, now=None):
+    now = now or datetime.now()
+    last_runs = {
+        row["name"]: row["last_run_at"]
+        for row in conn.execute("SELECT name, last_run_at FROM import_schedules").fetchall()
+    }
+    return [
+        dict(
+            schedule, name=name, last_run_at=last_runs.get(name),
+            next_run_at=(prossima_esecuzione(schedule["cron"], now) or now).isoformat(timespec="minutes"),
+        )
+        for name, schedule in SCHEDULES.items()
+    ]
+
+
+# ===============================================================
+# 📈 AVANZAMENTO
+# ===============================================================
+
+class JobProgress:
+    """
+    Fasi e avanzamento di un job in esecuzione, salvati su import_jobs.
+    Le scritture fanno commit: vanno chiamate fuori dalle transazioni dell'import.
+    """
+
+    def __init__(self, conn, job_id):
+        self.conn = conn
+        self.job_id = job_id
+        self.stages = []
+
+    def _save(self):
+        try:
+            self.conn.execute(
+                "UPDATE import_jobs SET stages = ? WHERE id = ?",
+                (json.dumps(self.stages), self.job_id),
+            )
+            self.conn.commit()
+        except Exception as e:
+            # L'avanzamento è informativo: non deve far fallire l'import
+            logging.warning(f"⚠️ Avanzamento del job {self.job_id} non salvato: {e}")
+
+    @contextmanager
+    def stage(self, name):
+        entry = {"name": name, "status": "running", "detail": None, "elapsed_s": None}
+        self.stages.append(entry)
+        self._save()
+        t0 = time.perf_counter()
+        try:
+            yield entry
+        except Exception:
+            entry["status"] = "error"
+            raise
+        else:
+            entry["status"] = "done"
+        finally:
+            entry["elapsed_s"] = round(time.perf_counter() - t0, 2)
+            self._save()
+
+    def progress(self, detail):
+        """Dettaglio della fase in corso (es. "round 2/4")."""
+        if self.stages:
+            self.stages[-1]["detail"] = detail
+            self._save()
+
+
+class _NoProgress:
+    """Stessa interfaccia di JobProgress per gli import lanciati fuori dal worker."""
+
+    @contextmanager
+    def stage(self, name):
+        yield {}
+
+    def progress(self, detail):
+        pass
+
+
+NO_PROGRESS = _NoProgress()
+
+
+# ===============================================================
+# 🛠️ ESECUZIONE
+# ===============================================================
+
+def _runners():
+    # Import locali: gli import dipendono da Playwright, Selenium, pandas...
+    from utils.wtrl_import import importa_round, wtrl_import
+    from utils.zwift.zwiftpower import importa_riders
+    from utils.backups import job_backup
+    return {
+        "wtrl_season": wtrl_import,
+        "wtrl_round": importa_round,
+        "zwiftpower_riders": importa_riders,
+        "backup": job_backup,
+    }
+
+
+def run_job(conn, job):
+    """Esegue un job già preso in carico e ne salva esito e durata."""
+    progress = JobProgress(conn, job["id"])
+    t0 = time.perf_counter()
+    result = error = None
+    try:
+        result = _runners()[job["kind"]](progress=progress, **job["params"])
+        status = "done"
+        logging.info(f"✅ Job {job['id']} ({job['kind']}) completato: {result}")
+    except Exception as e:
+        status = "error"
+        error = f"{type(e).__name__}: {e}"
+        logging.exception(f"❌ Job {job['id']} ({job['kind']}) fallito")
+    if conn.in_transaction:
+        conn.rollback()
+    conn.execute(
+        "UPDATE import_jobs SET status = ?, result = ?, error = ?, finished_at = ?, elapsed_s = ? WHERE id = ?",
+        (status, json.dumps(result) if result is not None else None, error, _now(),
+         round(time.perf_counter() - t0, 2), job["id"]),
+    )
+    conn.commit()
+    return status
+
+
+def _heartbeat(conn, worker):
+    conn.execute("DELETE FROM import_workers WHERE worker = ?", (worker,))
+    conn.execute(
+        "INSERT INTO import_workers (worker, started_at, seen_at) VALUES (?, ?, ?)",
+        (worker, _now(), _now()),
+    )
+    conn.commit()
+
+
+def _heartbeat_loop(worker, stop):
+    # Thread separato (e quindi connessione separata): batte anche durante un job lungo
+    conn = get_zrl_db()
+    while not stop.wait(HEARTBEAT_S):
+        try:
+            conn.execute("UPDATE import_workers SET seen_at = ? WHERE worker = ?", (_now(), worker))
+            conn.commit()
+        except Exception as e:
+            logging.warning(f"⚠️ Heartbeat del worker non salvato: {e}")
+    conn.close()
+
+
+def recupera_orfani(conn):
+    """Job rimasti 'running' con un worker morto: segnati come falliti."""
+    alive = [w["worker"] for w in stato_worker(conn)]
+    sql = "UPDATE import_jobs SET status = 'error', error = ?, finished_at = ? WHERE status = 'running'"
+    params = ["Worker interrotto durante l'esecuzione", _now()]
+    if alive:
+        sql += f" AND worker NOT IN ({', '.join('?' for _ in alive)})"
+        params += alive
+    cur = conn.execute(sql, params)
+    conn.commit()
+    return cur.rowcount
+
+
+def worker(once=False, stop=None):
+    """Ciclo del worker: pianificazioni, un job alla volta, pausa di POLL_S se la coda è vuota."""
+    conn = get_zrl_db()
+    name = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident() % 10000}"
+    _heartbeat(conn, name)
+    stop = stop or threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(name, stop), daemon=True)
+    beat.start()
+    logging.info(f"👷 Worker import avviato ({name})")
+
+    try:
+        while not stop.is_set():
+            recupera_orfani(conn)
+            accoda_pianificati(conn)
+            job = _claim_next(conn, name)
+            if job is not None:
+                run_job(conn, job)
+                continue
+            if once:
+                break
+            stop.wait(POLL_S)
+    finally:
+        stop.set()
+        conn.execute("DELETE FROM import_workers WHERE worker = ?", (name,))
+        conn.commit()
+
+
+def avvia_worker_thread():
+    """Worker in un thread dell'app (sviluppo con `python run.py`)."""
+    thread = threading.Thread(target=worker, name="import-worker", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Job di import ZRL")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("worker", help="esegue i job in coda e le pianificazioni")
+    run.add_argument("--once", action="store_true", help="svuota la coda ed esce")
+    add = sub.add_parser("enqueue", help="accoda un job")
+    add.add_argument("kind", choices=sorted(JOB_LABELS))
+    add.add_argument("params", nargs="?", default="{}", help="parametri JSON")
+    sub.add_parser("status", help="ultimi job")
+    args = parser.parse_args()
+
+    conn = get_zrl_db()
+    if args.command == "worker":
+        worker(once=args.once)
+    elif args.command == "enqueue":
+        print(enqueue(conn, args.kind, json.loads(args.params), source="cli"))
+    elif args.command == "status":
+        for job in recent_jobs(conn, 20):
+            print(f"#{job['id']:<5} {job['status']:<8} {job['kind']:<18} {job['created_at']}  {job['error'] or job['result'] or ''}")
+    else:
+        parser.print_help()
+        sys.exit(1)
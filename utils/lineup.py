@@ -1,32 +1,187 @@
 # utils/lineup.py
-from db import get_zrl_db
+"""
+Salvataggio delle formazioni (race_lineup) condiviso da tutte le rotte.
 
-def save_lineup(team_id, race_date, rider_ids):
-    conn = get_zrl_db()
-    cur = conn.cursor()
+Un solo punto che valida i rider, controlla i conflitti con una sola
+query e scrive la formazione con executemany in un'unica transazione,
+aggiornando anche lineup_snapshot.
+"""
+from db import transaction
+from utils.lineup_snapshot import refresh_lineup_snapshot
 
-    cur.execute("DELETE FROM lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
+# Massimo di rider schierabili per team in una gara ZRL
+MAX_LINEUP_RIDERS = 6
 
+
+def normalize_rider_ids(rider_ids):
+    """Id come stringhe (race_lineup.zwift_power_id è TEXT), senza vuoti né duplicati."""
+    seen = []
     for rider_id in rider_ids:
-        cur.execute("""
-            INSERT INTO lineup (team_id, rider_id, race_date)
-            VALUES (?, ?, ?)
-        """, (team_id, rider_id, race_date))
+        rider_id = str(rider_id).strip()
+        if rider_id and rider_id not in seen:
+            seen.append(rider_id)
+    return seen
+
 
-    conn.commit()
-def save_race_selection(cur, team_id, rider_ids, race_date):
+def find_conflicts(conn, team_id, race_date, rider_ids):
     """
-    Salva la formazione per una gara specifica usando SQLite diretto.
+    Rider già schierati da un altro team nella stessa data, in una sola query.
+    Restituisce una lista di dict: zwift_power_id, name, team_id, team_name.
     """
-    # Cancella la formazione esistente
-    cur.execute("""
-        DELETE FROM race_selection 
-        WHERE team_id = ? AND race_date = ?
-    """, (team_id, race_date))
+    if not rider_ids:
+        return []
+    placeholders = ", ".join("?" for _ in rider_ids)
+    rows = conn.execute(f"""
+        SELECT rl.zwift_power_id, r.name, rl.team_id, t.name AS team_name
+        FROM race_lineup rl
+        LEFT JOIN riders r ON r.zwift_power_id = rl.zwift_power_id
+        LEFT JOIN teams t ON t.id = rl.team_id
+        WHERE rl.race_date = ? AND rl.team_id != ?
+          AND rl.zwift_power_id IN ({placeholders})
+    """, (race_date, team_id, *rider_ids)).fetchall()
 
-    # Inserisci i nuovi rider
-    for rider_id in rider_ids:
-        cur.execute("""
-            INSERT INTO race_selection (team_id, rider_id, race_date)
-            VALUES (?, ?, ?)
-        """, (team_id, rider_id, race_date))
\ No newline at end of file
+    by_rider = {str(row[0]): row for row in rows}
+    return [{
+        "zwift_power_id": rider_id,
+        "name": by_rider[rider_id][1] or rider_id,
+        "team_id": by_rider[rider_id][2],
+        "team_name": by_rider[rider_id][3],
+    } for rider_id in rider_ids if rider_id in by_rider]
+
+
+def save_lineup(conn, team_id, race_date, rider_ids, max_riders=MAX_LINEUP_RIDERS, skip_conflicts=False):
+    """
+    Sostituisce la formazione del team per la data indicata.
+
+    Con skip_conflicts=False la formazione non viene salvata se qualche
+    rider è già schierato da un altro team; con True quei rider vengono
+    esclusi e il resto viene salvato.
+
+    Restituisce un dict:
+        saved        True se la formazione è stata scritta
+        error        None, "too_many" oppure "conflicts"
+        riders       id effettivamente salvati
+        conflicts    lista da find_conflicts()
+    """
+    rider_ids = normalize_rider_ids(rider_ids)
+    result = {"saved": False, "error": None, "riders": [], "conflicts": []}
+
+    if len(rider_ids) > max_riders:
+        result["error"] = "too_many"
+        return result
+
+    with transaction(conn):
+        # Controllo e scrittura sotto lo stesso lock: nessun salvataggio concorrente in mezzo
+        conflicts = find_conflicts(conn, team_id, race_date, rider_ids)
+        result["conflicts"] = conflicts
+        if conflicts and not skip_conflicts:
+            result["error"] = "conflicts"
+            return result
+
+        blocked = {c["zwift_power_id"] for c in conflicts}
+        rider_ids = [rider_id for rider_id in rider_ids if rider_id not in blocked]
+
+        conn.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
+        conn.executemany(
+            "INSERT INTO race_lineup (team_id, race_date, zwift_power_id) VALUES (?, ?, ?)",
+            [(team_id, race_date, rider_id) for rider_id in rider_ids],
+        )
+        refresh_lineup_snapshot(conn, race_date, team_id)
+
+    result.update(saved=True, riders=rider_ids)
+    return result
+
+
+def save_lineups(conn, race_date, lineups, max_riders=MAX_LINEUP_RIDERS):
+    """
+    Sostituisce in blocco le formazioni di più team nella stessa data
+    (assegnazione simultanea): {team_id: [zwift_power_id, ...]}.
+    I conflitti si controllano solo con i team non coinvolti; restituisce
+    lo stesso dict di save_lineup, con "riders" = {team_id: [id, ...]}.
+    """
+    lineups = {int(team_id): normalize_rider_ids(rider_ids) for team_id, rider_ids in lineups.items()}
+    result = {"saved": False, "error": None, "riders": {}, "conflicts": []}
+
+    all_riders = [rider_id for rider_ids in lineups.values() for rider_id in rider_ids]
+    if any(len(rider_ids) > max_riders for rider_ids in lineups.values()):
+        result["error"] = "too_many"
+        return result
+    if len(all_riders) != len(set(all_riders)):
+        # Lo stesso rider in due formazioni della stessa data
+        result["error"] = "conflicts"
+        return result
+    if not lineups:
+        result["saved"] = True
+        return result
+
+    team_ids = list(lineups)
+    with transaction(conn):
+        if all_riders:
+            team_marks = ", ".join("?" for _ in team_ids)
+            rider_marks = ", ".join("?" for _ in all_riders)
+            rows = conn.execute(f"""
+                SELECT rl.zwift_power_id, r.name, rl.team_id, t.name AS team_name
+                FROM race_lineup rl
+                LEFT JOIN riders r ON r.zwift_power_id = rl.zwift_power_id
+                LEFT JOIN teams t ON t.id = rl.team_id
+                WHERE rl.race_date = ? AND rl.team_id NOT IN ({team_marks})
+                  AND rl.zwift_power_id IN ({rider_marks})
+            """, (race_date, *team_ids, *all_riders)).fetchall()
+            if rows:
+                result["error"] = "conflicts"
+                result["conflicts"] = [{
+                    "zwift_power_id": str(row[0]),
+                    "name": row[1] or str(row[0]),
+                    "team_id": row[2],
+                    "team_name": row[3],
+                } for row in rows]
+                return result
+
+        conn.executemany(
+            "DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?",
+            [(team_id, race_date) for team_id in team_ids],
+        )
+        conn.executemany(
+            "INSERT INTO race_lineup (team_id, race_date, zwift_power_id) VALUES (?, ?, ?)",
+            [(team_id, race_date, rider_id) for team_id, rider_ids in lineups.items() for rider_id in rider_ids],
+        )
+        # Snapshot della data riallineato in un colpo solo, non team per team
+        refresh_lineup_snapshot(conn, race_date)
+
+    result.update(saved=True, riders=lineups)
+    return result
+
+
+def remove_rider(conn, team_id, race_date, zwift_power_id):
+    """Toglie un rider dalla formazione del team."""
+    with transaction(conn):
+        conn.execute(
+            "DELETE FROM race_lineup WHERE team_id = ? AND race_date = ? AND zwift_power_id = ?",
+            (team_id, race_date, str(zwift_power_id)),
+        )
+        refresh_lineup_snapshot(conn, race_date, team_id)
+
+
+def _conflict_names(conflicts):
+    return ", ".join(
+        f"{c['name']} ({c['team_name']})" if c["team_name"] else c["name"]
+        for c in conflicts
+    )
+
+
+def lineup_error_message(result, max_riders=MAX_LINEUP_RIDERS):
+    """Messaggio flash per un salvataggio non riuscito."""
+    if result["error"] == "too_many":
+        return f"⚠️ Puoi selezionare al massimo {max_riders} rider"
+    if result["error"] == "conflicts":
+        names = _conflict_names(result["conflicts"])
+        return f"❌ I seguenti rider sono già assegnati a un'altra gara in questa data: {names}"
+    return None
+
+
+def lineup_skipped_message(result):
+    """Messaggio flash per i rider esclusi da un salvataggio con skip_conflicts (None se nessuno)."""
+    if not result["saved"] or not result["conflicts"]:
+        return None
+    names = _conflict_names(result["conflicts"])
+    return f"⚠️ Formazione salvata senza i rider già schierati da un altro team in questa data: {names}"
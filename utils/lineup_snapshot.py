@@ -0,0 +1,148 @@
+"""
+Snapshot denormalizzato delle formazioni (lineup_snapshot).
+
+Una riga per rider schierato, per (race_date, team), con nome del team,
+categoria normalizzata (A+ → A, vuota → OTHER), capitano e chiavi di
+ordinamento già calcolate: le letture diventano una scansione sull'indice
+senza join né ordinamenti in Python.
+
+Aggiornamento:
+- a ogni salvataggio di una formazione: refresh_lineup_snapshot(conn, race_date, team_id)
+  nella stessa transazione della scrittura su race_lineup;
+- quando cambiano rider o team (nomi, categorie, capitano) le versioni in
+  data_versions non coincidono più con quelle registrate e
+  ensure_lineup_snapshot() ricostruisce lo snapshot alla lettura successiva.
+"""
+from db import transaction
+from utils.cache import get_data_versions
+
+# Tabelle da cui dipendono i campi denormalizzati (race_lineup è gestita dai salvataggi)
+SOURCE_TABLES = ("riders", "teams")
+
+CATEGORY_ORDER = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
+
+
+def _normalized_category(expr):
+    """Espressione SQL: categoria maiuscola senza spazi, A+ → A, vuota → OTHER."""
+    return f"""
+        CASE
+            WHEN COALESCE(TRIM(UPPER({expr})), '') = '' THEN 'OTHER'
+            WHEN TRIM(UPPER({expr})) = 'A+' THEN 'A'
+            ELSE TRIM(UPPER({expr}))
+        END
+    """
+
+
+def _category_order(expr):
+    """Espressione SQL: posizione della categoria (99 se sconosciuta)."""
+    cases = " ".join(f"WHEN '{cat}' THEN {pos}" for cat, pos in CATEGORY_ORDER.items())
+    return f"CASE {_normalized_category(expr)} {cases} ELSE 99 END"
+
+
+SNAPSHOT_SQL = """
+    CREATE TABLE IF NOT EXISTS lineup_snapshot (
+        race_date TEXT NOT NULL,
+        team_id INTEGER NOT NULL,
+        team_name TEXT,
+        team_category TEXT,
+        team_order INTEGER,
+        zwift_power_id TEXT NOT NULL,
+        rider_name TEXT,
+        rider_category TEXT,
+        category TEXT,
+        category_order INTEGER,
+        is_captain INTEGER,
+        available_zrl INTEGER,
+        captain_name TEXT,
+        PRIMARY KEY (race_date, team_id, zwift_power_id)
+    )
+"""
+
+# Colonne ricavate da race_lineup × riders × teams × capitano
+_SELECT_SQL = f"""
+    SELECT
+        rl.race_date,
+        t.id,
+        t.name,
+        {_normalized_category("t.category")},
+        {_category_order("t.category")},
+        r.zwift_power_id,
+        r.name,
+        TRIM(UPPER(r.category)),
+        {_normalized_category("r.category")},
+        {_category_order("r.category")},
+        r.is_captain,
+        r.available_zrl,
+        COALESCE(rc.name, '')
+    FROM race_lineup rl
+    JOIN riders r ON r.zwift_power_id = rl.zwift_power_id
+    JOIN teams t ON t.id = rl.team_id
+    LEFT JOIN riders rc ON rc.zwift_power_id = t.captain_zwift_id
+"""
+
+_INSERT_SQL = """
+    INSERT INTO lineup_snapshot (
+        race_date, team_id, team_name, team_category, team_order,
+        zwift_power_id, rider_name, rider_category, category, category_order,
+        is_captain, available_zrl, captain_name
+    )
+"""
+
+
+def _source_version(conn):
+    return ",".join(str(v) for v in get_data_versions(conn, SOURCE_TABLES))
+
+
+def _set_source_version(conn, version):
+    conn.execute("DELETE FROM lineup_snapshot_state")
+    conn.execute("INSERT INTO lineup_snapshot_state (source_version) VALUES (?)", (version,))
+
+
+def create_lineup_snapshot(conn):
+    """Step di migrazione: tabella, indice di lettura e primo popolamento."""
+    conn.execute(SNAPSHOT_SQL)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lineup_snapshot_state (
+            source_version TEXT
+        )
+    """)
+    # Ordine di lettura dei report: data, categoria del team, team, rider
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lineup_snapshot_read
+        ON lineup_snapshot(race_date, team_order, team_name, rider_name)
+    """)
+    conn.execute("DELETE FROM lineup_snapshot")
+    conn.execute(_INSERT_SQL + _SELECT_SQL)
+    _set_source_version(conn, _source_version(conn))
+
+
+def refresh_lineup_snapshot(conn, race_date, team_id=None):
+    """
+    Riallinea lo snapshot di una data (o di un solo team in quella data).
+    Va chiamata dopo la scrittura su race_lineup, prima del commit.
+    """
+    if team_id is None:
+        conn.execute("DELETE FROM lineup_snapshot WHERE race_date = ?", (race_date,))
+        conn.execute(_INSERT_SQL + _SELECT_SQL + " WHERE rl.race_date = ?", (race_date,))
+    else:
+        params = (race_date, team_id)
+        conn.execute("DELETE FROM lineup_snapshot WHERE race_date = ? AND team_id = ?", params)
+        conn.execute(_INSERT_SQL + _SELECT_SQL + " WHERE rl.race_date = ? AND rl.team_id = ?", params)
+
+
+def rebuild_lineup_snapshot(conn):
+    """Ricostruisce l'intero snapshot (rider o team modificati)."""
+    with transaction(conn):
+        # Versione letta prima della ricostruzione: una modifica concorrente
+        # lascia lo snapshot "vecchio" e forza un nuovo giro alla lettura successiva
+        version = _source_version(conn)
+        conn.execute("DELETE FROM lineup_snapshot")
+        conn.execute(_INSERT_SQL + _SELECT_SQL)
+        _set_source_version(conn, version)
+
+
+def ensure_lineup_snapshot(conn):
+    """Da chiamare prima di leggere lo snapshot: lo ricostruisce se rider o team sono cambiati."""
+    row = conn.execute("SELECT source_version FROM lineup_snapshot_state").fetchone()
+    if row is None or row[0] != _source_version(conn):
+        rebuild_lineup_snapshot(conn)
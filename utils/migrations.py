@@ -0,0 +1,323 @@
+"""
+Migrazioni versionate dello schema ZRL.
+
+Ogni migrazione viene applicata una sola volta e registrata nella tabella
+schema_migrations. Il runner parte da create_app(); da riga di comando:
+
+    python -m utils.migrations            # applica le migrazioni pendenti
+    python -m utils.migrations explain    # piano di esecuzione delle query calde
+"""
+import sys
+import sqlite3
+import logging
+
+from db import get_zrl_db, transaction
+from utils.lineup_snapshot import create_lineup_snapshot
+from utils.race_profiles import create_race_profiles
+from utils.race_digest import create_content_hash
+from utils.import_jobs import create_import_jobs
+
+
+def dialect(conn):
+    """'sqlite' oppure 'postgres' in base alla connessione."""
+    return "sqlite" if isinstance(conn, sqlite3.Connection) else "postgres"
+
+
+def _add_column(table, column, definition):
+    """Step che aggiunge una colonna solo se manca (SQLite non ha ADD COLUMN IF NOT EXISTS)."""
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+def _dedupe_race_lineup(conn):
+    """Rimuove le righe duplicate di race_lineup tenendo la prima."""
+    row_id = "rowid" if dialect(conn) == "sqlite" else "ctid"
+    conn.execute(f"""
+        DELETE FROM race_lineup
+        WHERE {row_id} NOT IN (
+            SELECT MIN({row_id}) FROM race_lineup
+            GROUP BY team_id, race_date, zwift_power_id
+        )
+    """)
+
+
+def _data_version_triggers(tables):
+    """Step che crea data_versions e i trigger che la incrementano a ogni scrittura."""
+    def step(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        for table in tables:
+            conn.execute(
+                "INSERT INTO data_versions (name, version) VALUES (?, 0) ON CONFLICT (name) DO NOTHING",
+                (table,),
+            )
+
+        if dialect(conn) == "postgres":
+            conn.execute("""
+                CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            for table in tables:
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_version ON {table}")
+                conn.execute(f"""
+                    CREATE TRIGGER trg_{table}_version
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+                """)
+            return
+
+        # SQLite: solo trigger per riga, uno per tipo di operazione
+        for table in tables:
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{op.lower()}
+                    AFTER {op} ON {table}
+                    BEGIN
+                        UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                    END
+                """)
+    return step
+
+
+# ===============================================================
+# 📜 ELENCO MIGRAZIONI (solo in coda, mai modificare quelle applicate)
+# ===============================================================
+# Ogni step è una stringa SQL (valida per entrambi i backend),
+# una funzione step(conn) oppure un dict {"sqlite": ..., "postgres": ...}
+
+MIGRATIONS = [
+    ("0001", "Tabella races (prima creata a runtime da import_wtrl_races)", [
+        """
+        CREATE TABLE IF NOT EXISTS races (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            race_date TEXT NOT NULL,
+            format TEXT,
+            world TEXT,
+            course TEXT,
+            laps INTEGER,
+            distance_km REAL,
+            elevation_m REAL,
+            powerups TEXT,
+            fal_segments TEXT,
+            fts_segments TEXT,
+            round_id INTEGER,
+            active INTEGER DEFAULT 1,
+            UNIQUE(race_date, name)
+        )
+        """,
+        _add_column("races", "round_id", "INTEGER"),
+        _add_column("races", "external_id", "TEXT"),
+    ]),
+    ("0002", "Colonne rounds usate dall'import WTRL (prima ALTER TABLE a ogni import)", [
+        _add_column("rounds", "start_date", "TEXT"),
+        _add_column("rounds", "end_date", "TEXT"),
+        _add_column("rounds", "active", "INTEGER DEFAULT 0"),
+        _add_column("rounds", "link", "TEXT"),
+    ]),
+    ("0003", "Indici di base su rounds e races", [
+        "CREATE INDEX IF NOT EXISTS idx_rounds_season_id ON rounds(season_id)",
+        "CREATE INDEX IF NOT EXISTS idx_races_round_id ON races(round_id)",
+    ]),
+    ("0004", "Indici composti su race_lineup", [
+        _dedupe_race_lineup,
+        # Lineup di un team per data (dashboard, manage_riders, report)
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_race_lineup_team_date_rider "
+        "ON race_lineup(team_id, race_date, zwift_power_id)",
+        # Rider già schierati in una data (conflitti)
+        "CREATE INDEX IF NOT EXISTS idx_race_lineup_date_rider "
+        "ON race_lineup(race_date, zwift_power_id)",
+    ]),
+    ("0005", "Indici su rider_teams e availability", [
+        # rider_teams ha PK (zwift_power_id, team_id): serve l'accesso per team
+        "CREATE INDEX IF NOT EXISTS idx_rider_teams_team_id ON rider_teams(team_id)",
+        "CREATE INDEX IF NOT EXISTS idx_availability_race_id ON availability(race_id)",
+        # races(race_date) è già coperto dal vincolo UNIQUE(race_date, name)
+    ]),
+    ("0006", "Versioni dei dati per l'invalidazione delle cache", [
+        _data_version_triggers(("race_lineup", "teams", "rider_teams", "riders", "captains", "races")),
+    ]),
+    ("0007", "Snapshot denormalizzato delle formazioni (lineup_snapshot)", [
+        create_lineup_snapshot,
+    ]),
+    ("0008", "Profili numerici delle gare (race_profiles)", [
+        create_race_profiles,
+    ]),
+    ("0009", "Impronta delle gare per saltare le righe WTRL invariate (races.content_hash)", [
+        create_content_hash,
+    ]),
+    ("0010", "Job di import, pianificazioni e heartbeat dei worker", [
+        create_import_jobs,
+    ]),
+]
+
+
+# ===============================================================
+# 🚀 RUNNER
+# ===============================================================
+
+def _run_step(conn, step):
+    if isinstance(step, dict):
+        step = step.get(dialect(conn))
+        if step is None:
+            return
+    if callable(step):
+        step(conn)
+    else:
+        conn.execute(step)
+
+
+def run_migrations(conn=None):
+    """Applica in ordine le migrazioni non ancora registrate. Restituisce le versioni applicate."""
+    conn = conn or get_zrl_db()
+    with transaction(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                description TEXT,
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        with transaction(conn):
+            if dialect(conn) == "postgres":
+                # Più worker gunicorn partono insieme: uno solo applica
+                conn.execute("SELECT pg_advisory_xact_lock(4242)")
+            done = conn.execute(
+                "SELECT 1 FROM schema_migrations WHERE version = ?", (version,)
+            ).fetchone()
+            if done:
+                continue
+            for step in steps:
+                _run_step(conn, step)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+        applied.append(version)
+        logging.info(f"🧱 Migrazione {version} applicata: {description}")
+    return applied
+
+
+# ===============================================================
+# 🔥 QUERY CALDE (verificate con EXPLAIN)
+# ===============================================================
+
+HOT_QUERIES = {
+    "dashboard.has_lineup": (
+        "SELECT 1 FROM lineup_snapshot WHERE race_date = ? AND team_id = ? LIMIT 1",
+        ("2025-01-01", 1),
+    ),
+    "manage_riders.lineup_team": (
+        "SELECT zwift_power_id FROM race_lineup WHERE team_id = ? AND race_date = ?",
+        (1, "2025-01-01"),
+    ),
+    "manage_riders.lineup_other_teams": (
+        "SELECT zwift_power_id FROM race_lineup WHERE race_date = ? AND team_id != ?",
+        ("2025-01-01", 1),
+    ),
+    "manage_riders.delete_lineup": (
+        "DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?",
+        (1, "2025-01-01"),
+    ),
+    "lineup_snapshot.by_date": (
+        """
+        SELECT team_id, team_name, rider_name, category, captain_name
+        FROM lineup_snapshot
+        WHERE race_date = ?
+        ORDER BY team_order, team_name, rider_name
+        """,
+        ("2025-01-01",),
+    ),
+    "lineup_snapshot.categories": (
+        "SELECT DISTINCT category FROM lineup_snapshot WHERE race_date = ?",
+        ("2025-01-01",),
+    ),
+    "rider_teams.by_team": (
+        "SELECT zwift_power_id FROM rider_teams WHERE team_id = ?",
+        (1,),
+    ),
+    "availability.by_race": (
+        "SELECT rider_id, status FROM availability WHERE race_id = ?",
+        (1,),
+    ),
+    "races.next_date": (
+        "SELECT MIN(race_date) FROM races WHERE race_date >= ?",
+        ("2025-01-01",),
+    ),
+    "race_profiles.by_date": (
+        "SELECT * FROM race_profiles WHERE race_date = ?",
+        ("2025-01-01",),
+    ),
+    "races.digests_by_dates": (
+        "SELECT race_date, name, content_hash, active FROM races WHERE race_date BETWEEN ? AND ?",
+        ("2025-01-01", "2025-01-31"),
+    ),
+    "import_jobs.queued": (
+        "SELECT id FROM import_jobs WHERE status = 'queued' ORDER BY id LIMIT 1",
+        (),
+    ),
+    "races.by_round": (
+        "SELECT * FROM races WHERE round_id = ? ORDER BY race_date ASC",
+        (1,),
+    ),
+}
+
+
+def explain_hot_queries(conn=None, out=sys.stdout):
+    """Stampa il piano di ogni query calda. Restituisce i nomi delle query senza indice."""
+    conn = conn or get_zrl_db()
+    is_sqlite = dialect(conn) == "sqlite"
+    without_index = []
+    if not is_sqlite:
+        # Su tabelle piccole PostgreSQL preferisce comunque il Seq Scan:
+        # qui interessa sapere se un indice utilizzabile esiste
+        conn.execute("SET enable_seqscan = off")
+
+    for name, (sql, params) in HOT_QUERIES.items():
+        prefix = "EXPLAIN QUERY PLAN " if is_sqlite else "EXPLAIN "
+        rows = conn.execute(prefix + sql, params).fetchall()
+        plan = [row[3] if is_sqlite else row[0] for row in rows]
+        if is_sqlite:
+            # "SCAN tabella" senza indice = lettura completa
+            full_scan = any(p.startswith("SCAN ") and "INDEX" not in p for p in plan)
+        else:
+            full_scan = any("Seq Scan" in p for p in plan)
+        if full_scan:
+            without_index.append(name)
+
+        print(f"{'⚠️' if full_scan else '✅'} {name}", file=out)
+        for p in plan:
+            print(f"      {p}", file=out)
+
+    if not is_sqlite:
+        conn.execute("RESET enable_seqscan")
+        conn.commit()
+    return without_index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        versions = run_migrations()
+        print(f"✅ Migrazioni applicate: {', '.join(versions) if versions else 'nessuna'}")
+    elif command == "explain":
+        run_migrations()
+        missing = explain_hot_queries()
+        sys.exit(1 if missing else 0)
+    else:
+        print("Uso: python -m utils.migrations [migrate | explain]")
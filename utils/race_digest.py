@@ -0,0 +1,112 @@
+"""
+Impronta (content_hash) delle righe di races e upsert a blocchi degli import WTRL.
+
+Ogni gara salva lo sha1 dei suoi campi normalizzati (stringhe senza spazi
+ai bordi, numeri nello stesso formato, round). Gli import caricano le
+impronte del periodo con una sola query e scrivono solo le gare nuove o
+cambiate, con un unico INSERT ... ON CONFLICT(race_date, name) DO UPDATE:
+reimportare un round invariato = una lettura e nessuna scrittura (e nessun
+incremento di data_versions, quindi le cache restano valide).
+
+active dipende dalla data e può essere cambiato a mano dai capitani: non
+entra nell'impronta ma viene confrontato a parte.
+"""
+import hashlib
+
+# Campi dell'impronta, con il tipo usato per normalizzarli
+HASH_FIELDS = (
+    ("format", str), ("world", str), ("course", str),
+    ("laps", int), ("distance_km", float), ("elevation_m", float),
+    ("powerups", str), ("fal_segments", str), ("fts_segments", str),
+    ("round_id", int),
+)
+
+UPSERT_FIELDS = ("name", "race_date") + tuple(field for field, _ in HASH_FIELDS) + ("active", "content_hash")
+
+UPSERT_SQL = f"""
+    INSERT INTO races ({', '.join(UPSERT_FIELDS)})
+    VALUES ({', '.join('?' for _ in UPSERT_FIELDS)})
+    ON CONFLICT(race_date, name) DO UPDATE SET
+        {', '.join(f'{field} = excluded.{field}' for field in UPSERT_FIELDS[2:])}
+"""
+
+
+def _normalizza(value, kind):
+    if value is None or value == "":
+        return ""
+    try:
+        if kind is int:
+            return str(int(float(value)))
+        if kind is float:
+            return repr(round(float(value), 3))
+    except (TypeError, ValueError):
+        pass
+    return str(value).strip()
+
+
+def content_hash(race):
+    """sha1 dei campi normalizzati di una gara (dict o sqlite3.Row)."""
+    payload = "\x1f".join(_normalizza(race[field], kind) for field, kind in HASH_FIELDS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def create_content_hash(conn):
+    """Step di migrazione: colonna content_hash e impronte delle gare esistenti."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(races)").fetchall()]
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE races ADD COLUMN content_hash TEXT")
+    fields = ", ".join(("id",) + tuple(field for field, _ in HASH_FIELDS))
+    races = conn.execute(f"SELECT {fields} FROM races").fetchall()
+    conn.executemany(
+        "UPDATE races SET content_hash = ? WHERE id = ?",
+        [(content_hash(race), race["id"]) for race in races],
+    )
+
+
+def upsert_races(conn, races):
+    """
+    Salva le gare (dict con name, race_date, i campi di HASH_FIELDS e active)
+    scrivendo solo quelle nuove o cambiate. Va chiamata dentro la transazione
+    dell'import. Restituisce {"inserted", "updated", "skipped", "race_ids"},
+    con race_ids gli id delle gare scritte (per refresh_race_profiles).
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0, "race_ids": []}
+    if not races:
+        return counts
+
+    dates = [race["race_date"] for race in races]
+    existing = {
+        (row["race_date"], row["name"]): (row["content_hash"], row["active"])
+        for row in conn.execute(
+            "SELECT race_date, name, content_hash, active FROM races WHERE race_date BETWEEN ? AND ?",
+            (min(dates), max(dates)),
+        ).fetchall()
+    }
+
+    changed = {}
+    for race in races:
+        key = (race["race_date"], race["name"])
+        digest = content_hash(race)
+        if key not in existing:
+            counts["inserted"] += 1
+        elif existing[key] != (digest, race["active"]):
+            counts["updated"] += 1
+        else:
+            counts["skipped"] += 1
+            continue
+        # Stessa gara due volte nello stesso import: vale l'ultima
+        changed[key] = tuple(race[field] for field in UPSERT_FIELDS[:-1]) + (digest,)
+        existing[key] = (digest, race["active"])
+
+    if changed:
+        conn.executemany(UPSERT_SQL, list(changed.values()))
+        # L'upsert non restituisce gli id: si rileggono solo se qualcosa è stato scritto
+        counts["race_ids"] = [
+            row["id"]
+            for row in conn.execute(
+                "SELECT id, race_date, name FROM races WHERE race_date BETWEEN ? AND ?",
+                (min(dates), max(dates)),
+            ).fetchall()
+            if (row["race_date"], row["name"]) in changed
+        ]
+    return counts
@@ -0,0 +1,191 @@
+"""
+Profili numerici delle gare (race_profiles).
+
+Ogni gara importata da WTRL viene trasformata in un profilo: densità di
+salita (m/km), numero di segmenti sprint e salita (FAL/FTS), TTT, power-up
+e i pesi sui tipi di percorso usati dal motore delle formazioni
+(pianura, montagna, cronosquadre).
+
+I profili si calcolano all'import (refresh_race_profiles prima del commit)
+e nella migrazione 0008. source_hash registra i campi da cui è derivato
+il profilo: una gara modificata, o una nuova PROFILE_VERSION, viene
+ricalcolata al refresh successivo; le altre restano come sono.
+"""
+import re
+import hashlib
+
+# Da incrementare quando cambiano le regole di estrazione
+PROFILE_VERSION = 1
+
+# Densità di salita (m/km) sotto cui un percorso è pianura e sopra cui è montagna
+FLAT_DENSITY = 8.0
+MOUNTAIN_DENSITY = 20.0
+
+SOURCE_FIELDS = (
+    "format", "course", "laps", "distance_km", "elevation_m",
+    "powerups", "fal_segments", "fts_segments",
+)
+
+PROFILES_SQL = """
+    CREATE TABLE IF NOT EXISTS race_profiles (
+        race_id INTEGER PRIMARY KEY,
+        race_date TEXT,
+        race_type TEXT,
+        climb_density REAL,
+        distance_km REAL,
+        elevation_m REAL,
+        laps INTEGER,
+        sprint_segments INTEGER,
+        climb_segments INTEGER,
+        is_ttt INTEGER,
+        has_powerups INTEGER,
+        known_course INTEGER,
+        weight_pianura REAL,
+        weight_montagna REAL,
+        weight_cronosquadre REAL,
+        source_hash TEXT
+    )
+"""
+
+_COLUMNS = (
+    "race_id", "race_date", "race_type", "climb_density", "distance_km", "elevation_m",
+    "laps", "sprint_segments", "climb_segments", "is_ttt", "has_powerups", "known_course",
+    "weight_pianura", "weight_montagna", "weight_cronosquadre", "source_hash",
+)
+
+_SEGMENT_REPEAT = re.compile(r"\(x\s*(\d+)\)", re.IGNORECASE)
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def source_hash(race):
+    """Impronta dei campi da cui dipende il profilo."""
+    payload = "\x1f".join(str(race[field] if race[field] is not None else "") for field in SOURCE_FIELDS)
+    return hashlib.sha1(f"{PROFILE_VERSION}\x1f{payload}".encode("utf-8")).hexdigest()
+
+
+def conta_segmenti(*texts):
+    """
+    Segmenti sprint e salita dalle righe FAL/FTS ("Champion's Sprint FWD Sprint (x11)").
+    Le stesse righe compaiono spesso in entrambi i campi: si contano una volta.
+    """
+    lines = {line.strip() for text in texts for line in (text or "").splitlines() if line.strip()}
+    sprints = climbs = 0
+    for line in lines:
+        match = _SEGMENT_REPEAT.search(line)
+        repeat = int(match.group(1)) if match else 1
+        kind = _SEGMENT_REPEAT.sub("", line).strip().lower()
+        if kind.endswith("sprint"):
+            sprints += repeat
+        elif kind.endswith("climb") or kind.endswith("kom"):
+            climbs += repeat
+    return sprints, climbs
+
+
+def estrai_profilo(race):
+    """Profilo numerico di una riga di races (dict o sqlite3.Row)."""
+    distance = _number(race["distance_km"])
+    elevation = _number(race["elevation_m"])
+    laps = int(_number(race["laps"])) or 1
+    sprints, climbs = conta_segmenti(race["fal_segments"], race["fts_segments"])
+    is_ttt = (race["format"] or "").strip().upper() == "TTT"
+    powerups = (race["powerups"] or "").strip().lower()
+    # Percorsi "TBC / New Route" arrivano con distanza 0
+    known_course = distance > 0
+
+    climb_density = elevation / distance if known_course else 0.0
+
+    if is_ttt:
+        weights = {"pianura": 0.0, "montagna": 0.0, "cronosquadre": 1.0}
+    elif not known_course:
+        weights = {"pianura": 0.5, "montagna": 0.5, "cronosquadre": 0.0}
+    else:
+        mountain = (climb_density - FLAT_DENSITY) / (MOUNTAIN_DENSITY - FLAT_DENSITY)
+        mountain = min(1.0, max(0.0, mountain))
+        if sprints + climbs:
+            # Nelle gare a punti contano anche i segmenti: media con la quota di salite
+            mountain = (mountain + climbs / (sprints + climbs)) / 2
+        weights = {"pianura": 1.0 - mountain, "montagna": mountain, "cronosquadre": 0.0}
+
+    return {
+        "race_id": race["id"],
+        "race_date": race["race_date"],
+        "race_type": max(weights, key=weights.get),
+        "climb_density": round(climb_density, 2),
+        "distance_km": distance,
+        "elevation_m": elevation,
+        "laps": laps,
+        "sprint_segments": sprints,
+        "climb_segments": climbs,
+        "is_ttt": int(is_ttt),
+        "has_powerups": int(bool(powerups) and powerups != "none"),
+        "known_course": int(known_course),
+        "weight_pianura": round(weights["pianura"], 4),
+        "weight_montagna": round(weights["montagna"], 4),
+        "weight_cronosquadre": round(weights["cronosquadre"], 4),
+        "source_hash": source_hash(race),
+    }
+
+
+def create_race_profiles(conn):
+    """Step di migrazione: tabella, indice per data e primo calcolo."""
+    conn.execute(PROFILES_SQL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_race_profiles_date ON race_profiles(race_date)")
+    refresh_race_profiles(conn)
+
+
+def refresh_race_profiles(conn, race_ids=None):
+    """
+    Ricalcola i profili mancanti o non più allineati alla gara: tutte le
+    gare oppure solo race_ids (lista vuota = nessuna lettura).
+    Va chiamata dagli import prima del commit; restituisce quanti profili ha scritto.
+    """
+    fields = ", ".join(("id", "race_date") + SOURCE_FIELDS)
+    races_sql = f"SELECT {fields} FROM races"
+    profiles_sql = "SELECT race_id, source_hash FROM race_profiles"
+    params = ()
+    if race_ids is not None:
+        if not race_ids:
+            return 0
+        race_ids = [int(race_id) for race_id in race_ids]
+        placeholders = ", ".join("?" for _ in race_ids)
+        races_sql += f" WHERE id IN ({placeholders})"
+        profiles_sql += f" WHERE race_id IN ({placeholders})"
+        params = tuple(race_ids)
+    races = conn.execute(races_sql, params).fetchall()
+
+    current = {row[0]: row[1] for row in conn.execute(profiles_sql, params).fetchall()}
+    profiles = [
+        estrai_profilo(race) for race in races
+        if current.get(race["id"]) != source_hash(race)
+    ]
+    if profiles:
+        conn.executemany(
+            "DELETE FROM race_profiles WHERE race_id = ?",
+            [(p["race_id"],) for p in profiles],
+        )
+        conn.executemany(
+            f"INSERT INTO race_profiles ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})",
+            [tuple(p[column] for column in _COLUMNS) for p in profiles],
+        )
+    # Profili di gare cancellate
+    if race_ids is None:
+        conn.execute("DELETE FROM race_profiles WHERE race_id NOT IN (SELECT id FROM races)")
+    return len(profiles)
+
+
+def profili_per_data(conn, race_date):
+    """Profili delle gare della data, con nome e formato della gara."""
+    rows = conn.execute("""
+        SELECT p.*, r.name, r.format, r.world, r.course
+        FROM race_profiles p
+        JOIN races r ON r.id = p.race_id
+        WHERE p.race_date = ?
+        ORDER BY r.name
+    """, (race_date,)).fetchall()
+    return [dict(row) for row in rows]
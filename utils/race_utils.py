@@ -1,5 +1,6 @@
 import sqlite3
 from db import get_zrl_db
+from utils.lineup import save_lineup
 
 def get_next_race_date():
     conn = get_zrl_db()
@@ -26,13 +27,8 @@ def validate_race_selection(team_id, race_date):
     return delegate is not None
 
 def save_race_selection(team_id, race_date, rider_ids):
+    """Salva la formazione tramite utils.lineup; restituisce l'esito (vedi save_lineup)."""
     conn = get_zrl_db()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM race_lineup WHERE team_id = ? AND race_date = ?", (team_id, race_date))
-    for zwift_power_id in rider_ids:
-        cur.execute("""
-            INSERT INTO race_lineup (team_id, race_date, zwift_power_id)
-            VALUES (?, ?, ?)
-        """, (team_id, race_date, zwift_power_id))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    result = save_lineup(conn, team_id, race_date, rider_ids)
+    conn.close()
+    return result
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+Rendering PDF dei report (reportlab).
+
+Funzione pura DataFrame → bytes, senza Flask né database: può girare nel
+thread della richiesta o in un processo del pool di export (utils/export_jobs.py).
+"""
+import io
+import datetime
+
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+
+
+def render_report_pdf(df, report_type):
+    """PDF del report (teams, team_composition, lineup) come bytes."""
+    buffer = io.BytesIO()
+
+    # Footer con data/ora
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 6)
+        canvas.drawString(doc.leftMargin, 15, f"Generato il {datetime.datetime.now():%d %B %Y %H:%M}")
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=landscape(A4),
+        leftMargin=30,
+        rightMargin=30,
+        topMargin=30,
+        bottomMargin=30
+    )
+    styles = getSampleStyleSheet()
+    elements = []
+
+    # Colori ed emoji per le categorie
+    color_map = {
+        "A": colors.HexColor("#dc3545"),
+        "B": colors.HexColor("#28a745"),
+        "C": colors.HexColor("#17a2b8"),
+        "D": colors.HexColor("#ffc107"),
+        "OTHER": colors.HexColor("#6c757d")
+    }
+    emoji_map = {
+        "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
+    }
+
+    # --- Report: teams ---
+    if report_type == "teams":
+        if df.empty or "team" not in df.columns:
+            elements.append(Paragraph("Nessun dato disponibile per i teams.", styles["Normal"]))
+        else:
+            df["category"] = df["category"].fillna("OTHER").str.upper().str.strip()
+            df = df.sort_values(by=["category", "team"])
+            grouped = df.groupby("category")
+
+            for cat, group in grouped:
+                emoji = emoji_map.get(cat, "⚫")
+                elements.append(Paragraph(f"{emoji} Categoria {cat}", styles["Heading4"]))
+
+                data = [["Team", "N. Riders", "Capitano"]]
+                for _, row in group.iterrows():
+                    team_name = str(row.get("team") or "—")
+                    n_riders = str(int(row.get("n_riders") or 0))
+                    captain = str(row.get("captain") or "—")
+                    data.append([team_name, n_riders, captain])
+
+                table = Table(data, colWidths=[250, 60, 180], hAlign="LEFT")
+                table.setStyle(TableStyle([
+                    ("BACKGROUND", (0, 0), (-1, 0), color_map.get(cat, colors.HexColor("#f0f0f0"))),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                    ("FONTSIZE", (0, 0), (-1, -1), 7),
+                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+                    ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
+                    ("LEFTPADDING", (0, 0), (-1, -1), 3),
+                    ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+                    ("TOPPADDING", (0, 0), (-1, -1), 1),
+                    ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+                ]))
+                elements.append(table)
+
+                total = int(group["n_riders"].fillna(0).sum())
+                elements.append(Paragraph(f"<i>Totale rider: {total}</i>", styles["Normal"]))
+                elements.append(Spacer(1, 6))
+
+
+    # --- Report: Team Composition (ordinato per categoria) ---
+
+    elif report_type == "team_composition":
+        if df.empty or "team_name" not in df.columns:
+            elements.append(Paragraph("Nessun dato disponibile.", styles["Normal"]))
+        else:
+            # Funzione per il piè di pagina
+            def footer(canvas, doc):
+                canvas.saveState()
+                canvas.setFont("Helvetica", 8)
+                canvas.drawString(doc.leftMargin, 15, f"Pagina {doc.page}")
+                canvas.restoreState()
+
+            # Mappa colori e emoji per categoria
+            color_map = {
+                "A": colors.HexColor("#dc3545"),
+                "B": colors.HexColor("#28a745"),
+                "C": colors.HexColor("#17a2b8"),
+                "D": colors.HexColor("#ffc107"),
+                "OTHER": colors.HexColor("#6c757d")
+            }
+            emoji_map = {
+                "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
+            }
+
+            # Normalizza e ordina
+            category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
+            df["category_clean"] = df["category"].fillna("OTHER").str.upper()
+            df["category_order"] = df["category_clean"].map(lambda x: category_order.get(x, 99))
+            df = df.sort_values(by=["category_order", "team_name", "rider_name"])
+
+            # Costruzione blocchi team
+            team_blocks = []
+            ordered_teams = df["team_name"].drop_duplicates()
+
+            for team in ordered_teams:
+                group = df[df["team_name"] == team]
+                riders = group.to_dict(orient="records")
+                cat = riders[0].get("category_clean", "OTHER") if riders else "OTHER"
+                header_color = color_map.get(cat, colors.HexColor("#6c757d"))
+                emoji = emoji_map.get(cat, "⚫")
+                captain = riders[0].get("captain", "")
+
+                # Titolo del team
+                title_text = f"<b>{emoji} {team}</b>"
+                if captain:
+                    title_text += f" — Capitano: {captain}"
+                title = Paragraph(title_text, styles["Heading4"])
+                spacer = Spacer(1, 4)
+
+                # Tabella con intestazione + 12 righe
+                data = [["Rider", "Categoria"]]
+                for i in range(12):
+                    if i < len(riders):
+                        r = riders[i]
+                        categoria = f"{emoji} {r.get('category','')}" if r.get("category") else ""
+                        data.append([r.get("rider_name",""), categoria])
+                    else:
+                        data.append(["", ""])
+
+                table = Table(data, colWidths=[140, 60])
+                table.setStyle(TableStyle([
+                    ("BACKGROUND", (0, 0), (-1, 0), header_color),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                    ("FONTSIZE", (0, 0), (-1, -1), 8),
+                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+                    ("TOPPADDING", (0, 0), (-1, -1), 2),
+                ]))
+
+                team_blocks.append([title, spacer, table, Spacer(1, 6)])
+
+            # Impaginazione in griglia 2x2 per pagina
+            elements = []
+
+            # Titolo del report
+            report_title = Paragraph("<b>Composizione Squadre</b>", styles["Title"])
+            elements.append(report_title)
+            elements.append(Spacer(1, 12))
+            
+            for i in range(0, len(team_blocks), 4):
+                page_blocks = team_blocks[i:i+4]
+                while len(page_blocks) < 4:
+                    page_blocks.append([Spacer(1, 0)])  # riempi con vuoti
+
+                grid = [
+                    [page_blocks[0], page_blocks[1]],
+                    [page_blocks[2], page_blocks[3]]
+                ]
+                table = Table(grid, colWidths=[260, 260])
+                table.setStyle(TableStyle([
+                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                    ("LEFTPADDING", (0, 0), (-1, -1), 6),
+                    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+                ]))
+                elements.append(table)
+                elements.append(Spacer(1, 12))
+
+    # --- Report: Lineup ---
+    elif report_type == "lineup":
+        if df.empty:
+            elements.append(Paragraph("Nessuna lineup disponibile.", styles["Normal"]))
+        else:
+            # Normalizza e ordina per categoria
+            df["category"] = df["category"].fillna("OTHER").str.upper().str.strip()
+
+            category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
+            df["category_order"] = df["category"].map(lambda x: category_order.get(x, 99))
+            df = df.sort_values(by=["category_order", "team", "rider"])
+
+            # Mappa colori e emoji
+            color_map = {
+                "A": colors.HexColor("#dc3545"),
+                "B": colors.HexColor("#28a745"),
+                "C": colors.HexColor("#17a2b8"),
+                "D": colors.HexColor("#ffc107"),
+                "OTHER": colors.HexColor("#6c757d")
+            }
+            emoji_map = {
+                "A": "🔴", "B": "🟢", "C": "🔵", "D": "🟡", "OTHER": "⚫"
+            }
+
+            # Costruisci blocchi per ogni team (ordinati per categoria)
+            team_blocks = []
+
+            # Normalizza e prepara colonna categoria
+            df["category"] = df.get("category", "OTHER").fillna("OTHER").astype(str).str.upper().str.strip()
+
+            # Mappa ordine categorie
+            category_order = {"A": 1, "B": 2, "C": 3, "D": 4, "OTHER": 5}
+            df["category_order"] = df["category"].map(lambda x: category_order.get(x, 99))
+
+            # Ordina prima per categoria, poi per nome team e rider
+            df = df.sort_values(by=["category_order", "team", "rider"], na_position="last")
+
+            # Elenco team univoci ordinati per categoria
+            ordered_teams = (
+                df[["team", "category", "category_order"]]
+                .drop_duplicates(subset=["team"])
+                .sort_values(by=["category_order", "team"])
+            )
+
+            for _, row in ordered_teams.iterrows():
+                team = row.get("team", "Senza Team")
+                cat = row.get("category", "OTHER")
+                header_color = color_map.get(cat, colors.HexColor("#6c757d"))
+                emoji = emoji_map.get(cat, "⚫")
+
+                # Titolo del team
+                title_text = f"<b>{emoji} {team}</b> <font size=8>(Cat. {cat})</font>"
+                title = Paragraph(title_text, styles["Heading4"])
+                spacer = Spacer(1, 3)
+
+                # Filtra i rider del team corrente
+                group = df[df["team"] == team]
+
+                # Tabella con intestazione + 6 righe
+                data = [["Rider", "Categoria", "Data Gara", "Capitano"]]
+                for _, r in group.head(6).iterrows():
+                    data.append([
+                        r.get("rider", "—"),
+                        r.get("category", "—"),
+                        r.get("race_date", "—"),
+                        r.get("captain", "—")
+                    ])
+
+
+                # Riempi con righe vuote fino a 6
+                while len(data) < 7:
+                    data.append(["", "", ""])
+
+                # Tabella compatta per stare nel layout 2×2
+                table = Table(data, colWidths=[100, 40, 50, 60])
+                table.setStyle(TableStyle([
+                    ("BACKGROUND", (0, 0), (-1, 0), header_color),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+                    ("FONTSIZE", (0, 0), (-1, -1), 7),
+                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+                    ("TOPPADDING", (0, 0), (-1, -1), 2),
+                    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+                ]))
+
+                team_blocks.append([title, spacer, table, Spacer(1, 6)])
+
+
+            # Impaginazione 2×2 per pagina
+            elements.append(Paragraph("<b>Lineup Team</b>", styles["Title"]))
+            elements.append(Spacer(1, 12))
+
+            for i in range(0, len(team_blocks), 4):
+                page_blocks = team_blocks[i:i+4]
+                while len(page_blocks) < 4:
+                    page_blocks.append([Spacer(1, 0)])  # riempi spazi vuoti
+
+                grid = [
+                    [page_blocks[0], page_blocks[1]],
+                    [page_blocks[2], page_blocks[3]]
+                ]
+
+                grid_table = Table(grid, colWidths=[260, 260])
+                grid_table.setStyle(TableStyle([
+                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                    ("LEFTPADDING", (0, 0), (-1, -1), 6),
+                    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+                ]))
+                elements.append(grid_table)
+                elements.append(Spacer(1, 12))
+
+
+    # Costruzione PDF
+    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
@@ -0,0 +1,130 @@
+"""
+Sincronizzazione della tabella riders dal file riders.csv / riders.json.
+
+Il file viene indicizzato una volta per zwift_power_id; la differenza con
+il database è un'unica join fra due DataFrame, con confronto per colonna
+(numeri con tolleranza, NULL/NaN/"" equivalenti). Si scrivono solo i rider
+nuovi o cambiati, con executemany, in una sola transazione.
+
+Le colonne assenti dal file (es. profile_url nel CSV) non vengono toccate.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from db import transaction
+
+SYNC_FIELDS = (
+    "name", "category", "ranking",
+    "wkg_20min", "watt_20min", "wkg_15sec", "watt_15sec",
+    "status", "races", "weight", "ftp", "age", "country", "profile_url",
+)
+NUMERIC_FIELDS = {"ranking", "wkg_20min", "watt_20min", "wkg_15sec", "watt_15sec", "races", "weight", "ftp", "age"}
+
+# Valori dei nuovi rider per le colonne che il file non ha
+NEW_RIDER_DEFAULTS = {
+    "available_zrl": 1, "is_captain": 0, "email": "", "password": "", "active": 1,
+}
+
+
+def prepara_sorgente(df):
+    """DataFrame del file indicizzato per zwift_power_id (stringa), un rider per id."""
+    df = df.copy()
+    ids = df["zwift_power_id"]
+    if pd.api.types.is_float_dtype(ids):
+        # Id letti come float per via di righe vuote: 931830.0 → "931830"
+        ids = ids.astype("Int64")
+    df["zwift_power_id"] = ids.astype(str).str.strip()
+    df = df[df["zwift_power_id"].ne("") & df["zwift_power_id"].ne("<NA>") & df["zwift_power_id"].ne("nan")]
+    df = df.drop_duplicates("zwift_power_id", keep="last").set_index("zwift_power_id")
+
+    fields = [field for field in SYNC_FIELDS if field in df.columns]
+    for field in fields:
+        if field in NUMERIC_FIELDS:
+            df[field] = pd.to_numeric(df[field], errors="coerce")
+        else:
+            df[field] = df[field].astype(object).where(df[field].notna(), None)
+    return df[fields]
+
+
+def _riders_db(conn, fields, extra):
+    columns = ("zwift_power_id",) + tuple(fields) + tuple(extra)
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM riders").fetchall()
+    db = pd.DataFrame([tuple(row) for row in rows], columns=columns)
+    db["zwift_power_id"] = db["zwift_power_id"].astype(str)
+    return db.set_index("zwift_power_id")
+
+
+def _uguali(left, right, numeric):
+    """Confronto vettoriale per colonna: True dove il valore non cambia."""
+    if numeric:
+        a = pd.to_numeric(left, errors="coerce").to_numpy(dtype=float)
+        b = pd.to_numeric(right, errors="coerce").to_numpy(dtype=float)
+        return np.isclose(a, b, rtol=0, atol=1e-9, equal_nan=True)
+    a = left.where(left.notna(), "").astype(str).str.strip()
+    b = right.where(right.notna(), "").astype(str).str.strip()
+    return (a == b).to_numpy()
+
+
+def _python(frame):
+    """Righe come tuple di tipi Python (sqlite3 non accetta numpy.int64), NaN → NULL."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=True, name=None))
+
+
+def sincronizza_riders(conn, df, ids=None, insert_new=False, set_values=None):
+    """
+    Allinea riders al file. ids limita la sincronizzazione ai rider indicati;
+    insert_new aggiunge quelli non ancora presenti; set_values imposta colonne
+    fisse sui rider toccati (es. available_zrl=1).
+    Restituisce {"inserted", "updated", "unchanged", "not_found"}.
+    """
+    set_values = set_values or {}
+    source = prepara_sorgente(df)
+    fields = list(source.columns)
+    db = _riders_db(conn, fields, set_values)
+
+    if ids is not None:
+        ids = pd.Index([str(i) for i in ids]).unique()
+        not_found = int((~ids.isin(source.index)).sum())
+        source = source[source.index.isin(ids)]
+    else:
+        # Aggiornamento completo: conta i rider del database che il file non ha
+        not_found = int((~db.index.isin(source.index)).sum())
+
+    joined = source.join(db, how="left", rsuffix="_db")
+    exists = joined.index.isin(db.index)
+
+    unchanged = np.ones(len(joined), dtype=bool)
+    for field in fields:
+        unchanged &= _uguali(joined[field], joined[f"{field}_db"], field in NUMERIC_FIELDS)
+    for column, value in set_values.items():
+        unchanged &= _uguali(joined[f"{column}_db" if column in source.columns else column],
+                             pd.Series(value, index=joined.index), isinstance(value, (int, float)))
+
+    to_update = source[exists & ~unchanged]
+    to_insert = source[~exists] if insert_new else source.iloc[0:0]
+
+    with transaction(conn):
+        if len(to_update):
+            assignments = [f"{field} = ?" for field in fields] + [f"{column} = ?" for column in set_values]
+            conn.executemany(
+                f"UPDATE riders SET {', '.join(assignments)} WHERE zwift_power_id = ?",
+                [row[1:] + tuple(set_values.values()) + (row[0],) for row in _python(to_update)],
+            )
+        if len(to_insert):
+            defaults = dict(NEW_RIDER_DEFAULTS, created_at=datetime.datetime.now().strftime("%Y-%m-%d"))
+            defaults.update(set_values)
+            columns = ["zwift_power_id"] + fields + list(defaults)
+            conn.executemany(
+                f"INSERT INTO riders ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [row + tuple(defaults.values()) for row in _python(to_insert)],
+            )
+
+    return {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "unchanged": int((exists & unchanged).sum()),
+        "not_found": not_found,
+    }
@@ -0,0 +1,281 @@
+"""
+Lettura di data/riders.csv / data/riders.json (export dei rider ZwiftPower).
+
+Il file viene letto a blocchi di CHUNK_ROWS righe: il CSV con il chunksize
+di pandas, il JSON (array o JSON Lines) decodificando un oggetto alla volta
+da un buffer di CHUNK_BYTES. Ogni blocco viene tipizzato subito (numeri,
+testi con "" per i vuoti, zwift_power_id come stringa normalizzata), così
+in memoria non resta mai il testo dell'intero file.
+
+Il risultato è in cache per (percorso, mtime, dimensione), in memoria e
+come snapshot colonnare su disco (pickle del DataFrame tipizzato): finché
+il file non cambia nessuna richiesta, né un processo appena avviato, lo
+rilegge. RidersSnapshot aggiunge gli indici per categoria e per id e gli
+ordinamenti usati dalla paginazione lato server della pagina di import.
+Il DataFrame restituito è condiviso: va filtrato, non modificato.
+"""
+import os
+import re
+import json
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from db import BASE_DIR
+
+# ===============================================================
+# ⚙️ CONFIGURAZIONE
+# ===============================================================
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CSV_FILE = os.path.join(DATA_DIR, "riders.csv")
+JSON_FILE = os.path.join(DATA_DIR, "riders.json")
+
+CHUNK_ROWS = int(os.environ.get("ZRL_RIDERS_CHUNK_ROWS", "5000"))
+CHUNK_BYTES = 1 << 20
+
+# Snapshot del file già tipizzato, riletto dai processi nuovi senza ripetere il parsing
+SNAPSHOT_DIR = DATA_DIR
+SNAPSHOT_VERSION = 1
+
+TEXT_FIELDS = ("name", "category", "status", "country", "profile_url")
+FLOAT_FIELDS = ("ranking", "wkg_20min", "watt_20min", "wkg_15sec", "watt_15sec", "weight", "ftp")
+INT_FIELDS = ("races", "age")
+
+_SEPARATORS = re.compile(r"[\s\[\],]*")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# ===============================================================
+# 🔹 TIPIZZAZIONE DI UN BLOCCO
+# ===============================================================
+
+def _normalizza_ids(ids):
+    """931830, 931830.0, " 931830 " → "931830"; vuoti → ""."""
+    ids = ids.astype(object).where(ids.notna(), "").astype(str).str.strip()
+    return ids.str.replace(r"\.0+$", "", regex=True).replace({"nan": "", "None": ""})
+
+
+def _tipizza(chunk):
+    chunk["zwift_power_id"] = _normalizza_ids(chunk["zwift_power_id"])
+    chunk = chunk[chunk["zwift_power_id"] != ""].copy()
+    for field in TEXT_FIELDS:
+        if field in chunk.columns:
+            chunk[field] = chunk[field].astype(object).where(chunk[field].notna(), "").astype(str).str.strip()
+    for field in FLOAT_FIELDS:
+        if field in chunk.columns:
+            chunk[field] = pd.to_numeric(chunk[field], errors="coerce").astype("float64")
+    for field in INT_FIELDS:
+        if field in chunk.columns:
+            chunk[field] = pd.to_numeric(chunk[field], errors="coerce").round().astype("Int64")
+    return chunk
+
+
+# ===============================================================
+# 📄 LETTORI A BLOCCHI
+# ===============================================================
+
+def _blocchi_csv(path):
+    text = {field: str for field in ("zwift_power_id",) + TEXT_FIELDS}
+    with pd.read_csv(path, dtype=text, keep_default_na=False, chunksize=CHUNK_ROWS) as reader:
+        for chunk in reader:
+            yield _tipizza(chunk)
+
+
+def _oggetti_json(path):
+    """Oggetti di un array JSON o di un file JSON Lines, uno alla volta."""
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    with open(path, encoding="utf-8") as f:
+        eof = False
+        while True:
+            # Separatori fra un oggetto e l'altro: spazi, "[", ",", "]"
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer):
+                try:
+                    obj, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    pos = end
+                    yield obj
+                    continue
+            elif eof:
+                return
+            # Buffer finito o oggetto a cavallo di due blocchi: leggi ancora
+            block = f.read(CHUNK_BYTES)
+            eof = not block
+            buffer, pos = buffer[pos:] + block, 0
+
+
+def _blocchi_json(path):
+    rows = []
+    for obj in _oggetti_json(path):
+        rows.append(obj)
+        if len(rows) >= CHUNK_ROWS:
+            yield _tipizza(pd.DataFrame.from_records(rows))
+            rows = []
+    if rows:
+        yield _tipizza(pd.DataFrame.from_records(rows))
+
+
+def _leggi(path):
+    blocks = _blocchi_csv(path) if path.endswith(".csv") else _blocchi_json(path)
+    chunks = [chunk for chunk in blocks if len(chunk)]
+    if not chunks:
+        return pd.DataFrame(columns=["zwift_power_id"])
+    return pd.concat(chunks, ignore_index=True)
+
+
+# ===============================================================
+# 📊 SNAPSHOT COLONNARE
+# ===============================================================
+
+# Filtri della pagina di import: gruppo → categorie del file
+CATEGORY_GROUPS = {"A": ("A", "A+"), "B": ("B",), "C": ("C",), "D": ("D",), "NESSUNA": ("",)}
+SORT_FIELDS = ("name", "category", "ftp", "age", "ranking", "wkg_20min")
+
+
+class RidersSnapshot:
+    """
+    Il file già tipizzato, con gli indici per la pagina di import:
+    posizioni per gruppo di categoria, posizione per zwift_power_id e
+    ordinamenti per colonna (calcolati alla prima richiesta).
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        positions = np.arange(len(self.df))
+        category = self.df["category"] if "category" in self.df.columns else pd.Series("", index=self.df.index)
+        self.by_category = {
+            group: positions[category.isin(values).to_numpy()]
+            for group, values in CATEGORY_GROUPS.items()
+        }
+        self.by_id = pd.Index(self.df["zwift_power_id"])
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _ordine(self, sort, desc):
+        """Posizioni ordinate per colonna (vuoti sempre in fondo)."""
+        key = (sort, desc)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            column = self.df[sort]
+            if column.dtype == object:
+                column = column.str.lower().mask(column == "")
+            order = column.reset_index(drop=True).sort_values(
+                ascending=not desc, kind="stable", na_position="last"
+            ).index.to_numpy()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def righe(self, ids):
+        """Righe del file per gli id indicati (gli id assenti vengono ignorati)."""
+        positions = self.by_id.get_indexer([str(i) for i in ids])
+        return self.df.iloc[positions[positions >= 0]]
+
+    def pagina(self, category="", search="", sort="name", desc=False, page=1, per_page=100):
+        """
+        Una pagina di rider filtrati e ordinati. Solo le righe della pagina
+        diventano dict: il costo non cresce con la dimensione del file.
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+        if category in self.by_category:
+            mask[:] = False
+            mask[self.by_category[category]] = True
+        elif category:
+            mask &= (self.df["category"] == category).to_numpy()
+        if search and "name" in self.df.columns:
+            mask &= self.df["name"].str.contains(search, case=False, regex=False).to_numpy()
+
+        if sort in self.df.columns:
+            order = self._ordine(sort, desc)
+            selected = order[mask[order]]
+        else:
+            selected = np.flatnonzero(mask)
+
+        total = len(selected)
+        pages = max(1, -(-total // per_page))
+        page = min(max(1, page), pages)
+        positions = selected[(page - 1) * per_page:page * per_page]
+        rows = self.df.iloc[positions].astype(object)
+        rows = rows.where(rows.notna(), None).to_dict(orient="records")
+        return {"rows": rows, "total": total, "page": page, "pages": pages, "per_page": per_page}
+
+
+# ===============================================================
+# 💾 CACHE (memoria e disco)
+# ===============================================================
+
+def percorso_riders():
+    """Il file da usare (CSV se presente, altrimenti JSON) o None."""
+    for path in (CSV_FILE, JSON_FILE):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _snapshot_path(path):
+    name = os.path.basename(path).replace(".", "_")
+    return os.path.join(SNAPSHOT_DIR, f".{name}.snapshot.pkl")
+
+
+def _carica_da_disco(path, key):
+    """DataFrame dello snapshot su disco, se è stato fatto sulla stessa versione del file."""
+    try:
+        saved = pd.read_pickle(_snapshot_path(path))
+    except Exception:
+        return None
+    if saved.get("version") != SNAPSHOT_VERSION or saved.get("key") != key:
+        return None
+    return saved["df"]
+
+
+def _salva_su_disco(path, key, df):
+    target = _snapshot_path(path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        pd.to_pickle({"version": SNAPSHOT_VERSION, "key": key, "df": df}, tmp)
+        os.replace(tmp, target)
+    except OSError as e:
+        logging.warning(f"⚠️ Snapshot rider non salvato: {e}")
+
+
+def snapshot_riders(path=None):
+    """RidersSnapshot del file, o None se il file non c'è."""
+    path = path or percorso_riders()
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        # Un processo nuovo (riavvio, altro worker) riparte dallo snapshot su disco
+        df = _carica_da_disco(path, key)
+        if df is None:
+            df = _leggi(path)
+            _salva_su_disco(path, key, df)
+        snapshot = RidersSnapshot(df)
+        _cache[path] = (key, snapshot)
+        return snapshot
+
+
+def leggi_riders(path=None):
+    """DataFrame tipizzato dei rider del file, o None se il file non c'è."""
+    snapshot = snapshot_riders(path)
+    return None if snapshot is None else snapshot.df
@@ -1,3 +1,6 @@
+from datetime import date
+
+
 def get_or_create_season(cursor, name, start_year, end_year):
     """
     Crea una stagione se non esiste già nel database.
@@ -17,4 +20,30 @@ def get_or_create_season(cursor, name, start_year, end_year):
         VALUES (?, ?, ?)
     """, (name, start_year, end_year))
 
-    return cursor.lastrowid
\ No newline at end of file
+    return cursor.lastrowid
+
+# ===============================================================
+# 🔄 ATTIVAZIONE ROUND
+# ===============================================================
+
+_rounds_refreshed_on = None
+
+
+def refresh_round_activation(conn):
+    """Disattiva i round già conclusi. Scrive solo se qualcosa cambia."""
+    global _rounds_refreshed_on
+    today = date.today()
+    cur = conn.execute(
+        "UPDATE rounds SET is_active = 0 WHERE end_date < ? AND (is_active IS NULL OR is_active != 0)",
+        (today.isoformat(),),
+    )
+    conn.commit()
+    _rounds_refreshed_on = today
+    return cur.rowcount
+
+
+def refresh_round_activation_daily():
+    """before_request: al primo accesso di ogni giorno riallinea i round (nessuna query negli altri casi)."""
+    if _rounds_refreshed_on != date.today():
+        from db import get_zrl_db
+        refresh_round_activation(get_zrl_db())
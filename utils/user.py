@@ -1,12 +1,9 @@
-import sqlite3
 from werkzeug.security import generate_password_hash
-
-DB_PATH = "zrl.db"
+from db import get_zrl_db
 
 def create_user(email, password, zwift_power_id, role='admin', team_id=None, active=1):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_zrl_db()
         cur = conn.cursor()
 
         # Verifica che la tabella 'users' esista
@@ -0,0 +1,136 @@
+"""
+Scaricamento concorrente del calendario WTRL (asyncio + Playwright).
+
+Un solo browser per tutto l'import e al massimo MAX_PAGES pagine aperte
+insieme. Ogni job (un round, eventualmente una categoria) apre la sua
+pagina e aspetta la tabella #tblschedule invece di pause fisse. Poi
+estrae le righe e le mette in una coda. Il writer le consuma man mano
+che arrivano, nel thread dell'event loop: la connessione SQLite resta
+nel thread che l'ha aperta.
+
+    jobs = [{"url": ..., "round_number": 1, "category": None}, ...]
+    errors = asyncio.run(scarica_calendario(jobs, parse, writer))
+
+Ogni pagina scaricata viene salvata in utils.html_snapshots; con
+ZRL_SCRAPE_MODE=replay il browser non parte e si usano gli snapshot.
+"""
+import os
+import re
+import asyncio
+import logging
+
+import lxml.html
+from playwright.async_api import async_playwright
+
+from utils.html_snapshots import replay_mode, require_snapshot, save_snapshot
+
+SCHEDULE_URL = "https://www.wtrl.racing/zwift-racing-league/schedule/{year}/r{round_number}/"
+CATEGORIES = ["A", "B", "C", "D"]
+
+# Pagine aperte contemporaneamente nello stesso browser
+MAX_PAGES = int(os.environ.get("ZRL_SCRAPE_PAGES", "4"))
+PAGE_TIMEOUT_MS = 30000
+TABLE_SELECTOR = "#tblschedule tbody tr"
+
+# Risorse inutili per leggere le tabelle
+BLOCKED_RESOURCES = {"image", "font", "media"}
+
+_ROUND_DATES = re.compile(r"\((\d{4}-\d{2}-\d{2})\s*→\s*(\d{4}-\d{2}-\d{2})\)")
+
+
+def round_dates(html):
+    """Date di inizio e fine del round dall'intestazione della pagina."""
+    if not html or not html.strip():
+        return None, None
+    match = _ROUND_DATES.search(lxml.html.document_fromstring(html).text_content())
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+
+async def _consegna(job, html, parse, queue):
+    start_date, end_date = round_dates(html)
+    meta = {"start_date": start_date, "end_date": end_date}
+    await queue.put((job, parse(html, job), meta))
+
+
+async def _blocca_risorse(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def _scarica_job(context, semaphore, job, parse, queue):
+    """Scarica la pagina del job, estrae le righe e le passa al writer."""
+    async with semaphore:
+        page = await context.new_page()
+        try:
+            await page.goto(job["url"], wait_until="domcontentloaded", timeout=PAGE_TIMEOUT_MS)
+            await page.wait_for_selector(TABLE_SELECTOR, timeout=PAGE_TIMEOUT_MS)
+            if job.get("category"):
+                # Il cambio categoria ricarica la tabella via XHR: si aspetta la rete ferma
+                await page.click(f"text={job['category']}", timeout=PAGE_TIMEOUT_MS)
+                await page.wait_for_load_state("networkidle", timeout=PAGE_TIMEOUT_MS)
+                await page.wait_for_selector(TABLE_SELECTOR, timeout=PAGE_TIMEOUT_MS)
+            html = await page.content()
+        finally:
+            await page.close()
+
+    save_snapshot(job["url"], html, "wtrl", job.get("category"))
+    await _consegna(job, html, parse, queue)
+
+
+async def _replay_job(job, parse, queue):
+    """Stesso percorso di _scarica_job, dall'ultimo snapshot salvato."""
+    await _consegna(job, require_snapshot(job["url"], job.get("category")), parse, queue)
+
+
+async def _writer_loop(queue, writer):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        writer(*item)
+
+
+async def scarica_calendario(jobs, parse, writer, max_pages=MAX_PAGES):
+    """
+    Esegue i job in parallelo (max_pages pagine alla volta).
+    parse(html, job) → righe; writer(job, righe, meta) viene chiamato per
+    ogni pagina appena è pronta. Restituisce [(job, errore)] dei job falliti.
+    """
+    queue = asyncio.Queue()
+    if replay_mode():
+        consumer = asyncio.create_task(_writer_loop(queue, writer))
+        outcomes = await asyncio.gather(
+            *(_replay_job(job, parse, queue) for job in jobs),
+            return_exceptions=True,
+        )
+        await queue.put(None)
+        await consumer
+        return _errori(jobs, outcomes)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context()
+            await context.route("**/*", _blocca_risorse)
+            semaphore = asyncio.Semaphore(max(1, max_pages))
+
+            consumer = asyncio.create_task(_writer_loop(queue, writer))
+            outcomes = await asyncio.gather(
+                *(_scarica_job(context, semaphore, job, parse, queue) for job in jobs),
+                return_exceptions=True,
+            )
+            await queue.put(None)
+            await consumer
+        finally:
+            await browser.close()
+
+    return _errori(jobs, outcomes)
+
+
+def _errori(jobs, outcomes):
+    errors = [(job, outcome) for job, outcome in zip(jobs, outcomes) if isinstance(outcome, Exception)]
+    for job, error in errors:
+        logging.warning(f"⚠️ Calendario WTRL non scaricato ({job['url']} {job.get('category') or ''}): {error}")
+    return errors
@@ -0,0 +1,154 @@
+"""
+Benchmark del parser del calendario WTRL.
+
+Confronta il parser lxml (utils.wtrl.schedule_parser) con i due approcci
+precedenti, tenuti qui solo come riferimento:
+    bs4       BeautifulSoup con html.parser sull'HTML della pagina
+    handles   query_selector_all + inner_text() per cella (Playwright):
+              un giro col browser per ognuna delle 8 celle di ogni riga
+
+Le pagine sono gli snapshot WTRL salvati (utils.html_snapshots) oppure,
+se non ce ne sono, una pagina sintetica con --rows righe.
+
+    python -m utils.wtrl.schedule_bench [--rows 200] [--repeat 20] [--handles]
+"""
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from utils.html_snapshots import list_snapshots, load_snapshot
+from utils.wtrl.schedule_parser import parse_schedule
+
+
+def parse_bs(html, round_number=None):
+    """Parser BeautifulSoup precedente (utils.wtrl_import.parse_races_from_html)."""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("table", id="tblschedule")
+    if not table:
+        return []
+
+    races = []
+    for row in table.select("tbody tr"):
+        cells = row.find_all("td")
+        if len(cells) < 8:
+            continue
+
+        race_info = cells[0].get_text(separator="\n", strip=True).split("\n")
+        try:
+            race_date = datetime.strptime(race_info[1], "%d/%m/%y").strftime("%Y-%m-%d")
+        except (IndexError, ValueError):
+            continue
+
+        duration_text = cells[4].get_text(separator="\n", strip=True)
+        laps_match = re.search(r"(\d+)\s+lap", duration_text)
+        distance_match = re.search(r"([\d.]+)km", duration_text)
+        elevation_match = re.search(r"([\d.]+)m", duration_text)
+
+        races.append({
+            "name": race_info[0],
+            "race_date": race_date,
+            "format": cells[1].get_text(strip=True),
+            "world": cells[2].get_text(strip=True),
+            "course": cells[3].get_text(strip=True),
+            "laps": int(laps_match.group(1)) if laps_match else 1,
+            "distance_km": float(distance_match.group(1)) if distance_match else 0,
+            "elevation_m": float(elevation_match.group(1)) if elevation_match else 0,
+            "powerups": cells[5].get_text(separator=" ", strip=True),
+            "fal_segments": cells[6].get_text(separator="\n", strip=True),
+            "fts_segments": cells[7].get_text(separator="\n", strip=True),
+        })
+    return races
+
+
+def parse_handles(pages):
+    """Approccio a element handle: una pagina Playwright per HTML, inner_text() per cella."""
+    from playwright.sync_api import sync_playwright
+
+    rows_read = 0
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        for html in pages:
+            page.set_content(html)
+            for row in page.query_selector_all("#tblschedule tbody tr"):
+                cells = row.query_selector_all("td")
+                if len(cells) < 8:
+                    continue
+                [cell.inner_text().strip() for cell in cells[:8]]
+                rows_read += 1
+        browser.close()
+    return rows_read
+
+
+def pagina_di_prova(rows):
+    """Pagina del calendario sintetica, con la stessa struttura di quella WTRL."""
+    body = []
+    for i in range(rows):
+        day = i % 28 + 1
+        body.append(
+            "<tr>"
+            f"<td><strong>Race {i}</strong><br><span>{day:02d}/10/25</span></td>"
+            "<td>Points</td><td>Watopia</td><td>Three Little Sisters</td>"
+            f"<td><span>{i % 3 + 1} laps</span><br><span>{20 + i % 17}.4km</span><br><span>{150 + i}m</span></td>"
+            "<td><img alt='Feather'> None</td>"
+            "<td>Champion's Sprint FWD Sprint (x3)<br>Epic KOM Climb</td>"
+            "<td>Champion's Sprint FWD Sprint (x3)</td>"
+            "</tr>"
+        )
+    return (
+        "<html><body><h2>Round 1 (2025-10-01 → 2025-10-28)</h2>"
+        "<table id='tblschedule'><thead><tr><th>Race</th></tr></thead>"
+        f"<tbody>{''.join(body)}</tbody></table></body></html>"
+    )
+
+
+def _cronometra(parse, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = sum(len(parse(html)) for html in pages)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, best
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(description="Benchmark del parser del calendario WTRL")
+    parser.add_argument("--rows", type=int, default=200, help="righe della pagina sintetica")
+    parser.add_argument("--repeat", type=int, default=20, help="ripetizioni (si tiene la migliore)")
+    parser.add_argument("--handles", action="store_true", help="misura anche inner_text() via Playwright")
+    args = parser.parse_args(argv)
+
+    pages = [load_snapshot(meta["url"], meta.get("variant")) for meta in list_snapshots("wtrl")]
+    pages = [html for html in pages if html]
+    source = f"{len(pages)} snapshot WTRL"
+    if not pages:
+        pages = [pagina_di_prova(args.rows)]
+        source = f"pagina sintetica di {args.rows} righe"
+    print(f"📄 {source}, migliore di {args.repeat} ripetizioni", file=out)
+
+    results = {}
+    for name, parse in (("lxml", parse_schedule), ("bs4", parse_bs)):
+        rows, best = _cronometra(parse, pages, args.repeat)
+        results[name] = best
+        print(f"{name:<8} {rows:>6} righe  {best * 1000:9.2f} ms", file=out)
+    print(f"⚡ lxml {results['bs4'] / results['lxml']:.1f}x più veloce di bs4", file=out)
+
+    if args.handles:
+        t0 = time.perf_counter()
+        try:
+            rows = parse_handles(pages)
+        except Exception as e:
+            print(f"handles  non misurato: {str(e).splitlines()[0]}", file=out)
+        else:
+            elapsed = time.perf_counter() - t0
+            print(f"handles  {rows:>6} righe  {elapsed * 1000:9.2f} ms (una passata, browser incluso)", file=out)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Parser unico della tabella del calendario WTRL (#tblschedule), su lxml.
+
+L'HTML della pagina viene letto una volta sola; righe e testo delle celle
+si estraggono con XPath precompilati e giri, km e dislivello con regex
+precompilate. Lo usano tutti gli import WTRL (admin, wtrl_import,
+import_wtrl_races) e il replay degli snapshot.
+
+Confronto con i parser precedenti (BeautifulSoup e inner_text() sulle
+celle via Playwright): python -m utils.wtrl.schedule_bench
+"""
+import re
+from datetime import datetime
+
+import lxml.html
+from lxml import etree
+
+# Righe della tabella del calendario; se manca l'id si prova con tutte le tabelle
+_SCHEDULE_ROWS = etree.XPath("//table[@id='tblschedule']/tbody/tr")
+_ANY_TABLE_ROWS = etree.XPath("//table//tr")
+_CELLS = etree.XPath("./td")
+_TEXTS = etree.XPath(".//text()")
+
+_LAPS = re.compile(r"(\d+)\s*laps?\b", re.IGNORECASE)
+_DISTANCE = re.compile(r"(\d+(?:[.,]\d+)?)\s*km\b", re.IGNORECASE)
+_ELEVATION = re.compile(r"(\d+(?:[.,]\d+)?)\s*m\b", re.IGNORECASE)
+
+DATE_FORMAT = "%d/%m/%y"
+
+
+def _lines(cell):
+    """Come get_text(separator="\\n", strip=True) di BeautifulSoup."""
+    return [text.strip() for text in _TEXTS(cell) if text.strip()]
+
+
+def _number(regex, text, default=0.0):
+    match = regex.search(text)
+    return float(match.group(1).replace(",", ".")) if match else default
+
+
+def parse_schedule(html, round_number=None):
+    """Gare della tabella del calendario WTRL, con data ISO. Righe non valide ignorate."""
+    if not html or not html.strip():
+        return []
+    doc = lxml.html.document_fromstring(html)
+    rows = _SCHEDULE_ROWS(doc) or _ANY_TABLE_ROWS(doc)
+
+    races = []
+    for row in rows:
+        cells = _CELLS(row)
+        if len(cells) < 8:
+            continue
+
+        race_info = _lines(cells[0])
+        if len(race_info) < 2:
+            continue
+        try:
+            race_date = datetime.strptime(race_info[1], DATE_FORMAT).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+
+        duration = " ".join(_lines(cells[4]))
+        laps_match = _LAPS.search(duration)
+
+        powerups = " ".join(_lines(cells[5]))
+        if "none" not in powerups.lower() and "%" not in powerups:
+            powerups = ""
+
+        races.append({
+            "name": race_info[0],
+            "race_date": race_date,
+            "format": "".join(_lines(cells[1])),
+            "world": "".join(_lines(cells[2])),
+            "course": "".join(_lines(cells[3])),
+            "laps": int(laps_match.group(1)) if laps_match else 1,
+            "distance_km": _number(_DISTANCE, duration),
+            "elevation_m": _number(_ELEVATION, duration),
+            "powerups": powerups,
+            "fal_segments": "\n".join(_lines(cells[6])),
+            "fts_segments": "\n".join(_lines(cells[7])),
+            "round_number": round_number,
+        })
+    return races
@@ -1,4 +1,6 @@
 from db import get_zrl_db
+from utils.race_profiles import refresh_race_profiles
+from utils.race_digest import upsert_races
 from datetime import datetime
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
@@ -51,6 +53,7 @@ def import_races():
             return
 
         imported = 0
+        rows = []
         for block in blocks:
             try:
                 date_str = block.select_one(".schedule-date").text.strip()
@@ -78,37 +81,22 @@ def import_races():
 
                 active = 1 if datetime.strptime(race_date, "%Y-%m-%d") >= datetime.today() else 0
 
-                cur.execute("""
-                    SELECT id FROM races WHERE round_id = ? AND name = ? AND race_date = ?
-                """, (round_id, name, race_date))
-                existing = cur.fetchone()
-
-                if existing:
-                    cur.execute("""
-                        UPDATE races SET format=?, world=?, course=?, laps=?, distance_km=?, elevation_m=?,
-                            powerups=?, fal_segments=?, fts_segments=?, active=?
-                        WHERE id=?
-                    """, (
-                        format_, world, course, laps, distance_km, elevation_m,
-                        powerups, fal_segments, fts_segments, active, existing["id"]
-                    ))
-                else:
-                    cur.execute("""
-                        INSERT INTO races (name, race_date, format, world, course, laps,
-                            distance_km, elevation_m, powerups, fal_segments, fts_segments, active, round_id)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        name, race_date, format_, world, course, laps,
-                        distance_km, elevation_m, powerups, fal_segments,
-                        fts_segments, active, round_id
-                    ))
-
+                rows.append({
+                    "name": name, "race_date": race_date, "format": format_, "world": world,
+                    "course": course, "laps": laps, "distance_km": distance_km, "elevation_m": elevation_m,
+                    "powerups": powerups, "fal_segments": fal_segments, "fts_segments": fts_segments,
+                    "round_id": round_id, "active": active,
+                })
                 imported += 1
 
             except Exception as e:
                 print(f"❌ Errore nel parsing o salvataggio gara: {e}")
                 continue
 
+        # Una lettura delle impronte, scrittura solo delle gare nuove o cambiate
+        counts = upsert_races(conn, rows)
+        # Profili numerici delle gare nuove o modificate, nella stessa transazione
+        refresh_race_profiles(conn, counts["race_ids"])
         conn.commit()
         print(f"✅ Importazione completata: {imported} gare salvate per Round {round_number}")
 
@@ -50,17 +50,6 @@ def importa_stagione_e_rounds():
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
-    # Verifica colonne
-    columns = [col[1] for col in cur.execute("PRAGMA table_info(rounds)").fetchall()]
-    if "start_date" not in columns:
-        cur.execute("ALTER TABLE rounds ADD COLUMN start_date TEXT")
-    if "end_date" not in columns:
-        cur.execute("ALTER TABLE rounds ADD COLUMN end_date TEXT")
-    if "active" not in columns:
-        cur.execute("ALTER TABLE rounds ADD COLUMN active INTEGER DEFAULT 0")
-    if "link" not in columns:
-        cur.execute("ALTER TABLE rounds ADD COLUMN link TEXT")
-
     # Inserimento stagione
     cur.execute("SELECT id FROM seasons WHERE name = ?", (season_name,))
     season = cur.fetchone()
@@ -1,175 +1,163 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+import asyncio
 from datetime import datetime
-import re
-from flask import flash
-from db_utils import get_fresh_zrl_db, close_zrl_db
-
-def parse_races_from_html(html, round_number):
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", id="tblschedule")
-    if not table:
-        return []
-
-    races = []
-    for row in table.select("tbody tr"):
-        cells = row.find_all("td")
-        if len(cells) < 8:
-            continue
-
-        race_info = cells[0].get_text(separator="\n", strip=True).split("\n")
-        name = race_info[0]
-        date_str = race_info[1]
-
-        try:
-            race_date = datetime.strptime(date_str, "%d/%m/%y")
-        except ValueError:
-            continue
-
-        format = cells[1].get_text(strip=True)
-        world = cells[2].get_text(strip=True)
-        course = cells[3].get_text(strip=True)
-
-        duration_text = cells[4].get_text(separator="\n", strip=True)
-        laps_match = re.search(r"(\d+)\s+lap", duration_text)
-        laps = int(laps_match.group(1)) if laps_match else 1
-        distance_match = re.search(r"([\d.]+)km", duration_text)
-        elevation_match = re.search(r"([\d.]+)m", duration_text)
-        distance_km = float(distance_match.group(1)) if distance_match else 0
-        elevation_m = float(elevation_match.group(1)) if elevation_match else 0
-
-        powerups = cells[5].get_text(separator=" ", strip=True)
-        if "none" not in powerups.lower() and "%" not in powerups:
-            powerups = ""
-
-        fal_segments = cells[6].get_text(separator="\n", strip=True)
-        fts_segments = cells[7].get_text(separator="\n", strip=True)
-
-        races.append({
-            "name": name,
-            "race_date": date_str,
-            "format": format,
-            "world": world,
-            "course": course,
-            "laps": laps,
-            "distance_km": distance_km,
-            "elevation_m": elevation_m,
-            "powerups": powerups,
-            "fal_segments": fal_segments,
-            "fts_segments": fts_segments,
-            "round_number": round_number
-        })
-    return races
-
-
-def wtrl_import():
+from playwright.sync_api import sync_playwright
+from db import transaction
+from utils.db_utils import get_fresh_zrl_db, close_zrl_db
+from utils.wtrl.schedule_async import SCHEDULE_URL, scarica_calendario
+from utils.wtrl.schedule_parser import parse_schedule
+from utils.race_profiles import refresh_race_profiles
+from utils.race_digest import upsert_races
+from utils.html_snapshots import replay_mode, require_snapshot, save_snapshot
+from utils.import_jobs import NO_PROGRESS
+
+def fetch_race_from_url(url):
+    """Gare della pagina WTRL: dal sito (salvando lo snapshot) o, in replay, dall'ultimo snapshot."""
+    if replay_mode():
+        return parse_schedule(require_snapshot(url))
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto(url, timeout=60000)
+        page.wait_for_selector("table", timeout=10000)
+        html = page.content()
+        browser.close()
+
+    save_snapshot(url, html, "wtrl")
+    return parse_schedule(html)
+
+
+def importa_round(round_id, round_url, progress=None):
+    """Gare di una pagina WTRL nel round indicato (job "wtrl_round"). Restituisce i conteggi."""
+    progress = progress or NO_PROGRESS
+    conn = get_fresh_zrl_db()
     try:
-        close_zrl_db()
-
-        season_name = "ZRL 2025/26"
-        season_start = "2025-09-16"
-        season_end = "2026-04-28"
-        start_year = "2025"
-        total_rounds = 4
-
-        rounds = []
-        races = []
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-
-            for round_number in range(1, total_rounds + 1):
-                url = f"https://www.wtrl.racing/zwift-racing-league/schedule/{start_year}/r{round_number}/"
-                page.goto(url)
-                page.wait_for_timeout(3000)
-
-                html = page.content()
-                header_text = page.inner_text("body")
-                date_match = re.search(r"\((\d{4}-\d{2}-\d{2})\s*→\s*(\d{4}-\d{2}-\d{2})\)", header_text)
-                start_date = date_match.group(1) if date_match else None
-                end_date = date_match.group(2) if date_match else None
-
-                rounds.append({
-                    "round_number": round_number,
-                    "name": f"Round {round_number}",
-                    "start_date": start_date,
-                    "end_date": end_date
-                })
-
-                races += parse_races_from_html(html, round_number)
-
-            browser.close()
+        # Verifica che il round esista
+        round_info = conn.execute("SELECT name FROM rounds WHERE id = ?", (round_id,)).fetchone()
+        if not round_info:
+            raise ValueError(f"Round {round_id} non trovato")
+        conn.commit()
 
+        with progress.stage("download"):
+            races = fetch_race_from_url(round_url)
         if not races:
-            flash("📭 Nessuna gara trovata da importare.", "info")
-            return
+            raise ValueError("Nessuna gara trovata")
 
-        conn = get_fresh_zrl_db()
-        cur = conn.cursor()
-
-        cur.execute("SELECT id FROM seasons WHERE name = ?", (season_name,))
-        row = cur.fetchone()
-        if row:
-            season_id = row["id"]
-            cur.execute("UPDATE seasons SET start = ?, end = ? WHERE id = ?", (season_start, season_end, season_id))
-        else:
-            cur.execute("INSERT INTO seasons (name, start_year, end_year) VALUES (?, ?, ?)",
-                        (season_name, season_start[:4], season_end[:4]))
-            season_id = cur.lastrowid
-
-        for r in rounds:
-            cur.execute("SELECT id FROM rounds WHERE season_id = ? AND round_number = ?", (season_id, r["round_number"]))
-            row = cur.fetchone()
-            if row:
-                cur.execute("UPDATE rounds SET name = ?, start_date = ?, end_date = ? WHERE id = ?",
-                            (r["name"], r["start_date"], r["end_date"], row["id"]))
-            else:
-                cur.execute("INSERT INTO rounds (season_id, round_number, name, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
-                            (season_id, r["round_number"], r["name"], r["start_date"], r["end_date"]))
-
-        cur.execute("SELECT id, round_number FROM rounds WHERE season_id = ?", (season_id,))
-        round_map = {row["round_number"]: row["id"] for row in cur.fetchall()}
-
-        imported = 0
+        today = datetime.today().strftime("%Y-%m-%d")
+        rows = []
+        skipped = 0
         for race in races:
-            round_id = round_map.get(race["round_number"])
-            if not round_id:
+            if not race["name"] or not race["race_date"]:
+                skipped += 1
                 continue
+            active = 0 if race["race_date"] < today else 1
+            rows.append(dict(race, round_id=int(round_id), active=active))
+
+        # Lock di scrittura preso solo dopo lo scraping (in WAL i lettori non si bloccano)
+        with progress.stage("salvataggio"):
+            with transaction(conn):
+                # Una lettura delle impronte, scrittura solo delle gare nuove o cambiate
+                counts = upsert_races(conn, rows)
+                # Profili numerici delle gare nuove o modificate, nella stessa transazione
+                refresh_race_profiles(conn, counts.pop("race_ids"))
+
+        counts["skipped"] += skipped
+        counts["round"] = round_info["name"]
+        return counts
+    finally:
+        close_zrl_db(conn)
+
+
+def wtrl_import(progress=None):
+    """
+    Aggiorna stagione, round e gare da WTRL: tutti i round scaricati in parallelo
+    (job "wtrl_season"). Restituisce gare salvate e round non scaricati.
+    """
+    progress = progress or NO_PROGRESS
+    season_name = "ZRL 2025/26"
+    season_start = "2025-09-16"
+    season_end = "2026-04-28"
+    start_year = "2025"
+    total_rounds = 4
+
+    conn = get_fresh_zrl_db()
+    try:
+        cur = conn.cursor()
 
-            race_day = datetime.strptime(race["race_date"], "%d/%m/%y")
-            active = 1 if race_day >= datetime.today() else 0
-
-            cur.execute("SELECT id FROM races WHERE round_id = ? AND name = ? AND race_date = ?",
-                        (round_id, race["name"], race["race_date"]))
+        with progress.stage("stagione"):
+            with transaction(conn):
+                cur.execute("SELECT id, start_year, end_year FROM seasons WHERE name = ?", (season_name,))
+                row = cur.fetchone()
+                if row:
+                    season_id = row["id"]
+                    # Scrittura solo se cambia: un UPDATE identico incrementa comunque data_versions
+                    if (str(row["start_year"]), str(row["end_year"])) != (season_start[:4], season_end[:4]):
+                        cur.execute("UPDATE seasons SET start_year = ?, end_year = ? WHERE id = ?",
+                                    (season_start[:4], season_end[:4], season_id))
+                else:
+                    cur.execute("INSERT INTO seasons (name, start_year, end_year) VALUES (?, ?, ?)",
+                                (season_name, season_start[:4], season_end[:4]))
+                    season_id = cur.lastrowid
+
+        today = datetime.today().strftime("%Y-%m-%d")
+        imported = 0
+        saved_rounds = []
+
+        def save_round(job, races, meta):
+            """
+            Writer della coda: round e gare di una pagina appena scaricata,
+            in una transazione breve (il lock non dura quanto lo scraping).
+            """
+            with transaction(conn):
+                race_ids = save_races(job, races, meta)
+                # Profili numerici delle sole gare scritte
+                refresh_race_profiles(conn, race_ids)
+            saved_rounds.append(job["round_number"])
+            progress.progress(f"round {len(saved_rounds)}/{total_rounds}, {imported} gare")
+
+        def save_races(job, races, meta):
+            nonlocal imported
+            round_number = job["round_number"]
+            values = (f"Round {round_number}", meta["start_date"], meta["end_date"])
+            cur.execute("SELECT id, name, start_date, end_date FROM rounds WHERE season_id = ? AND round_number = ?",
+                        (season_id, round_number))
             row = cur.fetchone()
             if row:
-                cur.execute("""
-                    UPDATE races SET format = ?, world = ?, course = ?, laps = ?, distance_km = ?, elevation_m = ?,
-                    powerups = ?, fal_segments = ?, fts_segments = ?, active = ? WHERE id = ?
-                """, (
-                    race["format"], race["world"], race["course"], race["laps"], race["distance_km"], race["elevation_m"],
-                    race["powerups"], race["fal_segments"], race["fts_segments"], active, row["id"]
-                ))
+                round_id = row["id"]
+                if (row["name"], row["start_date"], row["end_date"]) != values:
+                    cur.execute("UPDATE rounds SET name = ?, start_date = ?, end_date = ? WHERE id = ?",
+                                values + (round_id,))
             else:
-                cur.execute("""
-                    INSERT INTO races (
-                        name, race_date, format, world, course, laps,
-                        distance_km, elevation_m, powerups,
-                        fal_segments, fts_segments, active, round_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    race["name"], race["race_date"], race["format"], race["world"], race["course"],
-                    race["laps"], race["distance_km"], race["elevation_m"], race["powerups"],
-                    race["fal_segments"], race["fts_segments"], active, round_id
-                ))
-            imported += 1
-
-        conn.commit()
-        conn.close()
-
-        flash(f"✅ Importazione completata.\n🏁 {imported} gare salvate nel database.", "success")
-
-    except Exception as e:
-        flash(f"❌ Errore durante l'importazione WTRL: {str(e)}", "danger")
-        print("❌ Dettaglio errore:", e)
\ No newline at end of file
+                cur.execute("INSERT INTO rounds (season_id, round_number, name, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+                            (season_id, round_number) + values)
+                round_id = cur.lastrowid
+
+            rows = [
+                dict(race, round_id=round_id, active=1 if race["race_date"] >= today else 0)
+                for race in races
+            ]
+            counts = upsert_races(conn, rows)
+            imported += len(rows)
+            return counts["race_ids"]
+
+        jobs = [
+            {
+                "url": SCHEDULE_URL.format(year=start_year, round_number=round_number),
+                "round_number": round_number,
+                "category": None,
+            }
+            for round_number in range(1, total_rounds + 1)
+        ]
+        with progress.stage("download e salvataggio round"):
+            errors = asyncio.run(scarica_calendario(
+                jobs, lambda html, job: parse_schedule(html, job["round_number"]), save_round,
+            ))
+
+        if errors and not saved_rounds:
+            raise RuntimeError(f"Nessun round scaricato: {errors[0][1]}")
+        return {
+            "imported": imported,
+            "failed_rounds": [job["round_number"] for job, _ in errors],
+        }
+    finally:
+        close_zrl_db(conn)
@@ -0,0 +1,209 @@
+"""
+Import dei rider del team da ZwiftPower (tabella #team_riders) in zwift_power_riders.
+
+Gira nel worker dei job (utils.import_jobs, tipo "zwiftpower_riders"):
+Chrome headless con un profilo persistente, in cui la sessione di
+ZwiftPower resta valida tra un import e l'altro. Il login si fa una volta,
+a mano, da console:
+
+    python -m utils.zwift.zwiftpower login
+
+Con ZRL_SCRAPE_MODE=replay le pagine arrivano dagli snapshot salvati.
+"""
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from db import BASE_DIR, get_zwift_db
+from utils.html_snapshots import load_snapshot, replay_mode, save_snapshot
+from utils.import_jobs import NO_PROGRESS
+
+TEAM_URL = "https://zwiftpower.com/team.php?id=16461"
+# Profilo Chrome con la sessione di ZwiftPower
+CHROME_PROFILE = os.environ.get("ZRL_CHROME_PROFILE", os.path.join(BASE_DIR, "chrome-zwiftpower"))
+TABLE_TIMEOUT_S = 20
+
+
+# Funzioni di sicurezza
+def safe_float(value):
+    try:
+        cleaned = re.sub(r"[^\d.]", "", value)
+        return float(cleaned) if cleaned else None
+    except:
+        return None
+
+def safe_int(value):
+    try:
+        cleaned = re.sub(r"[^\d]", "", value)
+        return int(cleaned) if cleaned else None
+    except:
+        return None
+
+def safe_text(value):
+    return value.strip() if value else None
+
+
+def parse_team_riders(html):
+    """Rider della tabella #team_riders di una pagina del team su ZwiftPower."""
+    table = BeautifulSoup(html, "html.parser").find(id="team_riders")
+    if table is None:
+        return []
+
+    riders = []
+    for row in table.find_all("tr")[1:]:  # salto header
+        cols = row.find_all("td")
+        if len(cols) < 12:
+            continue
+
+        name_link = cols[2].find("a")
+        if name_link is None:
+            continue
+        profile_url = name_link.get("href") or ""
+        riders.append({
+            "zwift_power_id": safe_text(profile_url.split("=")[-1]),
+            "name": safe_text(name_link.get_text()),
+            "category": safe_text(cols[0].get_text()),
+            "ranking": safe_float(cols[1].get_text()),
+            "wkg_20min": safe_float(cols[3].get_text()),
+            "watt_20min": safe_float(cols[4].get_text()),
+            "wkg_15sec": safe_float(cols[5].get_text()),
+            "watt_15sec": safe_float(cols[6].get_text()),
+            "status": safe_text(cols[7].get_text()),
+            "races": safe_int(cols[8].get_text()),
+            "weight": safe_float(cols[9].get_text()),
+            "ftp": safe_float(cols[10].get_text()),
+            "age": safe_int(cols[11].get_text()),
+        })
+    return riders
+
+
+def _driver(headless=True):
+    options = webdriver.ChromeOptions()
+    options.add_argument(f"--user-data-dir={CHROME_PROFILE}")
+    if headless:
+        options.add_argument("--headless=new")
+    return webdriver.Chrome(options=options)
+
+
+def _pagine_live(url):
+    """Pagine della tabella rider da ZwiftPower, salvate come snapshot."""
+    driver = _driver()
+    try:
+        driver.get(url)
+
+        page_number = 1
+        while True:
+            try:
+                WebDriverWait(driver, TABLE_TIMEOUT_S).until(
+                    EC.presence_of_element_located((By.ID, "team_riders"))
+                )
+            except TimeoutException:
+                if page_number == 1:
+                    raise RuntimeError(
+                        "Tabella dei rider non trovata: sessione ZwiftPower scaduta? "
+                        "Rifare il login con `python -m utils.zwift.zwiftpower login`"
+                    )
+                raise
+            html = driver.page_source
+            save_snapshot(url, html, "zwiftpower", f"page{page_number}")
+            yield html
+
+            # Pagina successiva
+            try:
+                next_li = driver.find_element(By.XPATH, "//li[contains(@class, 'paginate_button') and .//a[text()='Next']]")
+                if "disabled" in next_li.get_attribute("class"):
+                    break
+                next_a = next_li.find_element(By.TAG_NAME, "a")
+                driver.execute_script("arguments[0].click();", next_a)
+                time.sleep(2)
+                page_number += 1
+            except:
+                break
+    finally:
+        driver.quit()
+
+
+def _pagine_replay(url):
+    """Le stesse pagine dagli snapshot salvati, senza browser."""
+    page_number = 1
+    while True:
+        html = load_snapshot(url, f"page{page_number}")
+        if html is None:
+            if page_number == 1:
+                raise LookupError(f"Nessuno snapshot per {url}")
+            return
+        yield html
+        page_number += 1
+
+
+def importa_riders(progress=None, url=TEAM_URL):
+    """Scarica i rider del team e riallinea zwift_power_riders. Restituisce i conteggi."""
+    progress = progress or NO_PROGRESS
+
+    riders = []
+    with progress.stage("download"):
+        pages = _pagine_replay(url) if replay_mode() else _pagine_live(url)
+        for page_number, html in enumerate(pages, start=1):
+            page_riders = parse_team_riders(html)
+            if not page_riders:
+                break
+            riders.extend(page_riders)
+            progress.progress(f"pagina {page_number}, {len(riders)} rider")
+
+    if not riders:
+        raise RuntimeError("Nessun rider trovato su ZwiftPower")
+
+    # Connessione al database zwift.db
+    db = get_zwift_db()
+    try:
+        with progress.stage("salvataggio"):
+            cur = db.cursor()
+            cur.executemany("""
+                INSERT OR REPLACE INTO zwift_power_riders (
+                    zwift_power_id, name, category, ranking,
+                    wkg_20min, watt_20min, wkg_15sec, watt_15sec,
+                    status, races, weight, ftp, age
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
+                rider["zwift_power_id"], rider["name"], rider["category"], rider["ranking"],
+                rider["wkg_20min"], rider["watt_20min"], rider["wkg_15sec"], rider["watt_15sec"],
+                rider["status"], rider["races"], rider["weight"], rider["ftp"], rider["age"]
+            ) for rider in riders])
+
+            # Rimuove i rider non più presenti
+            zwift_ids_scraped = {rider["zwift_power_id"] for rider in riders}
+            placeholders = ",".join(["?"]*len(zwift_ids_scraped))
+            cur.execute(f"DELETE FROM zwift_power_riders WHERE zwift_power_id NOT IN ({placeholders})", list(zwift_ids_scraped))
+            removed = cur.rowcount
+            db.commit()
+    finally:
+        db.close()
+
+    return {"riders": len(riders), "removed": removed}
+
+
+def login():
+    """Apre Chrome con il profilo dell'import per fare il login a ZwiftPower."""
+    driver = _driver(headless=False)
+    try:
+        driver.get(TEAM_URL)
+        input("➡️ Fai login su ZwiftPower, poi premi INVIO qui nella console...")
+    finally:
+        driver.quit()
+    print(f"✅ Sessione salvata in {CHROME_PROFILE}")
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "login":
+        login()
+    else:
+        print(__doc__)
+        sys.exit(1)